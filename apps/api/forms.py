@@ -34,7 +34,7 @@ class ApiEndpointToggleForm(forms.ModelForm):
             
             # Monitoring endpoints
             'health_check', 'hourly_metrics', 'daily_metrics', 
-            'performance_metrics', 'slow_queries', 'cache_stats',
+            'performance_metrics', 'slow_queries', 'cache_stats', 'query_stats',
             
             # Administration endpoints
             'api_config', 'api_config_panel',
@@ -94,6 +94,7 @@ class ApiEndpointToggleForm(forms.ModelForm):
                 'performance_metrics': 'Performance Metrics',
                 'slow_queries': 'Slow Queries',
                 'cache_stats': 'Cache Stats',
+                'query_stats': 'Query Stats',
                 'api_config': 'API Config',
                 'api_config_panel': 'API Config Panel',
             }
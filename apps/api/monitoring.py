@@ -1,5 +1,6 @@
 import time
 import logging
+from bisect import bisect_left
 from django.utils import timezone
 from django.core.cache import cache
 from rest_framework.response import Response
@@ -10,45 +11,207 @@ import json
 logger = logging.getLogger(__name__)
 
 
+# Limites superiores (ms) dos buckets do histograma de latência; o último bucket é o "acima de"
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+METRICS_PREFIX = "api_metrics"
+# Mantém o dia anterior completo para comparação
+METRICS_TTL = 2 * 86400
+SLOW_REQUEST_MS = 1000
+SLOW_REQUESTS_KEEP = 50
+
+
+def _redis():
+    # Contadores atômicos no Redis quando o cache é o django-redis; sem ele (DEBUG/locmem) usa o cache do Django
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _latency_bucket(duration_ms):
+    return bisect_left(LATENCY_BUCKETS_MS, duration_ms)
+
+
+def _percentile(histogram, quantile):
+    """Percentil estimado pelo histograma (interpolação linear dentro do bucket)"""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    target = quantile * total
+    cumulative = 0
+    for bucket in range(len(LATENCY_BUCKETS_MS) + 1):
+        count = histogram.get(bucket, 0)
+        if count and cumulative + count >= target:
+            lower = LATENCY_BUCKETS_MS[bucket - 1] if bucket else 0
+            if bucket >= len(LATENCY_BUCKETS_MS):
+                return lower
+            upper = LATENCY_BUCKETS_MS[bucket]
+            return round(lower + (upper - lower) * (target - cumulative) / count, 2)
+        cumulative += count
+    return LATENCY_BUCKETS_MS[-1]
+
+
+def _latency_summary(histogram):
+    return {
+        'p50': _percentile(histogram, 0.50),
+        'p95': _percentile(histogram, 0.95),
+        'p99': _percentile(histogram, 0.99),
+    }
+
+
 class APIMetrics:
-    """Sistema de métricas para a API"""
+    """
+    Sistema de métricas para a API
+    
+    Cada requisição incrementa contadores agregados por hora (HINCRBY em hashes do Redis):
+    totais, status, endpoints e um histograma de latência com buckets fixos, de onde saem
+    p50/p95/p99. O custo de registro é constante e não há leitura-modificação-escrita.
+    """
+    
+    @staticmethod
+    def _hour_key(moment=None):
+        return f"{METRICS_PREFIX}:{(moment or timezone.now()).strftime('%Y%m%d%H')}"
+    
+    @staticmethod
+    def _endpoint(request):
+        # Rota resolvida (ex.: /api/v1/server/top-pvp/) para não criar um contador por ID na URL
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and getattr(match, 'route', None):
+            return '/' + match.route.lstrip('^').lstrip('/')
+        return request.path
     
     @staticmethod
     def record_request(request, response, duration):
         """Registra métricas de uma requisição"""
         try:
-            # Métricas básicas
-            metrics = {
-                'timestamp': timezone.now().isoformat(),
-                'path': request.path,
-                'method': request.method,
-                'status_code': response.status_code,
-                'duration_ms': round(duration * 1000, 2),
-                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-                'ip': APIMetrics.get_client_ip(request),
-                'user_id': getattr(request.user, 'id', None) if request.user.is_authenticated else None,
-            }
+            duration_ms = round(duration * 1000, 2)
+            status_code = response.status_code
+            endpoint = APIMetrics._endpoint(request)
+            is_error = 1 if status_code >= 400 else 0
+            bucket = _latency_bucket(duration_ms)
+            duration_us = int(duration * 1000000)
             
-            # Armazena no cache para análise
-            cache_key = f"api_metrics_{timezone.now().strftime('%Y%m%d_%H')}"
-            existing_metrics = cache.get(cache_key, [])
-            existing_metrics.append(metrics)
+            key = APIMetrics._hour_key()
+            increments = {
+                f"{key}:totals": {'requests': 1, 'errors': is_error, 'duration_us': duration_us},
+                f"{key}:status": {str(status_code): 1},
+                f"{key}:endpoints": {endpoint: 1},
+                f"{key}:endpoint_errors": {endpoint: is_error},
+                f"{key}:endpoint_duration_us": {endpoint: duration_us},
+                f"{key}:latency": {str(bucket): 1},
+                f"{key}:endpoint_latency": {f"{endpoint}|{bucket}": 1},
+            }
             
-            # Mantém apenas as últimas 1000 métricas por hora
-            if len(existing_metrics) > 1000:
-                existing_metrics = existing_metrics[-1000:]
+            slow = None
+            if duration_ms > SLOW_REQUEST_MS:
+                slow = json.dumps({
+                    'timestamp': timezone.now().isoformat(),
+                    'path': request.path,
+                    'endpoint': endpoint,
+                    'method': request.method,
+                    'status_code': status_code,
+                    'duration_ms': duration_ms,
+                })
             
-            cache.set(cache_key, existing_metrics, 3600)  # 1 hora
+            APIMetrics._store(key, increments, slow, duration_ms)
             
             # Log para análise
             logger.info(
-                f"API Request: {request.method} {request.path} - {response.status_code} - {duration:.3f}s",
-                extra=metrics
+                f"API Request: {request.method} {request.path} - {status_code} - {duration:.3f}s",
+                extra={
+                    'path': request.path,
+                    'method': request.method,
+                    'status_code': status_code,
+                    'duration_ms': duration_ms,
+                    'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                    'ip': APIMetrics.get_client_ip(request),
+                    'user_id': getattr(request.user, 'id', None) if request.user.is_authenticated else None,
+                }
             )
             
         except Exception as e:
             logger.error(f"Error recording API metrics: {e}")
     
+    @staticmethod
+    def _store(key, increments, slow, duration_ms):
+        client = _redis()
+        if client is not None:
+            pipe = client.pipeline(transaction=False)
+            for hash_key, fields in increments.items():
+                for field, amount in fields.items():
+                    if amount:
+                        pipe.hincrby(hash_key, field, amount)
+                pipe.expire(hash_key, METRICS_TTL)
+            if slow is not None:
+                pipe.zadd(f"{key}:slow", {slow: duration_ms})
+                pipe.zremrangebyrank(f"{key}:slow", 0, -SLOW_REQUESTS_KEEP - 1)
+                pipe.expire(f"{key}:slow", METRICS_TTL)
+            pipe.execute()
+            return
+        
+        # Sem Redis (DEBUG/locmem): mesma estrutura em dicts no cache, sem garantia de atomicidade
+        for hash_key, fields in increments.items():
+            data = cache.get(hash_key) or {}
+            for field, amount in fields.items():
+                if amount:
+                    data[field] = data.get(field, 0) + amount
+            cache.set(hash_key, data, METRICS_TTL)
+        if slow is not None:
+            entries = cache.get(f"{key}:slow") or []
+            entries.append((duration_ms, slow))
+            entries.sort(reverse=True)
+            cache.set(f"{key}:slow", entries[:SLOW_REQUESTS_KEEP], METRICS_TTL)
+    
+    @staticmethod
+    def _read_hashes(keys):
+        """Lê vários hashes de contadores de uma vez: lista de {campo: inteiro}"""
+        client = _redis()
+        if client is None:
+            return [dict(cache.get(key) or {}) for key in keys]
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+        return [
+            {
+                (field.decode() if isinstance(field, bytes) else field): int(value)
+                for field, value in data.items()
+            }
+            for data in pipe.execute()
+        ]
+    
+    @staticmethod
+    def _read_slow(hour_keys, limit):
+        client = _redis()
+        entries = []
+        for key in hour_keys:
+            if client is not None:
+                entries.extend(
+                    (score, member.decode() if isinstance(member, bytes) else member)
+                    for member, score in client.zrevrange(f"{key}:slow", 0, limit - 1, withscores=True)
+                )
+            else:
+                entries.extend(cache.get(f"{key}:slow") or [])
+        entries.sort(key=lambda entry: entry[0], reverse=True)
+        return [json.loads(member) for _, member in entries[:limit]]
+    
+    @staticmethod
+    def _today_hour_keys():
+        now = timezone.now()
+        return [f"{METRICS_PREFIX}:{now.strftime('%Y%m%d')}{hour:02d}" for hour in range(now.hour + 1)]
+    
+    @staticmethod
+    def aggregate(hour_keys):
+        """Soma os contadores das horas informadas"""
+        suffixes = ('totals', 'status', 'endpoints', 'endpoint_errors', 'endpoint_duration_us', 'latency', 'endpoint_latency')
+        keys = [f"{key}:{suffix}" for key in hour_keys for suffix in suffixes]
+        merged = {suffix: {} for suffix in suffixes}
+        for index, data in enumerate(APIMetrics._read_hashes(keys)):
+            target = merged[suffixes[index % len(suffixes)]]
+            for field, value in data.items():
+                target[field] = target.get(field, 0) + value
+        return merged
+    
     @staticmethod
     def get_client_ip(request):
         """Obtém o IP do cliente"""
@@ -59,51 +222,42 @@ class APIMetrics:
             ip = request.META.get('REMOTE_ADDR')
         return ip
     
+    @staticmethod
+    def _stats(hour_keys, period):
+        data = APIMetrics.aggregate(hour_keys)
+        totals = data['totals']
+        total_requests = totals.get('requests', 0)
+        
+        if not total_requests:
+            return {
+                'total_requests': 0,
+                'avg_response_time': 0,
+                'status_codes': {},
+                'endpoints': {},
+                'error_rate': 0,
+                'latency': {'p50': 0, 'p95': 0, 'p99': 0},
+                'period': period,
+            }
+        
+        avg_response_time = totals.get('duration_us', 0) / 1000 / total_requests
+        error_rate = (totals.get('errors', 0) / total_requests) * 100
+        histogram = {int(bucket): count for bucket, count in data['latency'].items()}
+        
+        return {
+            'total_requests': total_requests,
+            'avg_response_time': round(avg_response_time, 2),
+            'status_codes': {int(code): count for code, count in data['status'].items()},
+            'endpoints': data['endpoints'],
+            'error_rate': round(error_rate, 2),
+            'latency': _latency_summary(histogram),
+            'period': period,
+        }
+    
     @staticmethod
     def get_hourly_stats():
         """Obtém estatísticas da última hora"""
         try:
-            cache_key = f"api_metrics_{timezone.now().strftime('%Y%m%d_%H')}"
-            metrics = cache.get(cache_key, [])
-            
-            if not metrics:
-                return {
-                    'total_requests': 0,
-                    'avg_response_time': 0,
-                    'status_codes': {},
-                    'endpoints': {},
-                    'error_rate': 0,
-                }
-            
-            total_requests = len(metrics)
-            total_duration = sum(m['duration_ms'] for m in metrics)
-            avg_response_time = total_duration / total_requests if total_requests > 0 else 0
-            
-            # Conta códigos de status
-            status_codes = {}
-            for m in metrics:
-                status = m['status_code']
-                status_codes[status] = status_codes.get(status, 0) + 1
-            
-            # Conta endpoints
-            endpoints = {}
-            for m in metrics:
-                path = m['path']
-                endpoints[path] = endpoints.get(path, 0) + 1
-            
-            # Calcula taxa de erro
-            error_count = sum(1 for m in metrics if m['status_code'] >= 400)
-            error_rate = (error_count / total_requests) * 100 if total_requests > 0 else 0
-            
-            return {
-                'total_requests': total_requests,
-                'avg_response_time': round(avg_response_time, 2),
-                'status_codes': status_codes,
-                'endpoints': endpoints,
-                'error_rate': round(error_rate, 2),
-                'period': 'last_hour',
-            }
-            
+            return APIMetrics._stats([APIMetrics._hour_key()], 'last_hour')
         except Exception as e:
             logger.error(f"Error getting hourly stats: {e}")
             return {'error': str(e)}
@@ -112,51 +266,7 @@ class APIMetrics:
     def get_daily_stats():
         """Obtém estatísticas do dia atual"""
         try:
-            # Busca métricas de todas as horas do dia
-            daily_metrics = []
-            for hour in range(24):
-                cache_key = f"api_metrics_{timezone.now().strftime('%Y%m%d')}_{hour:02d}"
-                metrics = cache.get(cache_key, [])
-                daily_metrics.extend(metrics)
-            
-            if not daily_metrics:
-                return {
-                    'total_requests': 0,
-                    'avg_response_time': 0,
-                    'status_codes': {},
-                    'endpoints': {},
-                    'error_rate': 0,
-                }
-            
-            total_requests = len(daily_metrics)
-            total_duration = sum(m['duration_ms'] for m in daily_metrics)
-            avg_response_time = total_duration / total_requests if total_requests > 0 else 0
-            
-            # Conta códigos de status
-            status_codes = {}
-            for m in daily_metrics:
-                status = m['status_code']
-                status_codes[status] = status_codes.get(status, 0) + 1
-            
-            # Conta endpoints
-            endpoints = {}
-            for m in daily_metrics:
-                path = m['path']
-                endpoints[path] = endpoints.get(path, 0) + 1
-            
-            # Calcula taxa de erro
-            error_count = sum(1 for m in daily_metrics if m['status_code'] >= 400)
-            error_rate = (error_count / total_requests) * 100 if total_requests > 0 else 0
-            
-            return {
-                'total_requests': total_requests,
-                'avg_response_time': round(avg_response_time, 2),
-                'status_codes': status_codes,
-                'endpoints': endpoints,
-                'error_rate': round(error_rate, 2),
-                'period': 'today',
-            }
-            
+            return APIMetrics._stats(APIMetrics._today_hour_keys(), 'today')
         except Exception as e:
             logger.error(f"Error getting daily stats: {e}")
             return {'error': str(e)}
@@ -233,7 +343,13 @@ class HealthCheck:
         """Verifica saúde do servidor do jogo"""
         try:
             from utils.dynamic_import import get_query_class
+            from apps.lineage.server.database import LineageDB
             LineageStats = get_query_class("LineageStats")
+
+            # Usa o estado cacheado do circuit breaker antes de consultar o banco
+            db = LineageDB()
+            if db.enabled and not db.is_connected():
+                return {'status': 'unhealthy', 'message': f"Game database unavailable (circuit {db.health_stats()['state']})"}
             
             # Tenta uma consulta simples
             data = LineageStats.players_online()
@@ -271,19 +387,8 @@ class APIPerformance:
     def get_slow_queries(limit=10):
         """Obtém as queries mais lentas"""
         try:
-            # Busca métricas das últimas 24 horas
-            slow_queries = []
-            for hour in range(24):
-                cache_key = f"api_metrics_{timezone.now().strftime('%Y%m%d')}_{hour:02d}"
-                metrics = cache.get(cache_key, [])
-                
-                # Filtra queries lentas (> 1 segundo)
-                slow = [m for m in metrics if m['duration_ms'] > 1000]
-                slow_queries.extend(slow)
-            
-            # Ordena por duração e retorna as mais lentas
-            slow_queries.sort(key=lambda x: x['duration_ms'], reverse=True)
-            return slow_queries[:limit]
+            # Requisições acima de SLOW_REQUEST_MS do dia, mantidas por hora em sorted sets
+            return APIMetrics._read_slow(APIMetrics._today_hour_keys(), limit)
             
         except Exception as e:
             logger.error(f"Error getting slow queries: {e}")
@@ -293,34 +398,28 @@ class APIPerformance:
     def get_endpoint_performance():
         """Obtém performance por endpoint"""
         try:
-            # Busca métricas das últimas 24 horas
-            endpoint_metrics = {}
-            for hour in range(24):
-                cache_key = f"api_metrics_{timezone.now().strftime('%Y%m%d')}_{hour:02d}"
-                metrics = cache.get(cache_key, [])
-                
-                for m in metrics:
-                    path = m['path']
-                    if path not in endpoint_metrics:
-                        endpoint_metrics[path] = {
-                            'count': 0,
-                            'total_duration': 0,
-                            'errors': 0,
-                        }
-                    
-                    endpoint_metrics[path]['count'] += 1
-                    endpoint_metrics[path]['total_duration'] += m['duration_ms']
-                    
-                    if m['status_code'] >= 400:
-                        endpoint_metrics[path]['errors'] += 1
+            data = APIMetrics.aggregate(APIMetrics._today_hour_keys())
+            
+            histograms = {}
+            for field, count in data['endpoint_latency'].items():
+                endpoint, bucket = field.rsplit('|', 1)
+                histograms.setdefault(endpoint, {})[int(bucket)] = count
             
-            # Calcula médias
-            for path, data in endpoint_metrics.items():
-                data['avg_duration'] = round(data['total_duration'] / data['count'], 2)
-                data['error_rate'] = round((data['errors'] / data['count']) * 100, 2)
+            endpoint_metrics = {}
+            for path, count in data['endpoints'].items():
+                total_duration = data['endpoint_duration_us'].get(path, 0) / 1000
+                errors = data['endpoint_errors'].get(path, 0)
+                endpoint_metrics[path] = {
+                    'count': count,
+                    'total_duration': round(total_duration, 2),
+                    'errors': errors,
+                    'avg_duration': round(total_duration / count, 2),
+                    'error_rate': round((errors / count) * 100, 2),
+                    'latency': _latency_summary(histograms.get(path, {})),
+                }
             
             return endpoint_metrics
             
         except Exception as e:
             logger.error(f"Error getting endpoint performance: {e}")
-            return {} 
\ No newline at end of file
+            return {}
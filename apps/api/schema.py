@@ -394,7 +394,7 @@ class SearchAPISchema:
     def character_search_schema():
         return extend_schema(
             summary="Busca de Personagens",
-            description="Busca personagens no servidor. **Endpoint público** - não requer autenticação.",
+            description="Busca personagens por prefixo ou trecho do nome (autocomplete), com os exatos e online primeiro. **Endpoint público** - não requer autenticação.",
             parameters=[
                 OpenApiParameter(
                     name="q",
@@ -406,7 +406,14 @@ class SearchAPISchema:
                         OpenApiExample("Buscar por 'Hero'", value="Hero"),
                         OpenApiExample("Buscar por 'Dark'", value="Dark"),
                     ]
-                )
+                ),
+                OpenApiParameter(
+                    name="limit",
+                    type=int,
+                    location=OpenApiParameter.QUERY,
+                    description="Número máximo de resultados (padrão: 20, máximo: 50)",
+                    required=False,
+                ),
             ],
             responses={
                 status.HTTP_200_OK: CharacterSerializer(many=True),
@@ -420,7 +427,7 @@ class SearchAPISchema:
     def item_search_schema():
         return extend_schema(
             summary="Busca de Itens",
-            description="Busca itens no servidor. **Endpoint público** - não requer autenticação.",
+            description="Busca itens no catálogo por prefixo, trecho do nome ou com erros de digitação, com resultados ranqueados e paginados. **Endpoint público** - não requer autenticação.",
             parameters=[
                 OpenApiParameter(
                     name="q",
@@ -432,7 +439,21 @@ class SearchAPISchema:
                         OpenApiExample("Buscar por 'Sword'", value="Sword"),
                         OpenApiExample("Buscar por 'Armor'", value="Armor"),
                     ]
-                )
+                ),
+                OpenApiParameter(
+                    name="page",
+                    type=int,
+                    location=OpenApiParameter.QUERY,
+                    description="Página dos resultados (padrão: 1)",
+                    required=False,
+                ),
+                OpenApiParameter(
+                    name="page_size",
+                    type=int,
+                    location=OpenApiParameter.QUERY,
+                    description="Itens por página (padrão: 20, máximo: 100)",
+                    required=False,
+                ),
             ],
             responses={
                 status.HTTP_200_OK: ItemSerializer(many=True),
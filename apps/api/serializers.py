@@ -181,6 +181,7 @@ class ItemSerializer(serializers.Serializer):
     enchant_level = serializers.IntegerField(required=False)
     price = serializers.IntegerField(required=False)
     description = serializers.CharField(required=False, allow_blank=True)
+    score = serializers.FloatField(required=False)
 
 
 class ClanDetailSerializer(serializers.Serializer):
@@ -54,6 +54,8 @@ v1_patterns = [
     path('metrics/daily/', views.DailyMetricsView.as_view(), name='daily_metrics'),
     path('metrics/performance/', views.PerformanceMetricsView.as_view(), name='performance_metrics'),
     path('metrics/slow-queries/', views.SlowQueriesView.as_view(), name='slow_queries'),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache_stats'),
+    path('db/query-stats/', views.QueryStatsView.as_view(), name='query_stats'),
     
     # =========================== ADMINISTRATION ===========================
     path('admin/config/', views.APIConfigView.as_view(), name='api_config'),
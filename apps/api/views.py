@@ -30,6 +30,10 @@ from .permissions import IsSuperUser, IsAPIAdmin, IsMonitoringAdmin
 from .schema import ServerAPISchema, AuthAPISchema, UserAPISchema, SearchAPISchema, GameDataAPISchema, ServerStatusAPISchema, APIInfoSchema
 
 from utils.dynamic_import import get_query_class
+from apps.lineage.server.utils.rankings import get_ranking
+from apps.lineage.server.utils.wealth import get_top_adena, active_adena_config
+from apps.lineage.inventory.utils.search import search_items
+from apps.lineage.server.utils.character_index import search_characters
 from apps.lineage.server.decorators import endpoint_enabled
 from apps.lineage.server.models import ApiEndpointToggle
 from apps.main.notification.models import PushSubscription
@@ -121,7 +125,7 @@ class TopPvPView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_pvp(limit=limit)
+                data = get_ranking("top_pvp", limit=limit)
                 cache.set(cache_key, data, 60)  # Cache por 1 minuto
             else:
                 data = cached_data
@@ -162,7 +166,7 @@ class TopPKView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_pk(limit=limit)
+                data = get_ranking("top_pk", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -266,7 +270,7 @@ class TopRichView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_adena(limit=limit)
+                data = get_top_adena(limit, *active_adena_config())
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -307,7 +311,7 @@ class TopOnlineView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_online(limit=limit)
+                data = get_ranking("top_online", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -348,7 +352,7 @@ class TopLevelView(GenericAPIView):
             cached_data = cache.get(cache_key)
             
             if cached_data is None:
-                data = LineageStats.top_level(limit=limit)
+                data = get_ranking("top_level", limit=limit)
                 cache.set(cache_key, data, 60)
             else:
                 data = cached_data
@@ -988,17 +992,10 @@ class CharacterSearchView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Busca personagens no banco de dados do jogo
-            cache_key = f'api_character_search_{query}'
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is None:
-                # Aqui você implementaria a busca real no banco do jogo
-                # Por enquanto, retorna dados mock
-                data = LineageStats.search_characters(query) if hasattr(LineageStats, 'search_characters') else []
-                cache.set(cache_key, data, 300)  # Cache por 5 minutos
-            else:
-                data = cached_data
+            limit = min(int(request.GET.get('limit', 20)), 50)
+
+            # Índice local de nomes (sincronizado pelo celery-beat), sem LIKE no banco do jogo
+            data = search_characters(query, limit=limit)
             
             serializer = CharacterSerializer(data, many=True)
             return Response({
@@ -1007,6 +1004,11 @@ class CharacterSearchView(APIView):
                 'count': len(serializer.data),
                 'timestamp': timezone.now().isoformat(),
             })
+        except ValueError:
+            return Response(
+                {'error': 'Parâmetro limit deve ser um número válido'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': 'Erro ao buscar personagens'},
@@ -1031,23 +1033,27 @@ class ItemSearchView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            cache_key = f'api_item_search_{query}'
-            cached_data = cache.get(cache_key)
-            
-            if cached_data is None:
-                # Implementar busca real de itens
-                data = LineageStats.search_items(query) if hasattr(LineageStats, 'search_items') else []
-                cache.set(cache_key, data, 600)  # Cache por 10 minutos
-            else:
-                data = cached_data
-            
+            page = max(int(request.GET.get('page', 1)), 1)
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+
+            # Índice em memória sobre o catálogo de itens (itens.json + CustomItem), sem consultar o banco
+            total, data = search_items(query, page=page, page_size=page_size)
+
             serializer = ItemSerializer(data, many=True)
             return Response({
                 'success': True,
                 'data': serializer.data,
                 'count': len(serializer.data),
+                'total': total,
+                'page': page,
+                'page_size': page_size,
                 'timestamp': timezone.now().isoformat(),
             })
+        except ValueError:
+            return Response(
+                {'error': 'Parâmetros page e page_size devem ser números válidos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         except Exception as e:
             return Response(
                 {'error': 'Erro ao buscar itens'},
@@ -1539,6 +1545,107 @@ class SlowQueriesView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@endpoint_enabled('cache_stats')
+@extend_schema(
+    summary="Estatísticas de Cache",
+    description="Retorna os contadores do cache de resultados do banco do Lineage",
+    responses={
+        status.HTTP_200_OK: APIResponseSerializer,
+        status.HTTP_403_FORBIDDEN: APIResponseSerializer,
+    },
+    tags=["Monitoramento"],
+    auth=[]
+)
+class CacheStatsView(APIView):
+    """View para estatísticas do cache do LineageDB"""
+    permission_classes = [IsAuthenticated]  # Apenas usuários autenticados
+
+    def get(self, request):
+        """Retorna hits, misses, evictions e ocupação do cache"""
+        try:
+            from apps.lineage.server.database import LineageDB
+
+            # Verifica se o usuário é staff
+            if not request.user.is_staff:
+                return Response({
+                    'success': False,
+                    'error': 'Acesso negado. Apenas administradores podem acessar métricas.',
+                    'timestamp': timezone.now().isoformat(),
+                }, status=status.HTTP_403_FORBIDDEN)
+
+            stats = LineageDB().cache_stats()
+
+            return Response({
+                'success': True,
+                'data': stats,
+                'timestamp': timezone.now().isoformat(),
+            })
+
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': f'Erro ao buscar estatísticas de cache: {str(e)}',
+                'timestamp': timezone.now().isoformat(),
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@endpoint_enabled('query_stats')
+@extend_schema(
+    summary="Profiling de Consultas do Lineage",
+    description="Latência por consulta (histograma, p50/p95/p99) e últimas consultas lentas do banco do Lineage",
+    parameters=[
+        OpenApiParameter(name='limit', type=int, description='Número máximo de consultas (padrão: 20, máximo: 200)'),
+        OpenApiParameter(name='order_by', type=str, description='total_ms, avg_ms, max_ms, count ou slow (padrão: total_ms)'),
+    ],
+    responses={
+        status.HTTP_200_OK: APIResponseSerializer,
+        status.HTTP_403_FORBIDDEN: APIResponseSerializer,
+    },
+    tags=["Monitoramento"],
+    auth=[]
+)
+class QueryStatsView(APIView):
+    """View para o profiling das consultas do LineageDB"""
+    permission_classes = [IsAuthenticated]  # Apenas usuários autenticados
+
+    def get(self, request):
+        """Retorna os contadores por consulta e o log de consultas lentas"""
+        try:
+            from apps.lineage.server.database import LineageDB
+
+            # Verifica se o usuário é staff
+            if not request.user.is_staff:
+                return Response({
+                    'success': False,
+                    'error': 'Acesso negado. Apenas administradores podem acessar métricas.',
+                    'timestamp': timezone.now().isoformat(),
+                }, status=status.HTTP_403_FORBIDDEN)
+
+            limit = min(int(request.GET.get('limit', 20)), 200)
+            order_by = request.GET.get('order_by', 'total_ms')
+            if order_by not in ('total_ms', 'avg_ms', 'max_ms', 'count', 'slow'):
+                order_by = 'total_ms'
+
+            return Response({
+                'success': True,
+                'data': LineageDB().query_stats(order_by=order_by, limit=limit),
+                'timestamp': timezone.now().isoformat(),
+            })
+
+        except ValueError:
+            return Response({
+                'success': False,
+                'error': 'Parâmetro limit deve ser um número válido',
+                'timestamp': timezone.now().isoformat(),
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({
+                'success': False,
+                'error': f'Erro ao buscar profiling de consultas: {str(e)}',
+                'timestamp': timezone.now().isoformat(),
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 # =========================== API CONFIGURATION VIEWS ===========================
 
 @endpoint_enabled('api_config')
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CustomItem
+from .utils.items import catalog
+
+
+@receiver(post_save, sender=CustomItem)
+@receiver(post_delete, sender=CustomItem)
+def invalidate_item_catalog(sender, **kwargs):
+    # Os itens customizados sobrepõem o itens.json no catálogo de itens
+    catalog.invalidate_custom()
@@ -1,21 +1,141 @@
 import os
 import json
+import time
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
 from django.conf import settings
-from apps.lineage.inventory.models import CustomItem
+from django.core.cache import cache
 
-def get_itens_json():
-    # Caminho para o itens.json
-    itens_path = os.path.join(settings.BASE_DIR, 'utils/data/itens.json')
-    
-    # Carrega itens.json
-    with open(itens_path, 'r', encoding='utf-8') as f:
-        itens_data = json.load(f)
+ITENS_PATH = os.path.join(settings.BASE_DIR, 'utils/data/itens.json')
+# Versão dos itens customizados, incrementada pelos signals do CustomItem (vale para todos os processos)
+CUSTOM_VERSION_KEY = "item_catalog:custom_version"
+CUSTOM_CHECK_INTERVAL = int(os.getenv("ITEM_CATALOG_CUSTOM_CHECK_INTERVAL", "30"))
+
+
+class ItemCatalog:
+    """
+    Catálogo de itens carregado uma única vez por processo.
+
+    O itens.json vira dois arrays paralelos ordenados pelo ID (busca binária), bem mais
+    compactos que o dict de listas do JSON. Os itens customizados (CustomItem) ficam em um
+    dict sobreposto, recarregado quando a versão no cache muda (signals de save/delete).
+    """
+
+    def __init__(self, path: str = ITENS_PATH):
+        self.path = path
+        self._ids: Optional[array] = None
+        self._names: Tuple[str, ...] = ()
+        self._custom: Optional[Dict[int, str]] = None
+        self._custom_version = None
+        self._custom_checked = 0.0
+        self._lock = threading.Lock()
+
+    def _base(self) -> Tuple[array, Tuple[str, ...]]:
+        if self._ids is None:
+            with self._lock:
+                if self._ids is None:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    pairs = sorted(
+                        (int(item_id), values[0] if values else "")
+                        for item_id, values in data.items() if item_id.isdigit()
+                    )
+                    self._names = tuple(name for _, name in pairs)
+                    self._ids = array('q', (item_id for item_id, _ in pairs))
+        return self._ids, self._names
+
+    def _custom_items(self) -> Dict[int, str]:
+        now = time.monotonic()
+        if self._custom is not None and now - self._custom_checked < CUSTOM_CHECK_INTERVAL:
+            return self._custom
+
+        try:
+            version = cache.get(CUSTOM_VERSION_KEY)
+        except Exception:
+            version = self._custom_version
+
+        if self._custom is None or version != self._custom_version:
+            from apps.lineage.inventory.models import CustomItem
+            self._custom = dict(CustomItem.objects.values_list('item_id', 'nome'))
+            self._custom_version = version
+        self._custom_checked = now
+        return self._custom
+
+    def invalidate_custom(self):
+        """Descarta os itens customizados deste processo e avisa os demais pelo cache."""
+        self._custom = None
+        try:
+            cache.incr(CUSTOM_VERSION_KEY)
+        except ValueError:
+            cache.set(CUSTOM_VERSION_KEY, 1, timeout=None)
+        except Exception:
+            pass
+
+    @property
+    def version(self):
+        """Muda sempre que os itens customizados mudam (usado por índices derivados do catálogo)."""
+        self._custom_items()
+        return self._custom_version, id(self._custom)
 
-    # Carrega itens customizados do banco
-    custom_items = CustomItem.objects.all()
+    def custom_ids(self) -> set:
+        return set(self._custom_items())
 
-    # Adiciona os itens customizados no JSON
-    for item in custom_items:
-        itens_data[str(item.item_id)] = [item.nome]
+    def get(self, item_id, default: Optional[str] = None) -> Optional[str]:
+        try:
+            item_id = int(item_id)
+        except (TypeError, ValueError):
+            return default
 
-    return itens_data
+        custom = self._custom_items()
+        if item_id in custom:
+            return custom[item_id]
+
+        ids, names = self._base()
+        index = bisect_left(ids, item_id)
+        if index < len(ids) and ids[index] == item_id:
+            return names[index]
+        return default
+
+    def get_many(self, item_ids: Iterable, default: Optional[str] = None) -> Dict[int, Optional[str]]:
+        result = {}
+        for item_id in item_ids:
+            try:
+                result[int(item_id)] = self.get(item_id, default)
+            except (TypeError, ValueError):
+                continue
+        return result
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        """Todos os itens (id, nome), com os customizados sobrepostos."""
+        custom = self._custom_items()
+        ids, names = self._base()
+        for item_id, name in zip(ids, names):
+            yield item_id, custom.get(item_id, name)
+        base_ids = set(ids)
+        for item_id, name in custom.items():
+            if item_id not in base_ids:
+                yield item_id, name
+
+
+catalog = ItemCatalog()
+
+
+def item_name(item_id, default: Optional[str] = None) -> Optional[str]:
+    """Nome do item pelo ID (itens customizados têm prioridade)."""
+    return catalog.get(item_id, default)
+
+
+def item_names(item_ids: Iterable, default: Optional[str] = None) -> Dict[int, Optional[str]]:
+    """Nomes de vários itens de uma vez: {id: nome}."""
+    return catalog.get_many(item_ids, default)
+
+
+def get_itens_json():
+    """
+    Compatibilidade: o catálogo completo no formato do itens.json ({"id": [nome]}).
+    Prefira item_name/item_names, que não montam o dict inteiro.
+    """
+    return {str(item_id): [name] for item_id, name in catalog.items()}
@@ -0,0 +1,247 @@
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .items import catalog
+
+# Erros de digitação aceitos por palavra: 1 a partir de 4 letras, 2 a partir de 10
+FUZZY_MIN_LENGTH = int(os.getenv("ITEM_SEARCH_FUZZY_MIN_LENGTH", "4"))
+# A busca tolerante só roda quando as etapas exatas encontram menos itens que isso (fixo, não depende da página)
+FUZZY_MAX_MATCHES = int(os.getenv("ITEM_SEARCH_FUZZY_MAX_MATCHES", "50"))
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+# Pontuação por tipo de correspondência (maior primeiro)
+SCORE_EXACT = 1000
+SCORE_PREFIX = 900
+SCORE_WORD_PREFIX = 800
+SCORE_SUBSTRING = 600
+SCORE_FUZZY = 400
+FUZZY_EDIT_PENALTY = 50
+SIMILAR_CACHE_SIZE = 4096
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos e só letras/números separados por espaço."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    return _NON_ALNUM_RE.sub(" ", text).strip()
+
+
+def trigrams(text: str, padded: bool = True) -> List[str]:
+    if padded:
+        text = f"  {text} "
+    return [text[i:i + 3] for i in range(len(text) - 2)] if len(text) >= 3 else []
+
+
+def max_edits(word: str) -> int:
+    if len(word) < FUZZY_MIN_LENGTH:
+        return 0
+    return 1 if len(word) < 10 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distância de Damerau-Levenshtein (transposições adjacentes), interrompida ao passar de `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class ItemSearchIndex:
+    """
+    Índice de busca em memória sobre o catálogo de itens.
+
+    - Prefixo: lista ordenada das palavras dos nomes (busca binária + varredura do intervalo),
+      que funciona como uma trie achatada, com postings em arrays.
+    - Substring: índice invertido de trigramas dos nomes.
+    - Erros de digitação: trigramas das palavras do vocabulário filtram os candidatos,
+      confirmados pela distância de edição.
+    Os resultados são ranqueados por tipo de correspondência, similaridade e tamanho do nome.
+    """
+
+    def __init__(self, items):
+        self.ids = array('q')
+        self.names: List[str] = []
+        self.normalized: List[str] = []
+        self.custom: List[bool] = []
+
+        words: Dict[str, List[int]] = defaultdict(list)
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for item_id, name, is_custom in items:
+            normalized = normalize(name)
+            if not normalized:
+                continue
+            index = len(self.names)
+            self.ids.append(item_id)
+            self.names.append(name)
+            self.normalized.append(normalized)
+            self.custom.append(is_custom)
+            for word in set(normalized.split()):
+                words[word].append(index)
+            for gram in set(trigrams(normalized)):
+                grams[gram].append(index)
+
+        self.words = sorted(words)
+        self.word_postings = [array('l', words[word]) for word in self.words]
+        self.grams = {gram: array('l', postings) for gram, postings in grams.items()}
+
+        word_grams: Dict[str, List[int]] = defaultdict(list)
+        for position, word in enumerate(self.words):
+            for gram in set(trigrams(word)):
+                word_grams[gram].append(position)
+        self.word_grams = {gram: array('l', postings) for gram, postings in word_grams.items()}
+        self._similar_cache: Dict[str, Dict[int, int]] = {}
+
+    def _word_prefix(self, token: str) -> set:
+        matches = set()
+        position = bisect_left(self.words, token)
+        while position < len(self.words) and self.words[position].startswith(token):
+            matches.update(self.word_postings[position])
+            position += 1
+        return matches
+
+    def _substring(self, query: str) -> set:
+        grams = set(trigrams(query, padded=False))
+        if not grams:
+            # Busca de 1-2 caracteres: só prefixo de palavra
+            return set()
+        postings = sorted((self.grams.get(gram, ()) for gram in grams), key=len)
+        if not postings or not postings[0]:
+            return set()
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return {index for index in candidates if query in self.normalized[index]}
+
+    def _similar_words(self, token: str) -> Dict[int, int]:
+        """Posições das palavras do vocabulário a até max_edits(token) edições: {posição: edições}."""
+        cached = self._similar_cache.get(token)
+        if cached is not None:
+            return cached
+        limit = max_edits(token)
+        if not limit:
+            return {}
+        grams = set(trigrams(token))
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for position in self.word_grams.get(gram, ()):
+                counts[position] += 1
+        # Cada edição destrói no máximo 4 trigramas (transposição)
+        needed = max(len(grams) - 4 * limit, 2)
+        result = {}
+        for position, shared in counts.items():
+            if shared >= needed:
+                edits = edit_distance(token, self.words[position], limit)
+                if 0 < edits <= limit:
+                    result[position] = edits
+
+        if len(self._similar_cache) >= SIMILAR_CACHE_SIZE:
+            self._similar_cache.clear()
+        self._similar_cache[token] = result
+        return result
+
+    def _fuzzy(self, tokens: List[str], exclude: set) -> Dict[int, int]:
+        """Itens em que cada palavra da busca casa por prefixo ou com erros de digitação: {índice: edições}."""
+        candidates = None
+        for token in sorted(tokens, key=len, reverse=True):
+            matches = dict.fromkeys(self._word_prefix(token), 0)
+            for position, edits in self._similar_words(token).items():
+                for index in self.word_postings[position]:
+                    if matches.get(index, edits) >= edits:
+                        matches[index] = edits
+            if candidates is None:
+                candidates = matches
+            else:
+                candidates = {index: candidates[index] + edits for index, edits in matches.items() if index in candidates}
+            if not candidates:
+                return {}
+        return {index: edits for index, edits in candidates.items() if edits and index not in exclude}
+
+    def search(self, query: str, page: int = 1, page_size: int = 20) -> Tuple[int, List[Dict]]:
+        """Retorna (total, itens da página) ranqueados."""
+        query = normalize(query)
+        if not query:
+            return 0, []
+
+        scores: Dict[int, float] = {}
+        tokens = query.split()
+
+        # 1) Todas as palavras da busca são prefixo de alguma palavra do nome
+        candidates = None
+        for token in sorted(tokens, key=len, reverse=True):
+            matches = self._word_prefix(token)
+            candidates = matches if candidates is None else candidates & matches
+            if not candidates:
+                break
+        for index in candidates or ():
+            name = self.normalized[index]
+            if name == query:
+                scores[index] = SCORE_EXACT
+            elif name.startswith(query):
+                scores[index] = SCORE_PREFIX
+            else:
+                scores[index] = SCORE_WORD_PREFIX
+
+        # 2) Substring em qualquer posição
+        for index in self._substring(query):
+            scores.setdefault(index, SCORE_SUBSTRING)
+
+        # 3) Tolerância a erros de digitação (apenas quando as anteriores encontram poucos itens; decidido
+        # pela busca e não pela página, para o total e a ordem serem os mesmos em todas as páginas)
+        if len(scores) < FUZZY_MAX_MATCHES:
+            for index, edits in self._fuzzy(tokens, set(scores)).items():
+                scores[index] = SCORE_FUZZY - FUZZY_EDIT_PENALTY * edits
+
+        ranked = sorted(scores, key=lambda index: (-scores[index], len(self.normalized[index]), self.ids[index]))
+        start = (max(page, 1) - 1) * page_size
+        return len(ranked), [self._as_dict(index, scores[index]) for index in ranked[start:start + page_size]]
+
+    def _as_dict(self, index: int, score: float) -> Dict:
+        return {
+            "item_id": self.ids[index],
+            "item_name": self.names[index],
+            "item_type": "custom" if self.custom[index] else "item",
+            "score": round(score, 2),
+        }
+
+
+_index: Optional[ItemSearchIndex] = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def get_item_search_index() -> ItemSearchIndex:
+    """Índice do processo, reconstruído quando o catálogo (itens customizados) muda."""
+    global _index, _index_version
+    version = catalog.version
+    if _index is None or version != _index_version:
+        with _index_lock:
+            version = catalog.version
+            if _index is None or version != _index_version:
+                custom = catalog.custom_ids()
+                _index = ItemSearchIndex(
+                    (item_id, name, item_id in custom) for item_id, name in catalog.items()
+                )
+                _index_version = version
+    return _index
+
+
+def search_items(query: str, page: int = 1, page_size: int = 20) -> Tuple[int, List[Dict]]:
+    return get_item_search_index().search(query, page=page, page_size=page_size)
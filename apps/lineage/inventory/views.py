@@ -6,7 +6,7 @@ from django.contrib.auth import authenticate
 from django.utils.translation import gettext as _
 
 from django.db.models import Sum
-from .utils.items import get_itens_json
+from .utils.items import item_name
 
 from apps.main.home.models import PerfilGamer
 
@@ -24,6 +24,34 @@ LineageServices = get_query_class("LineageServices")
 LineageAccount = get_query_class("LineageAccount")
 
 
+def _paginate_item_stream(char_id, page_number, per_page=10):
+    """
+    Pagina os itens do personagem sem carregar o inventário/warehouse inteiro:
+    os itens são lidos em stream, contados, e só os da página pedida são guardados.
+    """
+    def collect(page_index):
+        start = (page_index - 1) * per_page
+        page_items, total = [], 0
+        for item in TransferFromCharToWallet.list_items(char_id):
+            if start <= total < start + per_page:
+                item = dict(item)
+                item_id_str = str(item['item_type'])
+                item['name'] = item_name(item_id_str, f"(não identificado - {item_id_str})")
+                page_items.append(item)
+            total += 1
+        return page_items, total
+
+    requested = int(page_number) if str(page_number or '').isdigit() and int(page_number) > 0 else 1
+    page_items, total = collect(requested)
+
+    # Paginator sobre um range: só o total é necessário para calcular as páginas
+    page = Paginator(range(total), per_page).get_page(page_number)
+    if page.number != requested:
+        page_items, _ = collect(page.number)
+    page.object_list = page_items
+    return page
+
+
 @conditional_otp_required
 def retirar_item_servidor(request):
     db = LineageDB()
@@ -67,17 +95,8 @@ def retirar_item_servidor(request):
                 messages.error(request, 'O personagem precisa estar offline.')
                 return redirect('inventory:retirar_item')
 
-            all_items = TransferFromCharToWallet.list_items(char_id)
-            itens_data = get_itens_json()
-
-            # Substitui item_id pelo item_name
-            for item in all_items:
-                item_id_str = str(item['item_type'])
-                item_name = itens_data.get(item_id_str, [f"(não identificado - {item_id_str})"])[0]
-                item['name'] = item_name
-
-            paginator = Paginator(all_items, 10)  # 10 itens por página
-            items = paginator.get_page(page_number)
+            # Percorre os itens em stream e mantém em memória apenas a página pedida
+            items = _paginate_item_stream(char_id, page_number, per_page=10)
 
         except Exception as e:
             messages.error(request, f'Erro ao buscar o inventário: {str(e)}')
@@ -126,7 +145,7 @@ def retirar_item_servidor(request):
             inventory=inventory,
             item_id=item_id,
             enchant=item_status['enchant'],
-            defaults={'item_name': itens_data.get(str(item_id), [f"(não identificado - {str(item_id)})"])[0], 'quantity': 0}
+            defaults={'item_name': item_name(item_id, f"(não identificado - {str(item_id)})"), 'quantity': 0}
         )
 
         # Atualiza a quantidade
@@ -27,7 +27,7 @@ class ApiEndpointToggleAdmin(BaseModelAdmin):
         'api_info',
         # Monitoring endpoints
         'health_check', 'hourly_metrics', 'daily_metrics', 'performance_metrics',
-        'slow_queries', 'cache_stats',
+        'slow_queries', 'cache_stats', 'query_stats',
         # Administration endpoints
         'api_config', 'api_config_panel',
     ]
@@ -0,0 +1,343 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from apps.lineage.server.database import LineageDB, CapturedQuery, QueryCaptureAborted, capture_queries
+from apps.lineage.server.utils.cache import (
+    make_cache_key, convert_rowmapping_to_dict, asingle_flight, call_named, swr_lookup,
+)
+from apps.lineage.server.utils.profiler import current_query_name
+from utils.metrics import instrument_pool
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+except ImportError:  # pragma: no cover - extensão asyncio indisponível
+    create_async_engine = None
+    AsyncEngine = Any
+
+
+class AsyncLineageDB:
+    """
+    Versão assíncrona do LineageDB (SQLAlchemy async engine + driver aiomysql).
+
+    Compartilha com o LineageDB síncrono o cache de statements, o cache de resultados
+    e o circuit breaker, então os dois lados enxergam o mesmo estado do banco.
+
+    Os pools do asyncio ficam presos ao event loop que os criou: por isso é mantido
+    um conjunto de engines por loop (daphne/uvicorn usam um loop só; o runserver/WSGI
+    cria um loop por requisição e o engine é descartado junto com ele).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(AsyncLineageDB, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.sync_db = LineageDB()
+        self.enabled = self.sync_db.enabled and create_async_engine is not None
+        self.driver = os.getenv("LINEAGE_DB_ASYNC_DRIVER", "aiomysql")
+        # loop -> (primário, [réplicas], índice round-robin)
+        self._engines: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, List[Any]]" = weakref.WeakKeyDictionary()
+        self._engines_lock = threading.Lock()
+
+        if self.sync_db.enabled and create_async_engine is None:
+            print("⚠️ SQLAlchemy asyncio indisponível; AsyncLineageDB desativado")
+
+        self._initialized = True
+
+    def _build_url(self, host: str, port: str) -> str:
+        user = os.getenv("LINEAGE_DB_USER")
+        password = os.getenv("LINEAGE_DB_PASSWORD")
+        dbname = os.getenv("LINEAGE_DB_NAME")
+        return f"mysql+{self.driver}://{user}:{password}@{host}:{port}/{dbname}"
+
+    def _create_engines(self) -> List[Any]:
+        options = self.sync_db._engine_options()
+        primary = create_async_engine(
+            self._build_url(os.getenv("LINEAGE_DB_HOST"), os.getenv("LINEAGE_DB_PORT", "3306")),
+            **options,
+        )
+        self.sync_db.profiler.instrument(primary.sync_engine)
+        instrument_pool(primary.sync_engine, count_size=False)
+
+        replicas = []
+        default_port = os.getenv("LINEAGE_DB_PORT", "3306")
+        replica_user = os.getenv("LINEAGE_DB_REPLICA_USER", os.getenv("LINEAGE_DB_USER"))
+        replica_password = os.getenv("LINEAGE_DB_REPLICA_PASSWORD", os.getenv("LINEAGE_DB_PASSWORD"))
+        for replica in [r.strip() for r in os.getenv("LINEAGE_DB_REPLICAS", "").split(",") if r.strip()]:
+            host, _, port = replica.partition(":")
+            port = port or default_port
+            url = f"mysql+{self.driver}://{replica_user}:{replica_password}@{host}:{port}/{os.getenv('LINEAGE_DB_NAME')}"
+            try:
+                engine = create_async_engine(url, **options)
+                self.sync_db.profiler.instrument(engine.sync_engine)
+                instrument_pool(engine.sync_engine, count_size=False)
+                replicas.append(engine)
+            except Exception as e:
+                print(f"❌ Falha ao configurar réplica Lineage (async) {host}:{port}: {e}")
+
+        return [primary, replicas, 0]
+
+    def _get_engines(self) -> Optional[List[Any]]:
+        if not self.enabled:
+            return None
+        loop = asyncio.get_running_loop()
+        engines = self._engines.get(loop)
+        if engines is None:
+            with self._engines_lock:
+                engines = self._engines.get(loop)
+                if engines is None:
+                    try:
+                        engines = self._create_engines()
+                    except ImportError as e:
+                        # Driver assíncrono não instalado: desativa em vez de tentar a cada chamada
+                        print(f"❌ Driver assíncrono '{self.driver}' indisponível, AsyncLineageDB desativado: {e}")
+                        self.enabled = False
+                        return None
+                    except Exception as e:
+                        print(f"❌ Falha ao conectar ao banco Lineage (async): {e}")
+                        return None
+                    self._engines[loop] = engines
+        return engines
+
+    def _get_engine(self, use_primary: bool = True) -> Optional["AsyncEngine"]:
+        engines = self._get_engines()
+        if engines is None:
+            return None
+        primary, replicas, index = engines
+        if use_primary or not replicas:
+            return primary
+        # Sem lock: o estado é por loop e o loop é single-thread
+        engines[2] = (index + 1) % len(replicas)
+        return replicas[index % len(replicas)]
+
+    def _is_primary(self, engine) -> bool:
+        engines = self._get_engines()
+        return engines is not None and engine is engines[0]
+
+    async def _probe(self) -> Optional[bool]:
+        """True/False pela conexão; None quando não há engine (driver ausente, configuração inválida)"""
+        engine = self._get_engine()
+        if engine is None:
+            return None
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return True
+        except SQLAlchemyError as e:
+            print(f"❌ Conexão perdida: {e}")
+            return False
+
+    async def is_connected(self) -> bool:
+        """
+        Usa o estado cacheado do monitor de saúde; quando expirado, faz o probe
+        de forma assíncrona em vez de bloquear o event loop.
+        """
+        if not self.enabled:
+            return False
+        state = self.sync_db.health.cached_state()
+        if state is not None:
+            return state
+        connected = await self._probe()
+        if connected is None:
+            # Problema local do AsyncLineageDB: não abre o circuito compartilhado com o LineageDB
+            return False
+        return self.sync_db.health.report_probe(connected)
+
+    async def _execute(self, query: str, params: Dict[str, Any], write: bool = False, use_primary: bool = False,
+                       prepared: Optional[Tuple[Any, str, Dict[str, Any]]] = None):
+        if not self.enabled:
+            return None
+        if not self.sync_db.health.allow_request():
+            return None
+        engine = self._get_engine(use_primary=write or use_primary)
+        if engine is None:
+            print("⚠️ Sem conexão com o banco")
+            return None
+        try:
+            stmt, _, normalized_params = prepared or self.sync_db._prepare(query, params)
+            if write:
+                async with engine.begin() as conn:
+                    result = await conn.execute(stmt, normalized_params)
+            else:
+                async with engine.connect() as conn:
+                    result = await conn.execute(stmt, normalized_params)
+                    result = result.mappings().all()
+            if self._is_primary(engine):
+                self.sync_db.health.record_success()
+            return result
+        except SQLAlchemyError as e:
+            print(f"❌ Erro na execução (async): {e}")
+            if self._is_primary(engine):
+                self.sync_db._record_error(e, self.sync_db.engine)
+            return None
+
+    async def select(self, query: str, params: Dict[str, Any] = {}, use_cache: bool = False,
+                     cache_ttl: Optional[int] = None, use_primary: bool = False) -> List[Dict]:
+        if not self.enabled:
+            return []
+        params = params or {}
+        prepared = self.sync_db._prepare(query, params)
+        _, query_exp, params_exp = prepared
+        param_tuple = tuple(sorted(params_exp.items()))
+        if use_cache:
+            cached = self.sync_db._get_cache(query_exp, param_tuple)
+            if cached is not None:
+                return cached
+
+        rows = await self._execute(query, params, use_primary=use_primary, prepared=prepared)
+        if rows is None:
+            return []
+
+        if use_cache:
+            self.sync_db._set_cache(query_exp, param_tuple, rows, ttl=cache_ttl)
+        return rows
+
+    async def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute_and_get(query, params, "lastrowid")
+
+    async def update(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute_and_get(query, params, "rowcount")
+
+    async def delete(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
+        return await self._execute_and_get(query, params, "rowcount")
+
+    async def _execute_and_get(self, query: str, params: Dict[str, Any], attr: str) -> Optional[int]:
+        result = await self._execute(query, params or {}, write=True)
+        if result is None:
+            return None
+        return getattr(result, attr, None)
+
+    async def execute_raw(self, query: str, params: Dict[str, Any] = {}) -> bool:
+        if not self.enabled:
+            return False
+        return await self._execute(query, params or {}, write=True) is not None
+
+    async def dispose(self):
+        """Fecha os pools do event loop atual."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        engines = self._engines.pop(loop, None)
+        if engines:
+            primary, replicas, _ = engines
+            for engine in [primary, *replicas]:
+                await engine.dispose()
+
+
+class AsyncQueryProxy:
+    """
+    Versão assíncrona de uma classe de query (LineageStats, LineageServices...).
+
+    Métodos marcados com @cache_lineage_result(async_capturable=True) rodam em modo de captura:
+    o SQL e os parâmetros que eles passariam ao LineageDB.select() são executados pelo
+    AsyncLineageDB. Os demais (mais de uma consulta, pós-processamento, escritas) rodam a
+    versão síncrona em uma thread (sync_to_async); a captura é opt-in porque um método com
+    vários select() poderia devolver só o CapturedQuery de um deles.
+    O cache do Django usa a mesma chave do @cache_lineage_result.
+    """
+
+    def __init__(self, class_name: str):
+        self.class_name = class_name
+        self._query_class = None
+
+    @property
+    def query_class(self):
+        if self._query_class is None:
+            from utils.dynamic_import import get_query_class
+            self._query_class = get_query_class(self.class_name)
+        return self._query_class
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.query_class, name)
+
+        async def call(*args, **kwargs):
+            return await self._call(method, args, kwargs)
+
+        call.__name__ = name
+        return call
+
+    async def _call(self, method, args, kwargs):
+        func = getattr(method, "__wrapped__", None)
+        if func is None:
+            return await sync_to_async(method, thread_sensitive=False)(*args, **kwargs)
+
+        async def compute():
+            captured = None
+            # Sem o AsyncLineageDB (driver assíncrono ausente) tudo roda na versão síncrona
+            if getattr(method, "async_capturable", False) and AsyncLineageDB().enabled:
+                try:
+                    with capture_queries():
+                        captured = func(*args, **kwargs)
+                except QueryCaptureAborted:
+                    captured = None
+
+            if not isinstance(captured, CapturedQuery):
+                # Método não marcado ou que não chegou ao select() (ex.: get_crests sem ids):
+                # usa a implementação síncrona. Leituras cacheadas
+                # rodam sem o cache do decorator (o single-flight já está aqui); escritas passam pelo
+                # decorator para invalidar as tags.
+                if getattr(method, "cache_enabled", False):
+                    result = await sync_to_async(call_named, thread_sensitive=False)(func, *args, **kwargs)
+                else:
+                    result = await sync_to_async(method, thread_sensitive=False)(*args, **kwargs)
+                return convert_rowmapping_to_dict(result)
+
+            token = current_query_name.set(func.__qualname__)
+            try:
+                rows = await AsyncLineageDB().select(
+                    captured.query,
+                    captured.params,
+                    use_cache=captured.use_cache,
+                    cache_ttl=captured.cache_ttl,
+                    use_primary=captured.use_primary,
+                )
+            finally:
+                current_query_name.reset(token)
+            return convert_rowmapping_to_dict(rows)
+
+        if not getattr(method, "cache_enabled", False):
+            return await compute()
+        key = make_cache_key(func, args, kwargs)
+        tags = method.cache_tags(*args, **kwargs)
+        if getattr(method, "stale_while_revalidate", False):
+            entry = await sync_to_async(swr_lookup, thread_sensitive=False)(key, func, args, kwargs, tags)
+            if entry is not None:
+                return entry.value
+        return await asingle_flight(key, compute, getattr(method, "cache_timeout", 300), tags)
+
+
+AsyncLineageStats = AsyncQueryProxy("LineageStats")
+
+
+async def ais_lineage_connected() -> bool:
+    """
+    Banco do Lineage disponível para as views assíncronas. Sem o AsyncLineageDB (driver
+    assíncrono ausente ou desativado) usa o LineageDB síncrono em uma thread, e as consultas
+    do AsyncLineageStats também caem para a versão síncrona.
+    """
+    db = AsyncLineageDB()
+    if db.enabled:
+        connected = await db.is_connected()
+        # O primeiro acesso pode desativar o AsyncLineageDB (driver ausente)
+        if connected or db.enabled:
+            return connected
+    return await sync_to_async(LineageDB().is_connected, thread_sensitive=False)()
@@ -1,14 +1,73 @@
 import os
-import time
+import itertools
 import threading
-from typing import Any, Dict, Tuple, List, Optional
+import contextvars
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Tuple, List, Optional, Iterator, NamedTuple
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, DisconnectionError, TimeoutError as PoolTimeoutError
 from sqlalchemy.engine import Engine, Result
+from sqlalchemy.sql.elements import TextClause
+
+from apps.lineage.server.utils.result_cache import LineageResultCache
+from apps.lineage.server.utils.health import LineageHealthMonitor
+from apps.lineage.server.utils.profiler import LineageQueryProfiler
+from utils.metrics import instrument_pool
 
 load_dotenv()
 
+STATEMENT_CACHE_SIZE = int(os.getenv("LINEAGE_DB_STATEMENT_CACHE_SIZE", "512"))
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_statement(query: str, list_arity: Tuple[Tuple[str, int], ...]) -> Tuple[str, TextClause]:
+    """
+    Expande os parâmetros de lista (":ids" -> "(:ids_0, :ids_1, ...)") e cria o TextClause.
+    O resultado é cacheado pela combinação texto da query + aridade de cada lista.
+    """
+    for key, size in list_arity:
+        placeholders = ", ".join(f":{key}_{i}" for i in range(size))
+        query = query.replace(f":{key}", f"({placeholders})")
+    return query, text(query)
+
+
+class CapturedQuery(NamedTuple):
+    """Consulta registrada pelo select() em modo de captura (ver capture_queries)."""
+    query: str
+    params: Dict[str, Any]
+    use_cache: bool
+    cache_ttl: Optional[int]
+    use_primary: bool
+
+
+class QueryCaptureAborted(Exception):
+    """O método tentou escrever ou abrir um stream enquanto as consultas estavam sendo capturadas."""
+
+
+_capture_queries = contextvars.ContextVar("lineage_capture_queries", default=False)
+
+
+@contextmanager
+def capture_queries():
+    """
+    Enquanto ativo, LineageDB.select() não executa nada: devolve um CapturedQuery
+    com o SQL e os parâmetros. Escritas levantam QueryCaptureAborted.
+    Usado pelo AsyncLineageStats para reaproveitar o SQL das classes de query.
+    """
+    token = _capture_queries.set(True)
+    try:
+        yield
+    finally:
+        _capture_queries.reset(token)
+
+
+def _abort_if_capturing():
+    if _capture_queries.get():
+        raise QueryCaptureAborted()
+
+
 class LineageDB:
     _instance = None
     _lock = threading.Lock()
@@ -26,8 +85,18 @@ class LineageDB:
             return
 
         self.engine: Optional[Engine] = None
-        self.cache: Dict[Tuple[str, Tuple[Any, ...]], Tuple[List[Dict], float]] = {}
-        self.cache_ttl = 60  # segundos
+        self.read_engines: List[Engine] = []
+        self._read_cycle = None
+        self._read_lock = threading.Lock()
+        self.cache_ttl = int(os.getenv("LINEAGE_DB_CACHE_TTL", "60"))  # segundos
+        self.cache = LineageResultCache(
+            max_entries=int(os.getenv("LINEAGE_DB_CACHE_MAX_ENTRIES", "1000")),
+            max_bytes=int(os.getenv("LINEAGE_DB_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            default_ttl=self.cache_ttl,
+        )
+        self.health = LineageHealthMonitor.from_env(self._probe)
+        self.profiler = LineageQueryProfiler.from_env()
+        self.stream_chunk_size = int(os.getenv("LINEAGE_DB_STREAM_CHUNK_SIZE", "1000"))
         self.enabled = os.getenv("LINEAGE_DB_ENABLED", "false").lower() == "true"
         
         if self.enabled:
@@ -37,6 +106,22 @@ class LineageDB:
             
         self._initialized = True
 
+    def _engine_options(self) -> Dict[str, Any]:
+        """
+        Parâmetros do pool de conexões, configuráveis via variáveis de ambiente.
+        """
+        return {
+            "echo": False,
+            "pool_pre_ping": True,
+            "pool_size": int(os.getenv("LINEAGE_DB_POOL_SIZE", "5")),
+            "max_overflow": int(os.getenv("LINEAGE_DB_MAX_OVERFLOW", "10")),
+            "pool_recycle": int(os.getenv("LINEAGE_DB_POOL_RECYCLE", "1800")),
+            "pool_timeout": int(os.getenv("LINEAGE_DB_POOL_TIMEOUT", "30")),
+            "connect_args": {
+                "connect_timeout": int(os.getenv("LINEAGE_DB_CONNECT_TIMEOUT", "10")),
+            },
+        }
+
     def _connect(self):
         try:
             user = os.getenv("LINEAGE_DB_USER")
@@ -46,73 +131,129 @@ class LineageDB:
             dbname = os.getenv("LINEAGE_DB_NAME")
 
             url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{dbname}"
-            self.engine = create_engine(url, echo=False, pool_pre_ping=True)
+            self.engine = create_engine(url, **self._engine_options())
+            self.profiler.instrument(self.engine)
+            instrument_pool(self.engine)
             print("✅ Conectado ao banco Lineage com SQLAlchemy")
         except Exception as e:
             print(f"❌ Falha ao conectar ao banco Lineage: {e}")
             self.engine = None
+            return
+
+        self._connect_replicas(user, password, port, dbname)
+
+    def _connect_replicas(self, user, password, default_port, dbname):
+        """
+        Cria engines para as réplicas de leitura listadas em LINEAGE_DB_REPLICAS
+        (formato: host1:porta,host2). Usuário e senha podem ser sobrescritos por
+        LINEAGE_DB_REPLICA_USER / LINEAGE_DB_REPLICA_PASSWORD.
+        """
+        replicas = [r.strip() for r in os.getenv("LINEAGE_DB_REPLICAS", "").split(",") if r.strip()]
+        if not replicas:
+            return
+
+        user = os.getenv("LINEAGE_DB_REPLICA_USER", user)
+        password = os.getenv("LINEAGE_DB_REPLICA_PASSWORD", password)
+
+        for replica in replicas:
+            host, _, port = replica.partition(":")
+            port = port or default_port
+            try:
+                url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{dbname}"
+                engine = create_engine(url, **self._engine_options())
+                self.profiler.instrument(engine)
+                instrument_pool(engine)
+                self.read_engines.append(engine)
+            except Exception as e:
+                print(f"❌ Falha ao configurar réplica Lineage {host}:{port}: {e}")
+
+        if self.read_engines:
+            self._read_cycle = itertools.cycle(self.read_engines)
+            print(f"✅ {len(self.read_engines)} réplica(s) de leitura do banco Lineage configurada(s)")
+
+    def _get_read_engine(self) -> Optional[Engine]:
+        """
+        Retorna a próxima réplica de leitura (round-robin) ou o primário se não houver réplicas.
+        """
+        if not self._read_cycle:
+            return self.engine
+        with self._read_lock:
+            return next(self._read_cycle)
+
+    def _prepare(self, query: str, params: Dict[str, Any]) -> Tuple[TextClause, str, Dict[str, Any]]:
+        """
+        Retorna (statement compilado, SQL expandido, parâmetros expandidos).
+        O parse/rewrite do SQL vem do cache de statements; aqui só os valores são expandidos.
+        """
+        list_arity = tuple((key, len(val)) for key, val in params.items() if isinstance(val, list))
+        query, stmt = _compile_statement(query, list_arity)
+        if not list_arity:
+            return stmt, query, dict(params)
 
-    def _normalize_params(self, query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
         new_params = {}
         for key, val in params.items():
             if isinstance(val, list):
-                placeholders = []
                 for i, item in enumerate(val):
-                    new_key = f"{key}_{i}"
-                    placeholders.append(f":{new_key}")
-                    new_params[new_key] = item
-                query = query.replace(f":{key}", f"({', '.join(placeholders)})")
+                    new_params[f"{key}_{i}"] = item
             else:
                 new_params[key] = val
+        return stmt, query, new_params
+
+    def _normalize_params(self, query: str, params: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        _, query, new_params = self._prepare(query, params)
         return query, new_params
 
     def _get_cache(self, query: str, params: Tuple) -> Optional[List[Dict]]:
-        key = (query, params)
-        if key in self.cache:
-            data, timestamp = self.cache[key]
-            if time.time() - timestamp < self.cache_ttl:
-                print("⚡ Consulta retornada do cache")
-                return data
-            else:
-                del self.cache[key]
-        return None
+        return self.cache.get((query, params))
 
-    def _set_cache(self, query: str, params: Tuple, data: List[Dict]):
-        self.cache[(query, params)] = (data, time.time())
+    def _set_cache(self, query: str, params: Tuple, data: List[Dict], ttl: Optional[int] = None):
+        self.cache.set((query, params), data, ttl=ttl)
 
-    def _safe_execute_read(self, query: str, params: Dict[str, Any]) -> Optional[Result]:
+    def _safe_execute_read(self, query: str, params: Dict[str, Any], use_primary: bool = False,
+                           prepared: Optional[Tuple[TextClause, str, Dict[str, Any]]] = None) -> Optional[Result]:
         if not self.enabled:
             return None
         if not self.engine:
             print("⚠️ Sem conexão com o banco")
             return None
+        if not self.health.allow_request():
+            return None
+        engine = self.engine if use_primary else self._get_read_engine()
         try:
-            query, normalized_params = self._normalize_params(query, params)
-            with self.engine.connect() as conn:
-                stmt = text(query)
-                return conn.execute(stmt, normalized_params)
+            stmt, _, normalized_params = prepared or self._prepare(query, params)
+            with engine.connect() as conn:
+                result = conn.execute(stmt, normalized_params)
+            self._record_success(engine)
+            return result
         except SQLAlchemyError as e:
             print(f"❌ Erro na execução: {e}")
+            self._record_error(e, engine)
             return None
 
     def _safe_execute_write(self, query: str, params: Dict[str, Any]) -> Optional[Result]:
+        _abort_if_capturing()
         if not self.enabled:
             return None
         if not self.engine:
             print("⚠️ Sem conexão com o banco")
             return None
+        if not self.health.allow_request():
+            return None
         try:
-            query, normalized_params = self._normalize_params(query, params)
+            stmt, _, normalized_params = self._prepare(query, params)
             with self.engine.begin() as conn:
-                stmt = text(query)
-                return conn.execute(stmt, normalized_params)
+                result = conn.execute(stmt, normalized_params)
+            self._record_success(self.engine)
+            return result
         except SQLAlchemyError as e:
             print(f"❌ Erro na execução: {e}")
+            self._record_error(e, self.engine)
             return None
 
-    def is_connected(self) -> bool:
-        if not self.enabled:
-            return False
+    def _probe(self) -> bool:
+        """
+        Probe de saúde (SELECT 1) usado pelo LineageHealthMonitor.
+        """
         if not self.engine:
             return False
         try:
@@ -123,26 +264,96 @@ class LineageDB:
             print(f"❌ Conexão perdida: {e}")
             return False
 
-    def select(self, query: str, params: Dict[str, Any] = {}, use_cache: bool = False) -> Optional[List[Dict]]:
+    def _record_success(self, engine: Engine):
+        if engine is self.engine:
+            self.health.record_success()
+
+    def _record_error(self, error: SQLAlchemyError, engine: Engine):
+        # Apenas erros de conectividade contam para o circuit breaker (não erros de SQL)
+        if engine is not self.engine:
+            return
+        if isinstance(error, (OperationalError, DisconnectionError, PoolTimeoutError)) or \
+                getattr(error, "connection_invalidated", False):
+            self.health.record_failure()
+
+    def is_connected(self) -> bool:
+        """
+        Lê o estado cacheado do monitor de saúde em vez de abrir uma conexão a cada chamada.
+        """
+        if not self.enabled:
+            return False
+        if not self.engine:
+            return False
+        return self.health.is_available()
+
+    def select(self, query: str, params: Dict[str, Any] = {}, use_cache: bool = False,
+               cache_ttl: Optional[int] = None, use_primary: bool = False) -> Optional[List[Dict]]:
+        """
+        Executa uma consulta de leitura. Por padrão é distribuída entre as réplicas
+        configuradas; use_primary=True força a leitura no primário (ex.: ler logo após escrever).
+        """
+        if _capture_queries.get():
+            return CapturedQuery(query, params or {}, use_cache, cache_ttl, use_primary)
         if not self.enabled:
             return []
         params = params or {}
-        query_exp, params_exp = self._normalize_params(query, params)
+        prepared = self._prepare(query, params)
+        _, query_exp, params_exp = prepared
         param_tuple = tuple(sorted(params_exp.items()))
         if use_cache:
             cached = self._get_cache(query_exp, param_tuple)
             if cached is not None:
                 return cached
 
-        result = self._safe_execute_read(query, params)
+        result = self._safe_execute_read(query, params, use_primary=use_primary, prepared=prepared)
         if result is None:
             return []
 
         rows = result.mappings().all()
         if use_cache:
-            self._set_cache(query_exp, param_tuple, rows)
+            self._set_cache(query_exp, param_tuple, rows, ttl=cache_ttl)
         return rows
 
+    def select_iter(self, query: str, params: Dict[str, Any] = {}, chunk_size: Optional[int] = None,
+                    use_primary: bool = False) -> Iterator[Dict]:
+        """
+        Itera sobre o resultado de uma consulta usando cursor no servidor (stream_results),
+        buscando `chunk_size` linhas por vez. Mantém o uso de memória constante em tabelas grandes.
+        A conexão fica aberta até o iterador ser consumido (ou fechado).
+        """
+        for chunk in self.select_chunks(query, params, chunk_size=chunk_size, use_primary=use_primary):
+            yield from chunk
+
+    def select_chunks(self, query: str, params: Dict[str, Any] = {}, chunk_size: Optional[int] = None,
+                      use_primary: bool = False) -> Iterator[List[Dict]]:
+        """
+        Igual ao select_iter, mas entrega as linhas em lotes de até `chunk_size`.
+        """
+        _abort_if_capturing()
+        if not self.enabled:
+            return
+        if not self.engine:
+            print("⚠️ Sem conexão com o banco")
+            return
+
+        if not self.health.allow_request():
+            return
+
+        chunk_size = chunk_size or self.stream_chunk_size
+        engine = self.engine if use_primary else self._get_read_engine()
+        stmt, _, normalized_params = self._prepare(query, params or {})
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(
+                    stmt, normalized_params
+                )
+                for partition in result.mappings().partitions(chunk_size):
+                    yield [dict(row) for row in partition]
+        except SQLAlchemyError as e:
+            print(f"❌ Erro na execução (stream): {e}")
+            self._record_error(e, engine)
+            return
+
     def insert(self, query: str, params: Dict[str, Any] = {}) -> Optional[int]:
         if not self.enabled:
             return None
@@ -159,6 +370,42 @@ class LineageDB:
             return None
         return self._execute_and_get(query, params, "rowcount")
 
+    def insert_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Executa o mesmo INSERT para cada dicionário de parâmetros (executemany),
+        em uma única transação. Retorna o total de linhas afetadas.
+        """
+        return self._execute_many(query, params_list)
+
+    def update_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        return self._execute_many(query, params_list)
+
+    def delete_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        return self._execute_many(query, params_list)
+
+    def _execute_many(self, query: str, params_list: List[Dict[str, Any]]) -> Optional[int]:
+        _abort_if_capturing()
+        if not self.enabled:
+            return None
+        params_list = list(params_list or [])
+        if not params_list:
+            return 0
+        if not self.engine:
+            print("⚠️ Sem conexão com o banco")
+            return None
+        if not self.health.allow_request():
+            return None
+        try:
+            _, stmt = _compile_statement(query, ())
+            with self.engine.begin() as conn:
+                result = conn.execute(stmt, params_list)
+            self._record_success(self.engine)
+            return result.rowcount
+        except SQLAlchemyError as e:
+            print(f"❌ Erro na execução em lote: {e}")
+            self._record_error(e, self.engine)
+            return None
+
     def _execute_and_get(self, query: str, params: Dict[str, Any], attr: str) -> Optional[int]:
         result = self._safe_execute_write(query, params)
         if result is None:
@@ -174,6 +421,7 @@ class LineageDB:
         """
         Retorna uma lista com os nomes das colunas da tabela.
         """
+        _abort_if_capturing()
         if not self.enabled:
             return []
         if not self.engine:
@@ -191,3 +439,57 @@ class LineageDB:
 
     def clear_cache(self):
         self.cache.clear()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do pool do primário e de cada réplica de leitura.
+        """
+        def describe(engine: Engine) -> Dict[str, Any]:
+            pool = engine.pool
+            return {
+                "host": engine.url.host,
+                "size": pool.size() if hasattr(pool, "size") else None,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            }
+
+        if not self.engine:
+            return {"primary": None, "replicas": []}
+        return {
+            "primary": describe(self.engine),
+            "replicas": [describe(engine) for engine in self.read_engines],
+        }
+
+    def health_stats(self) -> Dict[str, Any]:
+        """
+        Retorna o estado do circuit breaker / monitor de saúde do banco.
+        """
+        return self.health.stats()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache de resultados (hits, misses, evictions...)
+        e do cache de statements compilados.
+        """
+        stats = self.cache.stats()
+        info = _compile_statement.cache_info()
+        stats["statements"] = {
+            "entries": info.currsize,
+            "max_entries": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+        }
+        return stats
+
+    def query_stats(self, order_by: str = "total_ms", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Retorna o profiling por consulta (contagem, latências, histograma) e as últimas consultas lentas.
+        Os contadores são do processo atual.
+        """
+        return {
+            "summary": self.profiler.summary(),
+            "queries": self.profiler.stats(order_by=order_by, limit=limit),
+            "slow_queries": self.profiler.slow_queries(limit=limit),
+        }
+
@@ -64,29 +64,41 @@ class Command(BaseCommand):
             
         return login if login else None
 
-    def get_l2_accounts(self):
-        """Busca contas do L2 com email válido"""
+    L2_ACCOUNTS_FILTER = """
+        FROM accounts 
+        WHERE l2email IS NOT NULL 
+        AND l2email != '' 
+        AND l2email != 'NULL' 
+        AND LENGTH(TRIM(l2email)) > 0
+    """
+
+    def count_l2_accounts(self):
+        """Conta as contas do L2 com email válido"""
         try:
-            sql = """
-                SELECT login, 
-                       l2email as email,
-                       accessLevel, 
-                       created_time
-                FROM accounts 
-                WHERE l2email IS NOT NULL 
-                AND l2email != '' 
-                AND l2email != 'NULL' 
-                AND LENGTH(TRIM(l2email)) > 0
-                ORDER BY created_time ASC
-            """
-            
-            accounts = LineageDB().select(sql)
-            return accounts
+            result = LineageDB().select(f"SELECT COUNT(*) AS total {self.L2_ACCOUNTS_FILTER}")
+            return int(result[0]['total']) if result else 0
+        except Exception as e:
+            self.stderr.write(
+                self.style.ERROR(f'Erro ao contar contas do L2: {e}')
+            )
+            return 0
+
+    def get_l2_accounts(self, chunk_size=1000):
+        """Busca contas do L2 com email válido (em stream, sem carregar a tabela inteira)"""
+        sql = f"""
+            SELECT login, 
+                   l2email as email,
+                   accessLevel, 
+                   created_time
+            {self.L2_ACCOUNTS_FILTER}
+            ORDER BY created_time ASC
+        """
+        try:
+            yield from LineageDB().select_iter(sql, chunk_size=chunk_size)
         except Exception as e:
             self.stderr.write(
                 self.style.ERROR(f'Erro ao buscar contas do L2: {e}')
             )
-            return []
 
     def check_email_exists(self, email):
         """Verifica se o email já existe no L2JPremium"""
@@ -124,10 +136,10 @@ class Command(BaseCommand):
             )
             return False, None
 
-    def process_accounts(self, l2_accounts, dry_run, prefix, password_length, batch_size):
-        """Processa as contas do L2"""
+    def process_accounts(self, l2_accounts, dry_run, prefix, password_length, batch_size, total_expected=0):
+        """Processa as contas do L2 em lotes, à medida que são lidas do banco"""
         stats = {
-            'total': len(l2_accounts),
+            'total': 0,
             'created': 0,
             'skipped': 0,
             'errors': 0,
@@ -136,13 +148,16 @@ class Command(BaseCommand):
             'existing_usernames': 0,
         }
 
-        # Processa emails duplicados dentro do L2
-        email_count = {}
-        processed_accounts = []
-        
-        self.stdout.write('🔄 Processando emails duplicados no L2...')
-        
+        # Emails já vistos no L2 (para tratar duplicados)
+        seen_emails = set()
+        batch = []
+        batch_num = 0
+        total_batches = (total_expected + batch_size - 1) // batch_size if total_expected else '?'
+
+        self.stdout.write(f'🔄 Iniciando processamento em lotes de {batch_size}...')
+
         for account in l2_accounts:
+            stats['total'] += 1
             login = account.get('login')
             email = account.get('email')
             access_level = account.get('accessLevel', 0)
@@ -160,86 +175,87 @@ class Command(BaseCommand):
                 continue
 
             # Trata emails duplicados no L2
-            if email in email_count:
-                email_count[email] += 1
+            if email in seen_emails:
                 random_prefix = self.generate_random_prefix()
                 email = f"{random_prefix}_{email}"
                 stats['l2_duplicates'] += 1
                 if dry_run:
                     self.stdout.write(f'🔄 Email duplicado no L2: {login} → {email}')
             else:
-                email_count[email] = 1
+                seen_emails.add(email)
 
-            processed_accounts.append({
+            batch.append({
                 'login': login,
                 'email': email,
                 'access_level': access_level,
                 'created_time': created_time
             })
 
-        self.stdout.write(f'✅ Processadas {len(processed_accounts)} contas válidas')
+            if len(batch) >= batch_size:
+                batch_num += 1
+                self.process_batch(batch, batch_num, total_batches, dry_run, prefix, password_length, stats)
+                batch = []
 
-        # Processa em lotes
-        self.stdout.write(f'🔄 Iniciando processamento em lotes de {batch_size}...')
-        
-        for i in range(0, len(processed_accounts), batch_size):
-            batch = processed_accounts[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(processed_accounts) + batch_size - 1) // batch_size
-            
-            self.stdout.write(f'📦 Lote {batch_num}/{total_batches} ({len(batch)} contas)')
-            
-            for account in batch:
-                login = account['login']
-                email = account['email']
-                access_level = account['access_level']
-                created_time = account['created_time']
-
-                # Verifica se username já existe
-                if self.check_username_exists(login):
-                    stats['existing_usernames'] += 1
+        if batch:
+            batch_num += 1
+            self.process_batch(batch, batch_num, total_batches, dry_run, prefix, password_length, stats)
+
+        self.stdout.write(f'✅ Processadas {stats["total"] - stats["skipped"]} contas válidas')
+
+        return stats
+
+    def process_batch(self, batch, batch_num, total_batches, dry_run, prefix, password_length, stats):
+        """Cria os usuários de um lote de contas já validadas"""
+        self.stdout.write(f'📦 Lote {batch_num}/{total_batches} ({len(batch)} contas)')
+
+        for account in batch:
+            login = account['login']
+            email = account['email']
+            access_level = account['access_level']
+            created_time = account['created_time']
+
+            # Verifica se username já existe
+            if self.check_username_exists(login):
+                stats['existing_usernames'] += 1
+                if dry_run:
+                    self.stdout.write(f'⚠️  Username já existe: {login}')
+                stats['skipped'] += 1
+                continue
+
+            # Verifica se email já existe no L2JPremium
+            if self.check_email_exists(email):
+                email = f"{prefix}{email}"
+                stats['email_conflicts'] += 1
+                
+                if self.check_email_exists(email):
                     if dry_run:
-                        self.stdout.write(f'⚠️  Username já existe: {login}')
+                        self.stdout.write(f'⚠️  Email duplicado mesmo com prefixo: {email}')
                     stats['skipped'] += 1
                     continue
 
-                # Verifica se email já existe no L2JPremium
-                original_email = email
-                if self.check_email_exists(email):
-                    email = f"{prefix}{email}"
-                    stats['email_conflicts'] += 1
-                    
-                    if self.check_email_exists(email):
-                        if dry_run:
-                            self.stdout.write(f'⚠️  Email duplicado mesmo com prefixo: {email}')
-                        stats['skipped'] += 1
-                        continue
-
-                # Gera senha aleatória
-                password = self.generate_random_password(password_length)
+            # Gera senha aleatória
+            password = self.generate_random_password(password_length)
+            
+            if dry_run:
+                self.stdout.write(f'🔍 [TESTE] Criaria: {login} → {email}')
+                stats['created'] += 1
+            else:
+                # Cria usuário com transação
+                with transaction.atomic():
+                    success, user = self.create_l2jpremium_user(
+                        login, email, password, access_level, created_time
+                    )
                 
-                if dry_run:
-                    self.stdout.write(f'🔍 [TESTE] Criaria: {login} → {email}')
+                if success:
+                    self.stdout.write(f'✅ Criado: {login} → {email}')
                     stats['created'] += 1
-                else:
-                    # Cria usuário com transação
-                    with transaction.atomic():
-                        success, user = self.create_l2jpremium_user(
-                            login, email, password, access_level, created_time
-                        )
                     
-                    if success:
-                        self.stdout.write(f'✅ Criado: {login} → {email}')
-                        stats['created'] += 1
-                        
-                        # Log da senha para administradores
-                        if access_level and int(access_level) > 0:
-                            self.stdout.write(f'🔑 Senha para {login}: {password}')
-                    else:
-                        self.stdout.write(f'❌ Erro ao criar: {login} → {email}')
-                        stats['errors'] += 1
-
-        return stats
+                    # Log da senha para administradores
+                    if access_level and int(access_level) > 0:
+                        self.stdout.write(f'🔑 Senha para {login}: {password}')
+                else:
+                    self.stdout.write(f'❌ Erro ao criar: {login} → {email}')
+                    stats['errors'] += 1
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
@@ -259,16 +275,19 @@ class Command(BaseCommand):
 
         # Busca contas do L2
         self.stdout.write('📋 Buscando contas do L2...')
-        l2_accounts = self.get_l2_accounts()
+        total_accounts = self.count_l2_accounts()
         
-        if not l2_accounts:
+        if not total_accounts:
             self.stdout.write(self.style.WARNING('⚠️  Nenhuma conta encontrada no L2'))
             return
 
-        self.stdout.write(self.style.SUCCESS(f'✅ Encontradas {len(l2_accounts)} contas no L2'))
+        self.stdout.write(self.style.SUCCESS(f'✅ Encontradas {total_accounts} contas no L2'))
 
-        # Processa as contas
-        stats = self.process_accounts(l2_accounts, dry_run, prefix, password_length, batch_size)
+        # Processa as contas lendo o resultado em stream (memória constante)
+        l2_accounts = self.get_l2_accounts(chunk_size=max(batch_size, 1000))
+        stats = self.process_accounts(
+            l2_accounts, dry_run, prefix, password_length, batch_size, total_expected=total_accounts
+        )
 
         # Relatório final
         self.stdout.write('\n' + '='*60)
@@ -65,6 +65,7 @@ class ApiEndpointToggle(BaseModel):
     performance_metrics = models.BooleanField(default=True, verbose_name=_("Performance Metrics"))
     slow_queries = models.BooleanField(default=True, verbose_name=_("Slow Queries"))
     cache_stats = models.BooleanField(default=True, verbose_name=_("Cache Stats"))
+    query_stats = models.BooleanField(default=True, verbose_name=_("Query Stats"))
     
     # =========================== ADMINISTRATION ENDPOINTS ===========================
     api_config = models.BooleanField(default=True, verbose_name=_("API Config"))
@@ -129,6 +130,7 @@ class ApiEndpointToggle(BaseModel):
                 'performance_metrics': self.performance_metrics,
                 'slow_queries': self.slow_queries,
                 'cache_stats': self.cache_stats,
+                'query_stats': self.query_stats,
             },
             'administration': {
                 'api_config': self.api_config,
@@ -173,6 +175,7 @@ class ApiEndpointToggle(BaseModel):
             'performance_metrics': self.performance_metrics,
             'slow_queries': self.slow_queries,
             'cache_stats': self.cache_stats,
+            'query_stats': self.query_stats,
             'api_config': self.api_config,
             'api_config_panel': self.api_config_panel,
         }
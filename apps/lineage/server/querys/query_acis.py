@@ -13,7 +13,7 @@ class LineageStats:
         return LineageDB().select(sql, params=params, use_cache=use_cache)
     
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, async_capturable=True)
     def get_crests(ids, type='clan'):
         # Verifique se os IDs foram fornecidos
         if not ids:
@@ -41,13 +41,13 @@ class LineageStats:
         return LineageStats._run_query(sql, {"ids": tuple(ids)})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def players_online():
         sql = "SELECT COUNT(*) AS quant FROM characters WHERE online > 0 AND accesslevel = '0'"
         return LineageStats._run_query(sql)
     
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_pvp(limit=10):
         sql = """
             SELECT 
@@ -72,7 +72,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_pk(limit=10):
         sql = """
             SELECT 
@@ -97,7 +97,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_online(limit=10):
         sql = """
             SELECT 
@@ -122,7 +122,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_level(limit=10):
         sql = """
             SELECT 
@@ -146,7 +146,63 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    def ranking_snapshot_rows():
+        """
+        Todos os personagens elegíveis com os dados de PvP/PK/online/nível e clã, sem ORDER BY/LIMIT.
+        Usado pelo snapshot de rankings (utils/rankings.py), que ordena em memória.
+        """
+        sql = """
+            SELECT 
+                C.char_name, 
+                C.pvpkills, 
+                C.pkkills, 
+                C.online, 
+                C.onlinetime,
+                CS.level,
+                CS.exp,
+                CS.class_id AS base,
+                D.name AS clan_name,
+                C.clanid AS clan_id,
+                CD.ally_id AS ally_id
+            FROM characters C
+            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
+            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
+            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
+            WHERE C.accesslevel = '0'
+        """
+        return LineageDB().select_iter(sql)
+
+    @staticmethod
+    def character_index_rows(min_obj_id=None, obj_ids=None):
+        """
+        Dados do índice de busca de personagens (utils/character_index.py).
+        Sem filtros traz todos; com filtros traz só os personagens novos (id maior que `min_obj_id`),
+        os online e os `obj_ids` informados (que estavam online ou foram alterados pelo site).
+        """
+        delta_sql = ""
+        params = {}
+        if min_obj_id is not None:
+            delta_sql = "AND (C.obj_Id > :min_obj_id OR C.online = 1 OR C.obj_Id IN :obj_ids)"
+            params = {"min_obj_id": min_obj_id, "obj_ids": list(obj_ids or []) or [-1]}
+        sql = f"""
+            SELECT 
+                C.obj_Id AS char_id,
+                C.char_name,
+                C.online,
+                CS.level,
+                CS.class_id AS base,
+                D.name AS clan_name
+            FROM characters C
+            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
+            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
+            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
+            WHERE C.accesslevel = '0'
+            {delta_sql}
+        """
+        return LineageDB().select_iter(sql, params)
+
+    @staticmethod
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def top_adena(limit=10, adn_billion_item=0, value_item=1000000):
         item_bonus_sql = ""
         if adn_billion_item != 0:
@@ -187,7 +243,74 @@ class LineageStats:
         })
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    def adena_wealth_rows(adn_billion_item=0, value_item=1000000, min_object_id=None, owner_ids=None):
+        """
+        Adena (+ itens de bilhão convertidos) por personagem em uma única varredura agrupada de items.
+        Com `min_object_id` (modo delta), recalcula só os personagens online, os `owner_ids` informados
+        (online na execução anterior) e os donos de itens com object_id maior: a quantidade de uma
+        pilha de adena muda sem mudar o object_id, e isso só acontece com o personagem online.
+        Usado pelo índice de riqueza (utils/wealth.py).
+        """
+        delta_sql = ""
+        if min_object_id is not None:
+            delta_sql = """
+                AND (
+                    C.online = 1
+                    OR I.owner_id IN :owner_ids
+                    OR I.owner_id IN (
+                        SELECT DISTINCT I2.owner_id
+                        FROM items I2
+                        WHERE I2.object_id > :min_object_id AND I2.item_id IN ('57', :adn_billion_item)
+                    )
+                )
+            """
+        sql = f"""
+            SELECT 
+                I.owner_id,
+                SUM(CASE WHEN I.item_id = '57' THEN I.count ELSE 0 END)
+                    + SUM(CASE WHEN I.item_id = :adn_billion_item THEN I.count ELSE 0 END) * :value_item AS adenas,
+                MAX(I.object_id) AS max_object_id,
+                MAX(C.online) AS online
+            FROM items I
+            INNER JOIN characters C ON C.obj_Id = I.owner_id
+            WHERE C.accesslevel = '0'
+              AND I.item_id IN ('57', :adn_billion_item)
+              {delta_sql}
+            GROUP BY I.owner_id
+        """
+        return LineageDB().select_iter(sql, {
+            "adn_billion_item": adn_billion_item,
+            "value_item": value_item,
+            "min_object_id": min_object_id,
+            "owner_ids": list(owner_ids or []) or [-1],
+        })
+
+    @staticmethod
+    @cache_lineage_result(timeout=60, tags=["rankings"])
+    def adena_rank_characters(owner_ids):
+        """Dados de exibição dos personagens do topo do índice de riqueza."""
+        if not owner_ids:
+            return []
+        sql = """
+            SELECT 
+                C.obj_Id AS owner_id,
+                C.char_name,
+                C.online,
+                C.onlinetime,
+                CS.level,
+                D.name AS clan_name,
+                C.clanid AS clan_id,
+                CD.ally_id AS ally_id
+            FROM characters C
+            LEFT JOIN character_subclasses CS ON CS.char_obj_id = C.obj_Id AND CS.class_index = 0
+            LEFT JOIN clan_subpledges D ON D.clan_id = C.clanid AND D.sub_pledge_id = 0
+            LEFT JOIN clan_data CD ON CD.clan_id = C.clanid
+            WHERE C.obj_Id IN :owner_ids
+        """
+        return LineageStats._run_query(sql, {"owner_ids": list(owner_ids)})
+
+    @staticmethod
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_clans(limit=10):
         sql = """
             SELECT 
@@ -208,7 +331,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_ranking():
         sql = """
             SELECT 
@@ -229,7 +352,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_all_heroes():
         sql = """
             SELECT 
@@ -251,7 +374,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_current_heroes():
         sql = """
             SELECT 
@@ -282,7 +405,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def siege():
         sql = """
             SELECT 
@@ -303,7 +426,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def siege_participants(castle_id):
         sql = """
             SELECT 
@@ -346,7 +469,7 @@ class LineageStats:
 class LineageServices:
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}"])
     def find_chars(login):
         sql = """
             SELECT
@@ -394,7 +517,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{acc}", "char:{cid}"])
     def check_char(acc, cid):
         sql = "SELECT * FROM characters WHERE obj_id = :cid AND account_name = :acc LIMIT 1"
         try:
@@ -403,7 +526,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["char_names"])
     def check_name_exists(name):
         sql = "SELECT * FROM characters WHERE char_name = :name LIMIT 1"
         try:
@@ -412,7 +535,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}", "char_names", "rankings"])
     def change_nickname(acc, cid, name):
         try:
             sql = """
@@ -427,7 +550,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}"])
     def change_sex(acc, cid, sex):
         try:
             sql = """
@@ -441,7 +564,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}"])
     def unstuck(acc, cid, x, y, z):
         try:
             sql = """
@@ -464,7 +587,7 @@ class LineageAccount:
         return 'access_level'
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}"])
     def get_account_by_login(login):
         sql = """
             SELECT *
@@ -479,7 +602,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["accounts"])
     def find_accounts_by_email(email):
         sql = """
             SELECT *
@@ -492,7 +615,7 @@ class LineageAccount:
             return []
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}", "accounts"])
     def get_account_by_login_and_email(login, email):
         sql = """
             SELECT *
@@ -507,7 +630,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=60, use_cache=False)
+    @cache_lineage_result(timeout=60, use_cache=False, invalidates=["account:{login}", "accounts"])
     def link_account_to_user(login, user_uuid):
         try:
             sql = """
@@ -526,7 +649,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False)
     def ensure_columns():
         if LineageAccount._checked_columns:
             return
@@ -577,13 +700,13 @@ class LineageAccount:
         return LineageDB().select(sql, {"login": login})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["accounts"])
     def check_email_exists(email):
         sql = "SELECT login, email FROM accounts WHERE email = :email"
         return LineageDB().select(sql, {"email": email})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def register(login, password, access_level, email):
         try:
             LineageAccount.ensure_columns()
@@ -606,7 +729,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def update_password(password, login):
         try:
             hashed = base64.b64encode(hashlib.sha1(password.encode()).digest()).decode()
@@ -625,7 +748,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{logins_list}", "accounts"])
     def update_password_group(password, logins_list):
         if not logins_list:
             return None
@@ -643,7 +766,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def update_access_level(access, login):
         try:
             sql = """
@@ -715,7 +838,7 @@ class TransferFromWalletToChar:
 
         # Buscar owner_id
         char_query = "SELECT obj_Id FROM characters WHERE char_name = :char_name"
-        char_result = db.select(char_query, {"char_name": char_name})
+        char_result = db.select(char_query, {"char_name": char_name}, use_primary=True)
         if not char_result:
             return None
 
@@ -806,9 +929,7 @@ class TransferFromCharToWallet:
             ORDER BY loc, item_id
         """
         params = {"char_id": char_id}
-        results = LineageDB().select(query, params)
-
-        return results
+        return LineageDB().select_iter(query, params)
 
     @staticmethod
     @cache_lineage_result(timeout=300, use_cache=False)
@@ -821,7 +942,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'INVENTORY'
             LIMIT 1
         """
-        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id})
+        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id}, use_primary=True)
         inINVE = result_inve[0]["amount"] if result_inve else 0
         enchant = result_inve[0]["enchant"] if result_inve else 0
 
@@ -831,7 +952,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'WAREHOUSE'
             LIMIT 1
         """
-        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id})
+        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id}, use_primary=True)
         inWARE = result_ware[0]["amount"] if result_ware else 0
 
         total = inINVE + inWARE
@@ -845,27 +966,24 @@ class TransferFromCharToWallet:
 
             # Função auxiliar para deletar itens não stackables
             def delete_non_stackable(items, amount_to_remove):
-                removed = 0
-                for item in items:
-                    if removed >= amount_to_remove:
-                        break
-                    db.update("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
-                    removed += 1
-                return removed
+                to_delete = [{"item_id": item["object_id"]} for item in items[:amount_to_remove]]
+                if to_delete:
+                    db.delete_many("DELETE FROM items WHERE object_id = :item_id", to_delete)
+                return len(to_delete)
 
             # INVENTORY
             query_inve = """
                 SELECT * FROM items
                 WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'INVENTORY'
             """
-            items_inve = db.select(query_inve, {"char_id": char_id, "item_id": coin_id})
+            items_inve = db.select(query_inve, {"char_id": char_id, "item_id": coin_id}, use_primary=True)
 
             # WAREHOUSE
             query_ware = """
                 SELECT * FROM items
                 WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'WAREHOUSE'
             """
-            items_ware = db.select(query_ware, {"char_id": char_id, "item_id": coin_id})
+            items_ware = db.select(query_ware, {"char_id": char_id, "item_id": coin_id}, use_primary=True)
 
             total_amount = sum(item["count"] for item in items_inve + items_ware)
             if total_amount < count:
@@ -900,10 +1018,8 @@ class TransferFromCharToWallet:
                         )
 
             else:
-                # Não stackável – remover 1 a 1, primeiro INVENTORY depois WAREHOUSE
-                removed = delete_non_stackable(items_inve, count)
-                if removed < count:
-                    delete_non_stackable(items_ware, count - removed)
+                # Não stackável – primeiro INVENTORY depois WAREHOUSE, tudo em um único lote
+                delete_non_stackable(items_inve + items_ware, count)
 
             return True
 
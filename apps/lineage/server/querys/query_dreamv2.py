@@ -14,7 +14,7 @@ class LineageStats:
         return LineageDB().select(sql, params=params, use_cache=use_cache)
     
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, async_capturable=True)
     def get_crests(ids, type='clan'):
         if not ids:
             return []
@@ -31,13 +31,13 @@ class LineageStats:
         return LineageStats._run_query(sql, {"ids": tuple(ids)})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def players_online():
         sql = "SELECT COUNT(*) AS quant FROM characters WHERE online > 0 AND accessLevel = '0'"
         return LineageStats._run_query(sql)
     
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_pvp(limit=10):
         sql = """
             SELECT 
@@ -60,7 +60,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_pk(limit=10):
         sql = """
             SELECT 
@@ -83,7 +83,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_online(limit=10):
         sql = """
             SELECT 
@@ -106,7 +106,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_level(limit=10):
         sql = """
             SELECT 
@@ -128,7 +128,59 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    def ranking_snapshot_rows():
+        """
+        Todos os personagens elegíveis com os dados de PvP/PK/online/nível e clã, sem ORDER BY/LIMIT.
+        Usado pelo snapshot de rankings (utils/rankings.py), que ordena em memória.
+        """
+        sql = """
+            SELECT 
+                C.char_name, 
+                C.pvpkills, 
+                C.pkkills, 
+                C.online, 
+                C.onlinetime,
+                C.level,
+                C.exp,
+                C.classid AS base,
+                D.clan_name,
+                C.clanid AS clan_id,
+                D.ally_id
+            FROM characters C
+            LEFT JOIN clan_data D ON D.clan_id = C.clanid
+            WHERE C.accessLevel = '0'
+        """
+        return LineageDB().select_iter(sql)
+
+    @staticmethod
+    def character_index_rows(min_obj_id=None, obj_ids=None):
+        """
+        Dados do índice de busca de personagens (utils/character_index.py).
+        Sem filtros traz todos; com filtros traz só os personagens novos (id maior que `min_obj_id`),
+        os online e os `obj_ids` informados (que estavam online ou foram alterados pelo site).
+        """
+        delta_sql = ""
+        params = {}
+        if min_obj_id is not None:
+            delta_sql = "AND (C.charId > :min_obj_id OR C.online = 1 OR C.charId IN :obj_ids)"
+            params = {"min_obj_id": min_obj_id, "obj_ids": list(obj_ids or []) or [-1]}
+        sql = f"""
+            SELECT 
+                C.charId AS char_id,
+                C.char_name,
+                C.online,
+                C.level,
+                C.classid AS base,
+                D.clan_name
+            FROM characters C
+            LEFT JOIN clan_data D ON D.clan_id = C.clanid
+            WHERE C.accessLevel = '0'
+            {delta_sql}
+        """
+        return LineageDB().select_iter(sql, params)
+
+    @staticmethod
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def top_adena(limit=10, adn_billion_item=0, value_item=1000000):
         item_bonus_sql = ""
         if adn_billion_item != 0:
@@ -167,7 +219,72 @@ class LineageStats:
         })
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    def adena_wealth_rows(adn_billion_item=0, value_item=1000000, min_object_id=None, owner_ids=None):
+        """
+        Adena (+ itens de bilhão convertidos) por personagem em uma única varredura agrupada de items.
+        Com `min_object_id` (modo delta), recalcula só os personagens online, os `owner_ids` informados
+        (online na execução anterior) e os donos de itens com object_id maior: a quantidade de uma
+        pilha de adena muda sem mudar o object_id, e isso só acontece com o personagem online.
+        Usado pelo índice de riqueza (utils/wealth.py).
+        """
+        delta_sql = ""
+        if min_object_id is not None:
+            delta_sql = """
+                AND (
+                    C.online = 1
+                    OR I.owner_id IN :owner_ids
+                    OR I.owner_id IN (
+                        SELECT DISTINCT I2.owner_id
+                        FROM items I2
+                        WHERE I2.object_id > :min_object_id AND I2.item_id IN ('57', :adn_billion_item)
+                    )
+                )
+            """
+        sql = f"""
+            SELECT 
+                I.owner_id,
+                SUM(CASE WHEN I.item_id = '57' THEN I.count ELSE 0 END)
+                    + SUM(CASE WHEN I.item_id = :adn_billion_item THEN I.count ELSE 0 END) * :value_item AS adenas,
+                MAX(I.object_id) AS max_object_id,
+                MAX(C.online) AS online
+            FROM items I
+            INNER JOIN characters C ON C.charId = I.owner_id
+            WHERE C.accessLevel = '0'
+              AND I.item_id IN ('57', :adn_billion_item)
+              {delta_sql}
+            GROUP BY I.owner_id
+        """
+        return LineageDB().select_iter(sql, {
+            "adn_billion_item": adn_billion_item,
+            "value_item": value_item,
+            "min_object_id": min_object_id,
+            "owner_ids": list(owner_ids or []) or [-1],
+        })
+
+    @staticmethod
+    @cache_lineage_result(timeout=60, tags=["rankings"])
+    def adena_rank_characters(owner_ids):
+        """Dados de exibição dos personagens do topo do índice de riqueza."""
+        if not owner_ids:
+            return []
+        sql = """
+            SELECT 
+                C.charId AS owner_id,
+                C.char_name,
+                C.online,
+                C.onlinetime,
+                C.level,
+                D.clan_name,
+                C.clanid AS clan_id,
+                D.ally_id
+            FROM characters C
+            LEFT JOIN clan_data D ON D.clan_id = C.clanid
+            WHERE C.charId IN :owner_ids
+        """
+        return LineageStats._run_query(sql, {"owner_ids": list(owner_ids)})
+
+    @staticmethod
+    @cache_lineage_result(timeout=300, tags=["rankings"], async_capturable=True)
     def top_clans(limit=10):
         sql = """
             SELECT 
@@ -187,7 +304,7 @@ class LineageStats:
         return LineageStats._run_query(sql, {"limit": limit})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_ranking():
         sql = """
             SELECT 
@@ -206,7 +323,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_all_heroes():
         sql = """
             SELECT 
@@ -225,7 +342,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def olympiad_current_heroes():
         sql = """
             SELECT 
@@ -358,7 +475,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def siege():
         sql = """
             SELECT 
@@ -378,7 +495,7 @@ class LineageStats:
         return LineageStats._run_query(sql)
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["rankings"])
     def siege_participants(castle_id):
         sql = """
             SELECT 
@@ -416,7 +533,7 @@ class LineageStats:
 class LineageServices:
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}"])
     def find_chars(login):
         sql = """
             SELECT
@@ -455,7 +572,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{acc}", "char:{cid}"])
     def check_char(acc, cid):
         sql = "SELECT * FROM characters WHERE charId = :cid AND account_name = :acc LIMIT 1"
         try:
@@ -464,7 +581,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["char_names"])
     def check_name_exists(name):
         sql = "SELECT * FROM characters WHERE char_name = :name LIMIT 1"
         try:
@@ -473,7 +590,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}", "char_names", "rankings"])
     def change_nickname(acc, cid, name):
         try:
             sql = """
@@ -488,7 +605,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}"])
     def change_sex(acc, cid, sex):
         try:
             sql = """
@@ -502,7 +619,7 @@ class LineageServices:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{acc}", "char:{cid}"])
     def unstuck(acc, cid, x, y, z):
         try:
             sql = """
@@ -525,7 +642,7 @@ class LineageAccount:
         return 'accessLevel'
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}"])
     def get_account_by_login(login):
         sql = """
             SELECT *
@@ -540,7 +657,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["accounts"])
     def find_accounts_by_email(email):
         sql = """
             SELECT *
@@ -553,7 +670,7 @@ class LineageAccount:
             return []
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["account:{login}", "accounts"])
     def get_account_by_login_and_email(login, email):
         sql = """
             SELECT *
@@ -568,7 +685,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=60, use_cache=False)
+    @cache_lineage_result(timeout=60, use_cache=False, invalidates=["account:{login}", "accounts"])
     def link_account_to_user(login, user_uuid):
         try:
             sql = """
@@ -587,7 +704,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False)
     def ensure_columns():
         if LineageAccount._checked_columns:
             return
@@ -638,13 +755,13 @@ class LineageAccount:
         return LineageDB().select(sql, {"login": login})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, tags=["accounts"])
     def check_email_exists(email):
         sql = "SELECT login, email FROM accounts WHERE email = :email"
         return LineageDB().select(sql, {"email": email})
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def register(login, password, access_level, email):
         try:
             LineageAccount.ensure_columns()
@@ -668,7 +785,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def update_password(password, login):
         try:
             hashed = base64.b64encode(hashlib.sha1(password.encode()).digest()).decode()
@@ -687,7 +804,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{logins_list}", "accounts"])
     def update_password_group(password, logins_list):
         if not logins_list:
             return None
@@ -705,7 +822,7 @@ class LineageAccount:
             return None
 
     @staticmethod
-    @cache_lineage_result(timeout=300)
+    @cache_lineage_result(timeout=300, use_cache=False, invalidates=["account:{login}", "accounts"])
     def update_access_level(access, login):
         try:
             sql = """
@@ -774,7 +891,7 @@ class TransferFromWalletToChar:
 
         # Get character ID
         char_query = "SELECT charId FROM characters WHERE char_name = :char_name"
-        char_result = db.select(char_query, {"char_name": char_name})
+        char_result = db.select(char_query, {"char_name": char_name}, use_primary=True)
         if not char_result:
             return None
 
@@ -891,7 +1008,7 @@ class TransferFromCharToWallet:
             AND loc IN ('INVENTORY', 'WAREHOUSE')
             ORDER BY loc, item_id
         """
-        return LineageDB().select(query, {"char_id": char_id})
+        return LineageDB().select_iter(query, {"char_id": char_id})
 
     @staticmethod
     @cache_lineage_result(timeout=300, use_cache=False)
@@ -903,7 +1020,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'INVENTORY'
             LIMIT 1
         """
-        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id})
+        result_inve = db.select(query_inve, {"char_id": char_id, "coin_id": coin_id}, use_primary=True)
         inINVE = result_inve[0]["amount"] if result_inve else 0
         enchant = result_inve[0]["enchant"] if result_inve else 0
 
@@ -912,7 +1029,7 @@ class TransferFromCharToWallet:
             WHERE owner_id = :char_id AND item_id = :coin_id AND loc = 'WAREHOUSE'
             LIMIT 1
         """
-        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id})
+        result_ware = db.select(query_ware, {"char_id": char_id, "coin_id": coin_id}, use_primary=True)
         inWARE = result_ware[0]["amount"] if result_ware else 0
 
         total = inINVE + inWARE
@@ -925,25 +1042,22 @@ class TransferFromCharToWallet:
             db = LineageDB()
 
             def delete_non_stackable(items, amount_to_remove):
-                removed = 0
-                for item in items:
-                    if removed >= amount_to_remove:
-                        break
-                    db.update("DELETE FROM items WHERE object_id = :item_id", {"item_id": item["object_id"]})
-                    removed += 1
-                return removed
+                to_delete = [{"item_id": item["object_id"]} for item in items[:amount_to_remove]]
+                if to_delete:
+                    db.delete_many("DELETE FROM items WHERE object_id = :item_id", to_delete)
+                return len(to_delete)
 
             query_inve = """
                 SELECT * FROM items
                 WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'INVENTORY'
             """
-            items_inve = db.select(query_inve, {"char_id": char_id, "item_id": coin_id})
+            items_inve = db.select(query_inve, {"char_id": char_id, "item_id": coin_id}, use_primary=True)
 
             query_ware = """
                 SELECT * FROM items
                 WHERE owner_id = :char_id AND item_id = :item_id AND loc = 'WAREHOUSE'
             """
-            items_ware = db.select(query_ware, {"char_id": char_id, "item_id": coin_id})
+            items_ware = db.select(query_ware, {"char_id": char_id, "item_id": coin_id}, use_primary=True)
 
             total_amount = sum(item["count"] for item in items_inve + items_ware)
             if total_amount < count:
@@ -975,9 +1089,7 @@ class TransferFromCharToWallet:
                         )
 
             else:
-                removed = delete_non_stackable(items_inve, count)
-                if removed < count:
-                    delete_non_stackable(items_ware, count - removed)
+                delete_non_stackable(items_inve + items_ware, count)
 
             return True
 
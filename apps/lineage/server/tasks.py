@@ -18,3 +18,70 @@ def verificar_cupons_expirados():
         if apoiador and apoiador.status == 'aprovado':
             apoiador.status = 'expirado'
             apoiador.save()
+
+
+@shared_task(ignore_result=True)
+def refresh_lineage_cache(name, args=None, kwargs=None):
+    """
+    Recalcula em background uma consulta do Lineage servida como stale (stale-while-revalidate).
+    """
+    from apps.lineage.server.utils.cache import refresh_query
+
+    return refresh_query(name, args or [], kwargs or {})
+
+
+@shared_task(ignore_result=True)
+def refresh_hot_lineage_queries():
+    """
+    Renova as consultas quentes (rankings/status acessados recentemente) antes de expirarem,
+    para que as requisições dos usuários nunca precisem executar as consultas pesadas.
+    """
+    from apps.lineage.server.utils.cache import refresh_hot_queries
+
+    return refresh_hot_queries()
+
+
+@shared_task(ignore_result=True)
+def build_ranking_snapshot():
+    """
+    Recalcula o snapshot de rankings (PvP, PK, online e nível) em uma única leitura dos personagens.
+    """
+    from apps.lineage.server.utils.rankings import refresh_snapshot
+
+    snapshot = refresh_snapshot()
+    return snapshot["characters"] if snapshot else None
+
+
+@shared_task(ignore_result=True)
+def update_adena_wealth_index(adn_billion_item=None, value_item=None, full=False):
+    """
+    Atualiza o índice de riqueza (top adena): em modo delta pelo object_id dos itens,
+    com uma varredura completa periódica.
+    """
+    from apps.lineage.server.utils.wealth import WealthIndex, active_adena_config
+
+    if adn_billion_item is None or value_item is None:
+        adn_billion_item, value_item = active_adena_config()
+    meta = WealthIndex(adn_billion_item, value_item).rebuild(full=full)
+    return meta["updated_owners"] if meta else None
+
+
+@shared_task(ignore_result=True)
+def sync_lineage_character_index(full=False):
+    """
+    Sincroniza o índice de busca de personagens (delta por obj_Id/online, completa periódica).
+    """
+    from apps.lineage.server.utils.character_index import sync_character_index
+
+    meta = sync_character_index(full=full)
+    return meta["characters"] if meta else None
+
+
+@shared_task(ignore_result=True)
+def probe_game_server_status():
+    """
+    Verifica as portas de jogo e login e grava o último status e o histórico de uptime no cache.
+    """
+    from utils.server_status import probe_server_status
+
+    return probe_server_status()["overall_status"]
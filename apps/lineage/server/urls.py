@@ -4,6 +4,7 @@ from .views.accounts_views import *
 from .views.tops_views import *
 from .views.status_views import *
 from .views.services_views import *
+from .views.crest_views import crest_image_view, crest_sprite_view
 
 app_name = 'server'
 
@@ -22,6 +23,9 @@ urlpatterns = [
     path('status/boss-jewel-locations/', boss_jewel_locations_view, name='boss_jewel_locations'),
     path('status/grandboss/', grandboss_status_view, name='grandboss'),
 
+    path('crest/sprite/<slug:sprite_key>.png', crest_sprite_view, name='crest_sprite'),
+    path('crest/<str:crest_type>/<int:crest_id>.png', crest_image_view, name='crest_image'),
+
     path('account/update-password/', update_password, name='update_password'),
     path('account/dashboard/', account_dashboard, name='account_dashboard'),
     path('account/register/', register_lineage_account, name='lineage_register'),
@@ -29,6 +33,7 @@ urlpatterns = [
     path('account/change-sex/<int:char_id>/', change_sex_view, name='change_sex'),
     path('account/unstuck/<int:char_id>/', unstuck_view, name='unstuck'),
     path('account/change-nickname/<int:char_id>/', change_nickname_view, name='change_nickname'),
+    path('account/change-nickname/check/', check_nickname_view, name='check_nickname'),
     path('account/configure-service-prices/', configure_service_prices, name='configure_service_prices'),
     path('account/link-lineage-account/', link_lineage_account, name='link_lineage_account'),
     path('account/link-by-email/', request_link_by_email, name='request_link_by_email'),
@@ -1,8 +1,60 @@
 from django.core.cache import cache
+import asyncio
+import functools
 import hashlib
+import inspect
 import json
+import os
+import random
+import time
+import re
+import uuid
+from fnmatch import fnmatch
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
 from sqlalchemy.engine import RowMapping
 
+from apps.lineage.server.utils.profiler import current_query_name
+
+# Single-flight: só um worker recalcula uma chave expirada; os outros usam o valor antigo ou esperam
+LOCK_TIMEOUT = int(os.getenv("LINEAGE_CACHE_LOCK_TIMEOUT", "30"))
+LOCK_WAIT = float(os.getenv("LINEAGE_CACHE_LOCK_WAIT", "2"))
+LOCK_POLL_INTERVAL = 0.05
+# Variação aleatória do TTL (0.1 = ±10%) para as chaves não expirarem todas juntas
+TTL_JITTER = float(os.getenv("LINEAGE_CACHE_TTL_JITTER", "0.1"))
+# Tempo extra (segundos) em que o valor expirado continua disponível como "stale"
+STALE_GRACE = int(os.getenv("LINEAGE_CACHE_STALE_GRACE", "300"))
+
+# Stale-while-revalidate: métodos (padrões fnmatch sobre "Classe.metodo") que devolvem o valor
+# expirado na hora e recalculam em uma task do Celery
+SWR_METHODS = [
+    pattern.strip() for pattern in os.getenv(
+        "LINEAGE_CACHE_SWR_METHODS",
+        "LineageStats.top_*,LineageStats.olympiad_*,LineageStats.grandboss_status,"
+        "LineageStats.raidboss_status,LineageStats.siege*,LineageStats.players_online",
+    ).split(",") if pattern.strip()
+]
+# Registro de consultas "quentes", renovadas pelo celery-beat antes de expirarem
+HOT_INDEX_KEY = "lineage_cache:hot_index"
+HOT_TTL = int(os.getenv("LINEAGE_CACHE_HOT_TTL", "1800"))
+HOT_REFRESH_INTERVAL = int(os.getenv("LINEAGE_CACHE_HOT_REFRESH_INTERVAL", "60"))
+HOT_MARK_INTERVAL = 60
+
+# Tags: cada tag ("account:<login>", "char:<id>", "rankings") tem um número de versão no cache.
+# O resultado guarda as versões das suas tags; uma escrita incrementa a versão e o resultado
+# passa a ser tratado como expirado (sem perder o valor para o stale-while-revalidate).
+TAG_PREFIX = "lineage_tag:"
+TAG_TTL = 7 * 24 * 3600
+_TAG_FIELD_RE = re.compile(r"\{(\w+)\}")
+
+_ENVELOPE = "lineage_cache_v2"
+_hot_marked: Dict[str, float] = {}
+
+
+class CachedResult(NamedTuple):
+    value: Any
+    fresh: bool
+    fresh_until: float
+
 
 def convert_rowmapping_to_dict(obj):
     if isinstance(obj, list):
@@ -12,30 +64,369 @@ def convert_rowmapping_to_dict(obj):
     return obj
 
 
-def cache_lineage_result(timeout=300, use_cache=True):
+def make_cache_key(func, args, kwargs):
+    """
+    Gera uma chave única com base na função + argumentos.
+    Compartilhada entre a versão síncrona e a assíncrona (AsyncLineageStats).
+    """
+    key_base = f"{func.__module__}.{func.__name__}:{json.dumps(args)}:{json.dumps(kwargs)}"
+    return f"lineage_cache:{hashlib.md5(key_base.encode()).hexdigest()}"
+
+
+@functools.lru_cache(maxsize=None)
+def _signature(func):
+    return inspect.signature(func)
+
+
+def resolve_tags(templates, func, args, kwargs) -> Tuple[str, ...]:
+    """
+    Monta as tags a partir dos argumentos da chamada: "account:{login}" -> "account:admin".
+    Se o argumento for uma lista, gera uma tag por item (ex.: update_password_group).
+    """
+    if not templates:
+        return ()
+    try:
+        bound = _signature(func).bind_partial(*args, **kwargs)
+        bound.apply_defaults()
+        values = bound.arguments
+    except TypeError:
+        values = {}
+
+    tags = []
+    for template in templates:
+        field = _TAG_FIELD_RE.search(template)
+        if not field:
+            tags.append(template)
+            continue
+        value = values.get(field.group(1))
+        items = value if isinstance(value, (list, tuple, set)) else [value]
+        for item in items:
+            tags.append(template.replace(field.group(0), str(item).lower()))
+    return tuple(tags)
+
+
+def tag_versions(tags: Iterable[str]) -> Dict[str, int]:
+    tags = list(tags)
+    if not tags:
+        return {}
+    stored = cache.get_many([f"{TAG_PREFIX}{tag}" for tag in tags])
+    return {tag: stored.get(f"{TAG_PREFIX}{tag}", 0) for tag in tags}
+
+
+async def atag_versions(tags: Iterable[str]) -> Dict[str, int]:
+    tags = list(tags)
+    if not tags:
+        return {}
+    stored = await cache.aget_many([f"{TAG_PREFIX}{tag}" for tag in tags])
+    return {tag: stored.get(f"{TAG_PREFIX}{tag}", 0) for tag in tags}
+
+
+def invalidate_tags(*tags):
+    """
+    Incrementa a versão das tags: todos os resultados marcados com elas deixam de ser frescos.
+    """
+    for tag in tags:
+        key = f"{TAG_PREFIX}{tag}"
+        try:
+            if not cache.add(key, 1, timeout=TAG_TTL):
+                cache.incr(key)
+        except ValueError:
+            # A chave expirou entre o add e o incr
+            cache.set(key, 1, timeout=TAG_TTL)
+        except Exception as e:
+            print(f"⚠️ Falha ao invalidar a tag de cache {tag}: {e}")
+
+
+def jittered_timeout(timeout):
+    if not timeout or timeout <= 0 or not TTL_JITTER:
+        return timeout
+    return max(1, int(timeout * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)))
+
+
+def _wrap(value, timeout, versions):
+    """
+    O valor é guardado junto com o instante em que deixa de ser "fresco" e as versões
+    das suas tags; a chave em si vive `STALE_GRACE` segundos a mais para servir de fallback.
+    """
+    ttl = jittered_timeout(timeout)
+    return (_ENVELOPE, value, time.time() + ttl, versions or {}), ttl + STALE_GRACE
+
+
+def _unwrap(raw, versions=None) -> Optional[CachedResult]:
+    if raw is None:
+        return None
+    if isinstance(raw, tuple) and len(raw) >= 3 and raw[0] == _ENVELOPE:
+        stored_versions = raw[3] if len(raw) > 3 else {}
+        fresh = raw[2] > time.time() and (not versions or stored_versions == versions)
+        return CachedResult(raw[1], fresh, raw[2])
+    # Entradas gravadas antes do envelope
+    return CachedResult(raw, True, float("inf"))
+
+
+def read_result(key, tags=()) -> Optional[CachedResult]:
+    return _unwrap(cache.get(key), tag_versions(tags))
+
+
+def store_result(key, value, timeout, versions=None):
+    if value is None:
+        return
+    raw, ttl = _wrap(value, timeout, versions)
+    cache.set(key, raw, timeout=ttl)
+
+
+async def astore_result(key, value, timeout, versions=None):
+    if value is None:
+        return
+    raw, ttl = _wrap(value, timeout, versions)
+    await cache.aset(key, raw, timeout=ttl)
+
+
+def _acquire(lock_key) -> Optional[str]:
+    token = uuid.uuid4().hex
+    return token if cache.add(lock_key, token, timeout=LOCK_TIMEOUT) else None
+
+
+def _release(lock_key, token):
+    if cache.get(lock_key) == token:
+        cache.delete(lock_key)
+
+
+def single_flight(key, compute, timeout, tags=()):
+    """
+    Retorna o valor da chave, recalculando com `compute()` em no máximo um worker por vez
+    (lease via cache.add, que no Redis é um SET NX). Enquanto o dono do lease recalcula,
+    os demais recebem o valor expirado ou aguardam até LINEAGE_CACHE_LOCK_WAIT segundos.
+    As versões das tags são lidas antes do cálculo: uma escrita concorrente invalida o resultado.
+    """
+    versions = tag_versions(tags)
+    entry = _unwrap(cache.get(key), versions)
+    if entry is not None and entry.fresh:
+        return entry.value
+
+    lock_key = f"{key}:lock"
+    token = _acquire(lock_key)
+    if token:
+        try:
+            value = compute()
+            store_result(key, value, timeout, versions)
+            return value
+        finally:
+            _release(lock_key, token)
+
+    if entry is not None:
+        return entry.value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = _unwrap(cache.get(key), versions)
+        if entry is not None:
+            return entry.value
+
+    # O dono do lease demorou demais: calcula aqui mesmo
+    value = compute()
+    store_result(key, value, timeout, versions)
+    return value
+
+
+async def asingle_flight(key, compute, timeout, tags=()):
+    """Versão assíncrona do single_flight; `compute` é uma corrotina."""
+    versions = await atag_versions(tags)
+    entry = _unwrap(await cache.aget(key), versions)
+    if entry is not None and entry.fresh:
+        return entry.value
+
+    lock_key = f"{key}:lock"
+    token = uuid.uuid4().hex
+    if await cache.aadd(lock_key, token, timeout=LOCK_TIMEOUT):
+        try:
+            value = await compute()
+            await astore_result(key, value, timeout, versions)
+            return value
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    if entry is not None:
+        return entry.value
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = _unwrap(await cache.aget(key), versions)
+        if entry is not None:
+            return entry.value
+
+    value = await compute()
+    await astore_result(key, value, timeout, versions)
+    return value
+
+
+def is_swr_method(func) -> bool:
+    return any(fnmatch(func.__qualname__, pattern) for pattern in SWR_METHODS)
+
+
+def mark_hot(key, func, args, kwargs):
+    """
+    Registra a chamada no índice de consultas quentes. Cada processo atualiza
+    uma mesma chave no máximo uma vez por minuto para não escrever no cache a cada acesso.
+    """
+    now = time.time()
+    if now - _hot_marked.get(key, 0) < HOT_MARK_INTERVAL:
+        return
+    _hot_marked[key] = now
+    try:
+        index = cache.get(HOT_INDEX_KEY) or {}
+        index[key] = {"name": func.__qualname__, "args": list(args), "kwargs": kwargs, "last_hit": now}
+        cache.set(HOT_INDEX_KEY, index, timeout=HOT_TTL)
+    except Exception as e:
+        print(f"⚠️ Falha ao registrar consulta quente {func.__qualname__}: {e}")
+
+
+def hot_queries() -> List[Dict[str, Any]]:
+    """Consultas acessadas nos últimos LINEAGE_CACHE_HOT_TTL segundos."""
+    index = cache.get(HOT_INDEX_KEY) or {}
+    limit = time.time() - HOT_TTL
+    return [dict(entry, key=key) for key, entry in index.items() if entry.get("last_hit", 0) >= limit]
+
+
+def schedule_refresh(key, func, args, kwargs) -> bool:
+    """
+    Agenda o recálculo da chave no Celery (uma vez por chave até a task terminar).
+    Retorna False se não foi possível agendar (ex.: broker indisponível).
+    """
+    refresh_key = f"{key}:refresh"
+    if not cache.add(refresh_key, 1, timeout=LOCK_TIMEOUT):
+        return True
+    try:
+        from apps.lineage.server.tasks import refresh_lineage_cache
+        refresh_lineage_cache.delay(func.__qualname__, list(args), kwargs)
+        return True
+    except Exception as e:
+        print(f"⚠️ Falha ao agendar atualização do cache de {func.__qualname__}: {e}")
+        cache.delete(refresh_key)
+        return False
+
+
+def swr_lookup(key, func, args, kwargs, tags=()) -> Optional[CachedResult]:
+    """
+    Leitura stale-while-revalidate: devolve o valor (mesmo expirado) e agenda o recálculo
+    quando necessário. Retorna None quando não há valor ou quando o recálculo precisa ser feito na hora.
+    """
+    mark_hot(key, func, args, kwargs)
+    entry = read_result(key, tags)
+    if entry is None:
+        return None
+    if not entry.fresh and not schedule_refresh(key, func, args, kwargs):
+        return None
+    return entry
+
+
+def resolve_query_method(name):
+    """'LineageStats.top_pvp' -> método decorado da classe de query configurada."""
+    from utils.dynamic_import import get_query_class
+    class_name, _, method_name = name.partition(".")
+    return getattr(get_query_class(class_name), method_name)
+
+
+def refresh_query(name, args, kwargs) -> bool:
+    """
+    Recalcula e grava no cache o resultado de uma consulta decorada com cache_lineage_result.
+    Usado pelas tasks do Celery; respeita o lease do single-flight.
+    """
+    method = resolve_query_method(name)
+    func = getattr(method, "__wrapped__", None)
+    if func is None or not getattr(method, "cache_enabled", False):
+        return False
+
+    key = make_cache_key(func, args, kwargs)
+    lock_key = f"{key}:lock"
+    try:
+        token = _acquire(lock_key)
+        if not token:
+            return False
+        try:
+            versions = tag_versions(method.cache_tags(*args, **kwargs))
+            value = convert_rowmapping_to_dict(call_named(func, *args, **kwargs))
+            store_result(key, value, method.cache_timeout, versions)
+            return True
+        finally:
+            _release(lock_key, token)
+    finally:
+        cache.delete(f"{key}:refresh")
+
+
+def refresh_hot_queries() -> int:
+    """
+    Recalcula as consultas quentes que já expiraram ou vão expirar antes da próxima execução.
+    """
+    refreshed = 0
+    horizon = time.time() + HOT_REFRESH_INTERVAL * 1.5
+    for entry in hot_queries():
+        try:
+            method = resolve_query_method(entry["name"])
+            current = read_result(entry["key"], method.cache_tags(*entry["args"], **entry["kwargs"]))
+            if current is not None and current.fresh and current.fresh_until > horizon:
+                continue
+            if refresh_query(entry["name"], entry["args"], entry["kwargs"]):
+                refreshed += 1
+        except Exception as e:
+            print(f"❌ Erro ao atualizar consulta quente {entry['name']}: {e}")
+    return refreshed
+
+
+def call_named(func, *args, **kwargs):
+    """Executa a função registrando o nome dela para o profiling de consultas (ex.: LineageStats.top_pvp)."""
+    token = current_query_name.set(func.__qualname__)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        current_query_name.reset(token)
+
+
+def cache_lineage_result(timeout=300, use_cache=True, tags=None, invalidates=None, async_capturable=False):
+    """
+    tags: tags das leituras, ex.: ["account:{login}"] (um campo dos argumentos por tag).
+    invalidates: tags incrementadas depois de uma escrita (use com use_cache=False).
+    async_capturable: o método só retorna o resultado de um único select(), sem pós-processamento;
+        o AsyncLineageStats pode capturar o SQL e executá-lo no AsyncLineageDB (os demais métodos
+        rodam a versão síncrona em uma thread).
+    """
     def decorator(func):
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
             # Se o cache não deve ser usado, execute a função normalmente
             if not use_cache:
-                result = func(*args, **kwargs)
+                try:
+                    result = call_named(func, *args, **kwargs)
+                finally:
+                    if invalidates:
+                        invalidate_tags(*resolve_tags(invalidates, func, args, kwargs))
                 result_converted = convert_rowmapping_to_dict(result)
                 return result_converted
             
-            # Gera uma chave única com base na função + argumentos
-            key_base = f"{func.__module__}.{func.__name__}:{json.dumps(args)}:{json.dumps(kwargs)}"
-            key = f"lineage_cache:{hashlib.md5(key_base.encode()).hexdigest()}"
+            key = make_cache_key(func, args, kwargs)
+            call_tags = resolve_tags(tags, func, args, kwargs)
 
-            # Tenta pegar do cache
-            cached = cache.get(key)
-            if cached is not None:
-                return cached
-
-            # Se não tiver, executa e armazena no cache
-            result = func(*args, **kwargs)
+            # Rankings/status: serve o valor expirado e recalcula em background
+            if swr:
+                entry = swr_lookup(key, func, args, kwargs, call_tags)
+                if entry is not None:
+                    return entry.value
 
             # Converte o resultado antes de salvar e retornar
-            result_converted = convert_rowmapping_to_dict(result)
-            cache.set(key, result_converted, timeout=timeout)
-            return result_converted
+            def compute():
+                return convert_rowmapping_to_dict(call_named(func, *args, **kwargs))
+
+            return single_flight(key, compute, timeout, call_tags)
+
+        swr = use_cache and is_swr_method(func)
+
+        # Expostos para a versão assíncrona reutilizar a mesma política de cache
+        wrapper.cache_timeout = timeout
+        wrapper.cache_enabled = use_cache
+        wrapper.stale_while_revalidate = swr
+        wrapper.cache_tags = lambda *args, **kwargs: resolve_tags(tags, func, args, kwargs)
+        wrapper.async_capturable = async_capturable
         return wrapper
     return decorator
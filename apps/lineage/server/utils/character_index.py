@@ -0,0 +1,321 @@
+import os
+import time
+import uuid
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+# Sincronização em modo delta a cada INTERVAL; completa (remove excluídos) a cada FULL_INTERVAL
+CHAR_INDEX_INTERVAL = int(os.getenv("LINEAGE_CHAR_INDEX_INTERVAL", "60"))
+CHAR_INDEX_FULL_INTERVAL = int(os.getenv("LINEAGE_CHAR_INDEX_FULL_INTERVAL", "3600"))
+# Frequência com que cada processo confere se há uma versão nova do índice
+CHAR_INDEX_CHECK_INTERVAL = 5
+
+ROWS_KEY = "lineage_characters:rows"
+META_KEY = "lineage_characters:meta"
+DIRTY_KEY = "lineage_characters:dirty"
+LOCK_KEY = "lineage_characters:syncing"
+BATCH_SIZE = 1000
+
+
+def _redis():
+    # Pendentes em um set do Redis (SADD/RENAME atômicos); sem ele (DEBUG/locmem) ficam no cache do Django
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+def _take_dirty() -> Tuple[set, Optional[str]]:
+    """
+    Retira os personagens pendentes de uma vez: o set é renomeado para uma chave desta execução,
+    então as marcações feitas durante a sincronização ficam para a próxima.
+    """
+    client = _redis()
+    if client is None:
+        dirty = set(cache.get(DIRTY_KEY) or ())
+        cache.delete(DIRTY_KEY)
+        return dirty, None
+
+    from redis.exceptions import ResponseError
+
+    processing = f"{DIRTY_KEY}:{uuid.uuid4().hex}"
+    try:
+        client.rename(DIRTY_KEY, processing)
+    except ResponseError:
+        # Nenhum pendente (a chave não existe)
+        return set(), None
+    return {int(char_id) for char_id in client.smembers(processing)}, processing
+
+
+def _release_dirty(dirty: set, processing: Optional[str], done: bool):
+    """Descarta os pendentes processados; se a sincronização falhou, devolve-os ao set"""
+    client = _redis()
+    if client is None:
+        if not done and dirty:
+            cache.set(DIRTY_KEY, set(cache.get(DIRTY_KEY) or ()) | dirty, timeout=None)
+        return
+    if processing is None:
+        return
+    if not done:
+        client.sunionstore(DIRTY_KEY, [DIRTY_KEY, processing])
+    client.delete(processing)
+
+
+def _trigrams(text: str) -> List[str]:
+    return [text[i:i + 3] for i in range(len(text) - 2)]
+
+
+class CharacterSearchIndex:
+    """
+    Índice de nomes de personagens em memória: nomes ordenados (prefixo por busca binária)
+    e trigramas (substring). Cada personagem é uma tupla (nome, level, classe, clã, online).
+    """
+
+    def __init__(self, rows: Dict[int, Tuple]):
+        entries = sorted((row[0].lower(), char_id) for char_id, row in rows.items() if row[0])
+        self.rows = rows
+        self.names = [name for name, _ in entries]
+        self.ids = array('q', (char_id for _, char_id in entries))
+
+        grams: Dict[str, List[int]] = defaultdict(list)
+        for position, name in enumerate(self.names):
+            for gram in set(_trigrams(name)):
+                grams[gram].append(position)
+        self.grams = {gram: array('l', postings) for gram, postings in grams.items()}
+
+    def _prefix(self, query: str, limit: int) -> List[int]:
+        positions = []
+        position = bisect_left(self.names, query)
+        while position < len(self.names) and self.names[position].startswith(query) and len(positions) < limit:
+            positions.append(position)
+            position += 1
+        return positions
+
+    def _substring(self, query: str) -> List[int]:
+        grams = set(_trigrams(query))
+        if not grams:
+            return []
+        postings = sorted((self.grams.get(gram, ()) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [position for position in candidates if query in self.names[position]]
+
+    def exists(self, name: str) -> bool:
+        name = (name or "").lower()
+        position = bisect_left(self.names, name)
+        return position < len(self.names) and self.names[position] == name
+
+    def search(self, query: str, limit: int = 20) -> List[Dict]:
+        """Exato > prefixo > substring; empates: online primeiro, maior level."""
+        query = (query or "").strip().lower()
+        if not query:
+            return []
+
+        scores = {}
+        for position in self._prefix(query, limit * 5):
+            scores[position] = 2 if self.names[position] == query else 1
+        if len(scores) < limit:
+            for position in self._substring(query):
+                scores.setdefault(position, 0)
+
+        def rank(position):
+            row = self.rows[self.ids[position]]
+            return -scores[position], -int(row[4] or 0), -int(row[1] or 0), self.names[position]
+
+        return [self._as_dict(position) for position in sorted(scores, key=rank)[:limit]]
+
+    def _as_dict(self, position: int) -> Dict:
+        from utils.resources import get_class_name
+
+        char_id = self.ids[position]
+        name, level, base, clan_name, online = self.rows[char_id]
+        return {
+            "char_id": char_id,
+            "char_name": name,
+            "level": level or 0,
+            "class_name": get_class_name(base) if base is not None else "",
+            "clan_name": clan_name,
+            "online": bool(online),
+        }
+
+
+def sync_character_index(full: bool = False) -> Optional[Dict]:
+    """
+    Sincroniza os dados do índice com o banco do jogo e, se algo mudou, publica uma nova versão no cache.
+    O delta traz os personagens novos (obj_Id), os online e os que estavam online na última
+    execução (last-seen) ou foram alterados pelo site; a completa remove os excluídos.
+    """
+    from utils.dynamic_import import get_query_class
+    from apps.lineage.server.database import LineageDB
+
+    if not LineageDB().is_connected():
+        return None
+    if not cache.add(LOCK_KEY, 1, timeout=CHAR_INDEX_FULL_INTERVAL):
+        return None
+
+    dirty, processing = _take_dirty()
+    done = False
+    try:
+        meta = cache.get(META_KEY)
+        previous = cache.get(ROWS_KEY) if meta is not None else None
+        full = full or previous is None or time.time() - meta.get("full_at", 0) >= CHAR_INDEX_FULL_INTERVAL
+
+        LineageStats = get_query_class("LineageStats")
+        if full:
+            rows = {}
+            stream = LineageStats.character_index_rows()
+        else:
+            rows = previous
+            stream = LineageStats.character_index_rows(
+                min_obj_id=meta["max_obj_id"],
+                obj_ids=set(meta.get("online_ids", ())) | dirty,
+            )
+
+        changed = False
+        seen = set()
+        online_ids = []
+        max_obj_id = 0 if full else meta["max_obj_id"]
+        stream = iter(stream)
+        while True:
+            chunk = list(islice(stream, BATCH_SIZE))
+            if not chunk:
+                break
+            for row in chunk:
+                char_id = int(row["char_id"])
+                values = (row["char_name"], row["level"], row["base"], row["clan_name"], int(row["online"] or 0))
+                if rows.get(char_id) != values:
+                    rows[char_id] = values
+                    changed = True
+                seen.add(char_id)
+                max_obj_id = max(max_obj_id, char_id)
+                if row["online"]:
+                    online_ids.append(char_id)
+
+        if full:
+            changed = rows != previous
+        else:
+            # Pedidos pelo delta e não retornados: excluídos ou com accesslevel alterado
+            for char_id in (set(meta.get("online_ids", ())) | dirty) - seen:
+                if rows.pop(char_id, None) is not None:
+                    changed = True
+
+        # Nova versão (e regravação dos dados) só quando algo mudou: cada versão faz todos os
+        # processos reconstruírem o índice
+        now = time.time()
+        version = (meta or {}).get("version", 0)
+        if changed or meta is None:
+            version += 1
+            cache.set(ROWS_KEY, rows, timeout=None)
+        meta = {
+            "version": version,
+            "max_obj_id": max_obj_id,
+            "online_ids": online_ids,
+            "full_at": now if full else meta["full_at"],
+            "synced_at": now,
+            "characters": len(rows),
+            "changed": changed,
+        }
+        cache.set(META_KEY, meta, timeout=None)
+        done = True
+        return meta
+    finally:
+        _release_dirty(dirty, processing, done)
+        cache.delete(LOCK_KEY)
+
+
+def mark_character_dirty(char_id):
+    """Inclui o personagem no próximo delta (ex.: nickname alterado pelo site)."""
+    try:
+        client = _redis()
+        if client is not None:
+            client.sadd(DIRTY_KEY, int(char_id))
+        else:
+            cache.set(DIRTY_KEY, set(cache.get(DIRTY_KEY) or ()) | {int(char_id)}, timeout=None)
+    except Exception as e:
+        print(f"⚠️ Falha ao marcar personagem para o índice de busca: {e}")
+
+
+_index: Optional[CharacterSearchIndex] = None
+_index_version = None
+_index_checked = 0.0
+_index_building = False
+_index_lock = threading.Lock()
+
+
+def get_character_index() -> Optional[CharacterSearchIndex]:
+    """
+    Índice do processo. Uma versão nova publicada pela task é carregada em uma thread em
+    background; enquanto isso as requisições continuam usando o índice anterior.
+    """
+    global _index_checked, _index_building
+
+    now = time.monotonic()
+    if now - _index_checked < CHAR_INDEX_CHECK_INTERVAL:
+        return _index
+
+    with _index_lock:
+        if now - _index_checked < CHAR_INDEX_CHECK_INTERVAL or _index_building:
+            return _index
+        _index_checked = now
+        meta = cache.get(META_KEY)
+        if meta is None:
+            _schedule_sync()
+        elif meta["version"] != _index_version:
+            _index_building = True
+            threading.Thread(
+                target=_rebuild_index, args=(meta["version"],), name="character-index", daemon=True
+            ).start()
+    return _index
+
+
+def _rebuild_index(version):
+    global _index, _index_version, _index_building
+
+    try:
+        rows = cache.get(ROWS_KEY)
+        if rows is not None:
+            index = CharacterSearchIndex(rows)
+            with _index_lock:
+                _index, _index_version = index, version
+    except Exception as e:
+        print(f"⚠️ Falha ao carregar o índice de personagens: {e}")
+    finally:
+        _index_building = False
+
+
+def _schedule_sync():
+    if not cache.add(f"{LOCK_KEY}:scheduled", 1, timeout=CHAR_INDEX_INTERVAL):
+        return
+    try:
+        from apps.lineage.server.tasks import sync_lineage_character_index
+        sync_lineage_character_index.delay()
+    except Exception as e:
+        print(f"⚠️ Falha ao agendar o índice de personagens: {e}")
+
+
+def search_characters(query: str, limit: int = 20) -> List[Dict]:
+    index = get_character_index()
+    return index.search(query, limit=limit) if index is not None else []
+
+
+def is_name_taken(name: str) -> bool:
+    """
+    Nome já usado? O índice responde na hora quando o nome existe; quando não encontra,
+    confirma no banco do jogo (o índice pode estar alguns segundos atrasado).
+    """
+    index = get_character_index()
+    if index is not None and index.exists(name):
+        return True
+
+    from utils.dynamic_import import get_query_class
+    return bool(get_query_class("LineageServices").check_name_exists(name))
@@ -1,6 +1,10 @@
-import base64, io, os
+import base64, hashlib, io, os, threading
+from collections import OrderedDict
+from functools import lru_cache
 
 from PIL import Image
+from django.core.cache import cache
+from django.urls import reverse
 from apps.lineage.server.database import LineageDB
 
 from utils.dynamic_import import get_query_class  # importa o helper
@@ -53,10 +57,16 @@ class CrestHandler:
 
 
 
+def _collect_crest_ids(data, clan_key, ally_key):
+    clan_ids = list({item.get(clan_key) for item in data if item.get(clan_key)})
+    ally_ids = list({item.get(ally_key) for item in data if item.get(ally_key)})
+    return clan_ids, ally_ids
+
+
 def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     """
-    Adiciona as imagens de crest base64 para cada clã ou personagem (que tenha clan_id).
-    Espera uma lista de dicionários.
+    Adiciona as URLs dos crests (clan_crest_url/ally_crest_url) para cada clã ou personagem
+    (que tenha clan_id), além do base64/sprite quando habilitados. Espera uma lista de dicionários.
     """
     if not data:
         return data
@@ -65,40 +75,237 @@ def attach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
     if not db.is_connected():
         return data
 
-    crest_handler = CrestHandler()
-
     # Coleta os IDs únicos
-    clan_ids = list({item.get(clan_key) for item in data if item.get(clan_key)})
-    ally_ids = list({item.get(ally_key) for item in data if item.get(ally_key)})
+    clan_ids, ally_ids = _collect_crest_ids(data, clan_key, ally_key)
 
     # Busca os crests
     crests = LineageStats.get_crests(clan_ids) or {}
     ally_crests = LineageStats.get_crests(ally_ids, type='ally') or {}
 
-    for item in data:
-        crest_id = item.get(clan_key)
-
-        # Clã Crest
-        crest_blob = next((crest.get('crest') for crest in crests if crest.get('clan_id') == crest_id), None)
-        if crest_blob:
-            image_bytes = crest_handler.make_image(crest_blob, crest_id, 'clan', show_image=True)
-            image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(image_bytes.read()).decode('utf-8')
-        else:
-            empty_image_bytes = crest_handler.make_empty_image('clan')
-            empty_image_bytes.seek(0)
-            item['clan_crest_image_base64'] = base64.b64encode(empty_image_bytes.read()).decode('utf-8')
-
-        # Ally Crest
-        ally_id = item.get(ally_key)
-        ally_crest_blob = next((crest.get('crest') for crest in ally_crests if crest.get('ally_id') == ally_id), None)
-        if ally_crest_blob:
-            ally_image_bytes = crest_handler.make_image(ally_crest_blob, crest_id, 'ally', show_image=True)
-            ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(ally_image_bytes.read()).decode('utf-8')
+    return _apply_crests(data, crests, ally_crests, clan_key, ally_key)
+
+
+async def aattach_crests_to_clans(data, clan_key='clan_id', ally_key='ally_id'):
+    """
+    Versão assíncrona do attach_crests_to_clans: os crests são buscados pelo AsyncLineageDB.
+    """
+    from apps.lineage.server.async_database import AsyncLineageStats, ais_lineage_connected
+
+    if not data:
+        return data
+
+    if not await ais_lineage_connected():
+        return data
+
+    clan_ids, ally_ids = _collect_crest_ids(data, clan_key, ally_key)
+    crests = await AsyncLineageStats.get_crests(clan_ids) or {}
+    ally_crests = await AsyncLineageStats.get_crests(ally_ids, type='ally') or {}
+
+    return _apply_crests(data, crests, ally_crests, clan_key, ally_key)
+
+
+# Crests renderizados (PNG em base64) indexados pelo hash do conteúdo: o mesmo blob nunca é
+# transcodificado duas vezes. Primeiro nível em memória (LRU por processo), segundo no Redis.
+CREST_CACHE_PREFIX = "lineage_crest"
+CREST_CACHE_TTL = int(os.getenv("LINEAGE_CREST_CACHE_TTL", str(7 * 24 * 3600)))
+CREST_LRU_SIZE = int(os.getenv("LINEAGE_CREST_LRU_SIZE", "2048"))
+# As páginas referenciam os crests por URL (/crest/<tipo>/<id>.png?v=<hash>); o base64 inline
+# continua disponível para temas antigos e o sprite sheet agrupa os crests de uma página em uma imagem
+CREST_INLINE = os.getenv("LINEAGE_CREST_INLINE", "false").lower() == "true"
+CREST_SPRITES = os.getenv("LINEAGE_CREST_SPRITES", "false").lower() == "true"
+CREST_SIZES = {'clan': (16, 12), 'ally': (8, 12)}
+EMPTY_DIGEST = "empty"
+
+_crest_lru = OrderedDict()
+_crest_lru_lock = threading.Lock()
+_crest_handler = None
+
+
+def _get_crest_handler():
+    global _crest_handler
+    if _crest_handler is None:
+        _crest_handler = CrestHandler()
+    return _crest_handler
+
+
+def crest_digest(blob):
+    """Hash do conteúdo do crest (versão das URLs, ETag e chave do cache)."""
+    if not blob:
+        return EMPTY_DIGEST
+    if not isinstance(blob, bytes):
+        blob = bytes(blob)
+    return hashlib.sha1(blob).hexdigest()
+
+
+def _crest_cache_key(blob, crest_type):
+    return f"{CREST_CACHE_PREFIX}:{crest_type}:{crest_digest(blob)}"
+
+
+def _lru_get(key):
+    with _crest_lru_lock:
+        value = _crest_lru.get(key)
+        if value is not None:
+            _crest_lru.move_to_end(key)
+        return value
+
+
+def _lru_set(key, value):
+    with _crest_lru_lock:
+        _crest_lru[key] = value
+        _crest_lru.move_to_end(key)
+        while len(_crest_lru) > CREST_LRU_SIZE:
+            _crest_lru.popitem(last=False)
+
+
+def _render_crest(blob, crest_type):
+    try:
+        image_bytes = _get_crest_handler().make_image(bytes(blob), None, crest_type, show_image=True)
+    except Exception as e:
+        print(f"⚠️ {e}")
+        return empty_crest_base64(crest_type)
+    return base64.b64encode(image_bytes.getvalue()).decode('utf-8')
+
+
+@lru_cache(maxsize=2)
+def empty_crest_base64(crest_type):
+    """Placeholder transparente, renderizado uma única vez por tipo."""
+    return base64.b64encode(_get_crest_handler().make_empty_image(crest_type).getvalue()).decode('utf-8')
+
+
+def render_crests(blobs, crest_type):
+    """
+    Recebe {id: blob} e retorna {id: png_base64}, usando o LRU local, depois o cache
+    (uma única ida ao Redis para todos os crests da página) e só então o PIL.
+    """
+    rendered, keys = {}, {}
+    for crest_id, blob in blobs.items():
+        if not blob:
+            continue
+        key = _crest_cache_key(blob, crest_type)
+        value = _lru_get(key)
+        if value is not None:
+            rendered[crest_id] = value
         else:
-            empty_ally_image_bytes = crest_handler.make_empty_image('ally')
-            empty_ally_image_bytes.seek(0)
-            item['ally_crest_image_base64'] = base64.b64encode(empty_ally_image_bytes.read()).decode('utf-8')
+            keys[crest_id] = key
+
+    if keys:
+        try:
+            cached = cache.get_many(set(keys.values()))
+        except Exception:
+            cached = {}
+        to_store = {}
+        for crest_id, key in keys.items():
+            value = cached.get(key)
+            if value is None:
+                value = to_store.get(key) or _render_crest(blobs[crest_id], crest_type)
+                to_store[key] = value
+            _lru_set(key, value)
+            rendered[crest_id] = value
+        if to_store:
+            try:
+                cache.set_many(to_store, timeout=CREST_CACHE_TTL)
+            except Exception:
+                pass
+
+    return rendered
+
+
+def crest_png(blob, crest_type):
+    """PNG renderizado (bytes) de um crest; placeholder quando não há blob."""
+    rendered = render_crests({0: blob}, crest_type).get(0) or empty_crest_base64(crest_type)
+    return base64.b64decode(rendered)
+
+
+def crest_url(crest_type, crest_id, blob):
+    """URL versionada pelo hash do conteúdo, então pode ser cacheada indefinidamente pelo navegador."""
+    url = reverse('server:crest_image', args=[crest_type, crest_id if blob else 0])
+    return f"{url}?v={crest_digest(blob)[:16]}"
+
+
+def _sprite_cache_key(sprite_key):
+    return f"{CREST_CACHE_PREFIX}:sprite:{sprite_key}"
+
+
+def build_crest_sprite(clan_blobs, ally_blobs):
+    """
+    Agrupa os crests distintos da página em uma única imagem horizontal.
+    Retorna (url, {(tipo, id): (x, largura, altura)}); o layout fica no cache e o
+    endpoint do sprite monta a imagem a partir dos crests já renderizados.
+    """
+    layout, offsets, seen = [], {}, {}
+    x = 0
+    for crest_type, blobs in (('clan', clan_blobs), ('ally', ally_blobs)):
+        render_crests(blobs, crest_type)
+        width, height = CREST_SIZES[crest_type]
+        for crest_id, blob in sorted(blobs.items(), key=lambda item: str(item[0])):
+            if not blob:
+                continue
+            cache_key = _crest_cache_key(blob, crest_type)
+            if cache_key not in seen:
+                seen[cache_key] = x
+                layout.append((cache_key, crest_type, x))
+                x += width
+            offsets[(crest_type, crest_id)] = (seen[cache_key], width, height)
+
+    if not layout:
+        return None, {}
+
+    sprite_key = hashlib.sha1("|".join(key for key, _, _ in layout).encode()).hexdigest()[:24]
+    cache.add(_sprite_cache_key(sprite_key), layout, timeout=CREST_CACHE_TTL)
+    return reverse('server:crest_sprite', args=[sprite_key]), offsets
+
+
+def render_crest_sprite(sprite_key):
+    """
+    PNG do sprite sheet a partir do layout salvo por build_crest_sprite.
+    Retorna (png, completo) ou (None, False) se o layout expirou.
+    """
+    layout = cache.get(_sprite_cache_key(sprite_key))
+    if not layout:
+        return None, False
+
+    rendered = cache.get_many([cache_key for cache_key, _, _ in layout])
+    width = max(x + CREST_SIZES[crest_type][0] for _, crest_type, x in layout)
+    sprite = Image.new("RGBA", (width, 12), (0, 0, 0, 0))
+    complete = True
+    for cache_key, crest_type, x in layout:
+        data = rendered.get(cache_key) or _lru_get(cache_key)
+        if not data:
+            complete = False
+            continue
+        sprite.paste(Image.open(io.BytesIO(base64.b64decode(data))).convert("RGBA"), (x, 0))
+
+    byte_io = io.BytesIO()
+    sprite.save(byte_io, 'PNG')
+    return byte_io.getvalue(), complete
+
+
+def _apply_crests(data, crests, ally_crests, clan_key, ally_key):
+    # Índices id -> blob (em vez de varrer a lista de crests a cada linha)
+    clan_blobs = {crest.get('clan_id'): crest.get('crest') for crest in crests}
+    ally_blobs = {crest.get('ally_id'): crest.get('crest') for crest in ally_crests}
+
+    sprite_url, offsets = build_crest_sprite(clan_blobs, ally_blobs) if CREST_SPRITES else (None, {})
+
+    if CREST_INLINE:
+        clan_images = render_crests(clan_blobs, 'clan')
+        ally_images = render_crests(ally_blobs, 'ally')
+        empty_clan = empty_crest_base64('clan')
+        empty_ally = empty_crest_base64('ally')
+
+    for item in data:
+        for crest_type, key, blobs in (('clan', clan_key, clan_blobs), ('ally', ally_key, ally_blobs)):
+            crest_id = item.get(key)
+            item[f'{crest_type}_crest_url'] = crest_url(crest_type, crest_id, blobs.get(crest_id))
+            offset = offsets.get((crest_type, crest_id))
+            if offset:
+                x, width, height = offset
+                item[f'{crest_type}_crest_sprite'] = {
+                    'url': sprite_url, 'x': -x, 'y': 0, 'width': width, 'height': height,
+                }
+
+        if CREST_INLINE:
+            item['clan_crest_image_base64'] = clan_images.get(item.get(clan_key)) or empty_clan
+            item['ally_crest_image_base64'] = ally_images.get(item.get(ally_key)) or empty_ally
 
     return data
@@ -0,0 +1,190 @@
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class LineageHealthMonitor:
+    """
+    Estado de saúde compartilhado do banco do Lineage com circuit breaker.
+
+    - O resultado do último probe (SELECT 1) fica em cache por `ttl` segundos.
+    - Uma thread em background renova o estado a cada `probe_interval` segundos,
+      então as requisições quase nunca precisam fazer o probe elas mesmas.
+    - Falhas de conexão abrem o circuito: durante `reset_timeout` segundos as
+      chamadas falham imediatamente, sem esperar o timeout de conexão.
+    - Depois disso o circuito fica meio-aberto e um único probe decide se fecha ou reabre.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, probe: Callable[[], bool], ttl: int = 5, probe_interval: int = 10,
+                 failure_threshold: int = 3, reset_timeout: int = 30, background: bool = True):
+        self.probe = probe
+        self.ttl = ttl
+        self.probe_interval = probe_interval
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.background = background
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.total_probes = 0
+        self.total_trips = 0
+
+        self._lock = threading.Lock()
+        self._probing = False
+        self._last_check = 0.0
+        self._opened_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._thread_pid: Optional[int] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, probe: Callable[[], bool]) -> "LineageHealthMonitor":
+        return cls(
+            probe,
+            ttl=int(os.getenv("LINEAGE_DB_HEALTH_TTL", "5")),
+            probe_interval=int(os.getenv("LINEAGE_DB_HEALTH_INTERVAL", "10")),
+            failure_threshold=int(os.getenv("LINEAGE_DB_BREAKER_THRESHOLD", "3")),
+            reset_timeout=int(os.getenv("LINEAGE_DB_BREAKER_RESET", "30")),
+            background=os.getenv("LINEAGE_DB_HEALTH_BACKGROUND", "true").lower() == "true",
+        )
+
+    def is_available(self) -> bool:
+        """
+        Retorna o estado (cacheado) do banco. Só executa um probe quando o estado
+        expirou ou quando o circuito está meio-aberto, e nunca mais de um ao mesmo tempo.
+        """
+        self._ensure_background()
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout or self._probing:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = True
+            elif self._probing or now - self._last_check < self.ttl:
+                return self.state == self.CLOSED
+            else:
+                self._probing = True
+        return self._run_probe()
+
+    def allow_request(self) -> bool:
+        """
+        Checagem barata usada antes de cada consulta: bloqueia apenas enquanto o circuito está aberto.
+        """
+        if self.state != self.OPEN:
+            return True
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def record_success(self):
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._trip()
+
+    def refresh(self) -> bool:
+        """Força um probe imediato (usado pela thread de background)."""
+        with self._lock:
+            if self._probing:
+                return self.state == self.CLOSED
+            if self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._probing = True
+        return self._run_probe()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "available": self.state == self.CLOSED,
+                "failures": self.failures,
+                "total_probes": self.total_probes,
+                "total_trips": self.total_trips,
+                "last_check_age": round(time.monotonic() - self._last_check, 2) if self._last_check else None,
+                "ttl": self.ttl,
+                "reset_timeout": self.reset_timeout,
+            }
+
+    def stop(self):
+        self._stop.set()
+
+    def cached_state(self) -> Optional[bool]:
+        """
+        Estado sem executar probe: True/False quando o estado em cache é válido,
+        None quando é preciso um novo probe (usado pelo AsyncLineageDB, que faz o probe de forma assíncrona).
+        """
+        self._ensure_background()
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout or self._probing:
+                    return False
+                return None
+            if self._probing or now - self._last_check < self.ttl:
+                return self.state == self.CLOSED
+            return None
+
+    def report_probe(self, ok: bool) -> bool:
+        """Registra o resultado de um probe executado externamente."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            self.total_probes += 1
+            if ok:
+                self.failures = 0
+                self.state = self.CLOSED
+            else:
+                self._trip()
+        return ok
+
+    def _run_probe(self) -> bool:
+        try:
+            ok = bool(self.probe())
+        except Exception:
+            ok = False
+
+        with self._lock:
+            self._probing = False
+            self._last_check = time.monotonic()
+            self.total_probes += 1
+            if ok:
+                self.failures = 0
+                self.state = self.CLOSED
+            else:
+                self._trip()
+        return ok
+
+    def _trip(self):
+        # Deve ser chamado com o lock adquirido
+        if self.state != self.OPEN:
+            self.total_trips += 1
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+
+    def _ensure_background(self):
+        # Cada processo (worker do gunicorn/daphne/celery) precisa da sua própria thread
+        if not self.background or (self._thread_pid == os.getpid() and self._thread and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._thread_pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name="lineage-db-health", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.probe_interval):
+            try:
+                self.refresh()
+            except Exception:
+                pass
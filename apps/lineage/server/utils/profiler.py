@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+from utils.metrics import LINEAGE_QUERY_ERRORS, observe_lineage_query
+from utils.request_timing import record_lineage_query
+
+logger = logging.getLogger("lineage.slow_query")
+
+# Limites (ms) dos buckets do histograma de latência; o último bucket é "+Inf"
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Nome da consulta em execução (ex.: "LineageStats.top_pvp"), definido pelo cache_lineage_result
+current_query_name = contextvars.ContextVar("lineage_query_name", default=None)
+
+_LIST_PLACEHOLDER_RE = re.compile(r"\(\s*%\((\w+?)_0\)s(?:\s*,\s*%\(\w+?_\d+\)s)*\s*\)")
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACES_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql: str) -> str:
+    """
+    Normaliza o SQL para agrupar execuções da mesma consulta:
+    remove espaços extras, literais e a expansão das listas ("%(ids_0)s, %(ids_1)s" -> "%(ids)s").
+    """
+    sql = _LIST_PLACEHOLDER_RE.sub(r"(%(\1)s)", sql)
+    sql = _STRING_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    return _SPACES_RE.sub(" ", sql).strip()
+
+
+def params_shape(parameters: Any) -> Any:
+    """
+    Descreve os parâmetros sem expor os valores (senhas, e-mails...): apenas nomes e tipos.
+    """
+    if isinstance(parameters, (list, tuple)) and parameters and isinstance(parameters[0], dict):
+        return {"batch": len(parameters), "params": params_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class QueryStats:
+    """Contadores e histograma de latência de uma consulta."""
+
+    __slots__ = ("name", "sql", "count", "errors", "slow", "total_ms", "max_ms", "buckets", "last_seen")
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.last_seen = 0.0
+
+    def observe(self, elapsed_ms: float, slow: bool):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.last_seen = time.time()
+        if slow:
+            self.slow += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Percentil aproximado pelo limite superior do bucket."""
+        if not self.count:
+            return None
+        target = self.count * pct / 100
+        acc = 0
+        for index, amount in enumerate(self.buckets):
+            acc += amount
+            if acc >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        histogram = {f"le_{limit}": amount for limit, amount in zip(LATENCY_BUCKETS_MS, self.buckets)}
+        histogram["le_inf"] = self.buckets[-1]
+        return {
+            "name": self.name,
+            "sql": self.sql,
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "max_ms": round(self.max_ms, 2),
+            "total_ms": round(self.total_ms, 2),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "histogram": histogram,
+            "last_seen": self.last_seen,
+        }
+
+
+class LineageQueryProfiler:
+    """
+    Profiling por consulta do banco do Lineage, ligado aos eventos do engine
+    (before/after_cursor_execute), então cobre select, escritas, streams e o engine assíncrono.
+
+    - Histograma de latência por consulta nomeada (função da classe de query + SQL normalizado).
+    - Consultas acima de `slow_threshold_ms` são registradas no logger "lineage.slow_query"
+      com o SQL, o formato dos parâmetros e o EXPLAIN (executado fora da requisição).
+    """
+
+    def __init__(self, enabled: bool = True, slow_threshold_ms: int = 500, explain: bool = True,
+                 explain_interval: int = 300, max_queries: int = 500, slow_log_size: int = 100):
+        self.enabled = enabled
+        self.slow_threshold_ms = slow_threshold_ms
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.max_queries = max_queries
+
+        self._stats: Dict[tuple, QueryStats] = {}
+        self._slow_log: deque = deque(maxlen=slow_log_size)
+        self._last_explain: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "LineageQueryProfiler":
+        return cls(
+            enabled=os.getenv("LINEAGE_DB_PROFILING", "true").lower() == "true",
+            slow_threshold_ms=int(os.getenv("LINEAGE_DB_SLOW_QUERY_MS", "500")),
+            explain=os.getenv("LINEAGE_DB_SLOW_QUERY_EXPLAIN", "true").lower() == "true",
+            explain_interval=int(os.getenv("LINEAGE_DB_SLOW_QUERY_EXPLAIN_INTERVAL", "300")),
+        )
+
+    def instrument(self, engine):
+        """Registra os hooks no engine (aceita também o sync_engine de um AsyncEngine)."""
+        if not self.enabled:
+            return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("lineage_query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("lineage_query_start")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        if conn.info.get("lineage_explain"):
+            return
+        self.record(statement, parameters, elapsed_ms, engine=conn.engine)
+
+    def _handle_error(self, context):
+        conn = context.connection
+        if conn is not None and conn.info.get("lineage_query_start"):
+            conn.info["lineage_query_start"].pop()
+        if context.statement:
+            LINEAGE_QUERY_ERRORS.labels(current_query_name.get() or "-").inc()
+            stats = self._get_stats(current_query_name.get(), context.statement)
+            if stats is not None:
+                with self._lock:
+                    stats.errors += 1
+
+    def _get_stats(self, name: Optional[str], statement: str) -> Optional[QueryStats]:
+        sql = normalize_sql(statement)
+        key = (name or "-", sql)
+        stats = self._stats.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.get(key)
+                if stats is None:
+                    if len(self._stats) >= self.max_queries:
+                        self.dropped += 1
+                        return None
+                    stats = self._stats[key] = QueryStats(key[0], sql)
+        return stats
+
+    def record(self, statement: str, parameters: Any, elapsed_ms: float, engine=None):
+        name = current_query_name.get()
+        observe_lineage_query(name, elapsed_ms)
+        record_lineage_query(elapsed_ms)
+        stats = self._get_stats(name, statement)
+        slow = elapsed_ms >= self.slow_threshold_ms
+        if stats is not None:
+            with self._lock:
+                stats.observe(elapsed_ms, slow)
+        if slow:
+            self._log_slow(name, statement, parameters, elapsed_ms, engine)
+
+    def _log_slow(self, name, statement, parameters, elapsed_ms, engine):
+        entry = {
+            "name": name or "-",
+            "sql": normalize_sql(statement),
+            "params": params_shape(parameters),
+            "duration_ms": round(elapsed_ms, 2),
+            "timestamp": time.time(),
+            "explain": None,
+        }
+        with self._lock:
+            self._slow_log.append(entry)
+        logger.warning(
+            "Consulta lenta no banco Lineage (%.1f ms) [%s]: %s | params=%s",
+            elapsed_ms, entry["name"], entry["sql"], entry["params"],
+        )
+
+        # Engines assíncronos ficam de fora: a conexão extra exigiria o event loop
+        if self.explain and engine is not None and not getattr(engine.dialect, "is_async", False) \
+                and statement.lstrip()[:6].upper() == "SELECT" \
+                and not isinstance(parameters, list) and self._should_explain(entry):
+            # O EXPLAIN roda em outra thread para não somar latência à requisição
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lineage-explain")
+            self._executor.submit(self._explain, engine, statement, parameters, entry)
+
+    def _should_explain(self, entry: Dict[str, Any]) -> bool:
+        key = (entry["name"], entry["sql"])
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_explain.get(key, 0) < self.explain_interval:
+                return False
+            self._last_explain[key] = now
+            return True
+
+    def _explain(self, engine, statement, parameters, entry):
+        try:
+            with engine.connect() as conn:
+                conn.info["lineage_explain"] = True
+                try:
+                    rows = conn.exec_driver_sql(f"EXPLAIN {statement}", parameters).mappings().all()
+                finally:
+                    conn.info.pop("lineage_explain", None)
+            entry["explain"] = [dict(row) for row in rows]
+            logger.warning("EXPLAIN [%s]: %s", entry["name"], entry["explain"])
+        except Exception as e:
+            logger.warning("Falha ao executar EXPLAIN da consulta lenta [%s]: %s", entry["name"], e)
+
+    def stats(self, order_by: str = "total_ms", limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [stats.as_dict() for stats in self._stats.values()]
+        items.sort(key=lambda item: item.get(order_by) or 0, reverse=True)
+        return items[:limit] if limit else items
+
+    def slow_queries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._slow_log)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(stats.count for stats in self._stats.values())
+            slow = sum(stats.slow for stats in self._stats.values())
+            errors = sum(stats.errors for stats in self._stats.values())
+            tracked = len(self._stats)
+        return {
+            "enabled": self.enabled,
+            "pid": os.getpid(),
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "tracked_queries": tracked,
+            "dropped_queries": self.dropped,
+            "total_executions": total,
+            "slow_executions": slow,
+            "errors": errors,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self._last_explain.clear()
+            self.dropped = 0
@@ -0,0 +1,127 @@
+import os
+import heapq
+import time
+from itertools import chain, islice
+from typing import Any, Dict, List, Optional
+
+from django.core.cache import cache
+
+# Maior limite servido pelo snapshot (a API aceita até 100); limites maiores caem na consulta direta
+SNAPSHOT_LIMIT = int(os.getenv("LINEAGE_RANKING_SNAPSHOT_LIMIT", "100"))
+SNAPSHOT_INTERVAL = int(os.getenv("LINEAGE_RANKING_SNAPSHOT_INTERVAL", "300"))
+SNAPSHOT_KEY = "lineage_rankings:snapshot"
+# Sobrevive a algumas execuções com falha antes de cair de volta nas consultas por ranking
+SNAPSHOT_TTL = SNAPSHOT_INTERVAL * 3
+SNAPSHOT_LOCK_KEY = "lineage_rankings:building"
+CHUNK_SIZE = 1000
+
+COLUMNS = (
+    "char_name", "pvpkills", "pkkills", "online", "onlinetime",
+    "level", "exp", "base", "clan_name", "clan_id", "ally_id",
+)
+
+
+def _num(value):
+    return value or 0
+
+
+# Mesma ordenação do ORDER BY de cada ranking nas classes de query
+RANKINGS = {
+    "top_pvp": lambda r: (-_num(r.get("pvpkills")), -_num(r.get("pkkills")), -_num(r.get("onlinetime")), r.get("char_name") or ""),
+    "top_pk": lambda r: (-_num(r.get("pkkills")), -_num(r.get("pvpkills")), -_num(r.get("onlinetime")), r.get("char_name") or ""),
+    "top_online": lambda r: (-_num(r.get("onlinetime")), -_num(r.get("pvpkills")), -_num(r.get("pkkills")), r.get("char_name") or ""),
+    "top_level": lambda r: (-_num(r.get("level")), -_num(r.get("exp")), -_num(r.get("onlinetime")), r.get("char_name") or ""),
+}
+
+
+def build_snapshot(limit: int = SNAPSHOT_LIMIT) -> Optional[Dict[str, Any]]:
+    """
+    Lê os personagens uma única vez (cursor no servidor, em lotes) e calcula todos os
+    rankings em memória, mantendo apenas os `limit` primeiros de cada um.
+    """
+    from utils.dynamic_import import get_query_class
+    from apps.lineage.server.database import LineageDB
+
+    if not LineageDB().is_connected():
+        return None
+
+    LineageStats = get_query_class("LineageStats")
+    rows = iter(LineageStats.ranking_snapshot_rows())
+    tops: Dict[str, List[Dict]] = {name: [] for name in RANKINGS}
+    total = 0
+
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        total += len(chunk)
+        for name, key in RANKINGS.items():
+            tops[name] = heapq.nsmallest(limit, chain(tops[name], chunk), key=key)
+
+    # Formato compacto: colunas uma vez + tuplas por linha
+    return {
+        "generated_at": time.time(),
+        "limit": limit,
+        "characters": total,
+        "columns": COLUMNS,
+        "rankings": {
+            name: [tuple(row.get(column) for column in COLUMNS) for row in top]
+            for name, top in tops.items()
+        },
+    }
+
+
+def refresh_snapshot() -> Optional[Dict[str, Any]]:
+    """Recalcula e grava o snapshot (usado pela task do celery-beat)."""
+    snapshot = build_snapshot()
+    if snapshot is not None:
+        cache.set(SNAPSHOT_KEY, snapshot, timeout=SNAPSHOT_TTL)
+    cache.delete(SNAPSHOT_LOCK_KEY)
+    return snapshot
+
+
+def _slice(snapshot, name: str, limit: int) -> Optional[List[Dict]]:
+    if not snapshot or name not in snapshot.get("rankings", {}) or limit > snapshot.get("limit", 0):
+        return None
+    columns = snapshot["columns"]
+    return [dict(zip(columns, row)) for row in snapshot["rankings"][name][:limit]]
+
+
+def _schedule_build():
+    # Sem snapshot (beat parado, cache limpo...): agenda a construção, uma vez por intervalo
+    if not cache.add(SNAPSHOT_LOCK_KEY, 1, timeout=SNAPSHOT_INTERVAL):
+        return
+    try:
+        from apps.lineage.server.tasks import build_ranking_snapshot
+        build_ranking_snapshot.delay()
+    except Exception as e:
+        print(f"⚠️ Falha ao agendar o snapshot de rankings: {e}")
+
+
+def get_ranking(name: str, limit: int = 10) -> List[Dict]:
+    """
+    Retorna o ranking a partir do snapshot; sem snapshot (ou limite maior que o dele)
+    usa a consulta da classe de query.
+    """
+    rows = _slice(cache.get(SNAPSHOT_KEY), name, limit)
+    if rows is not None:
+        return rows
+    if limit <= SNAPSHOT_LIMIT:
+        _schedule_build()
+
+    from utils.dynamic_import import get_query_class
+    return getattr(get_query_class("LineageStats"), name)(limit=limit)
+
+
+async def aget_ranking(name: str, limit: int = 10) -> List[Dict]:
+    """Versão assíncrona do get_ranking (views públicas dos tops)."""
+    rows = _slice(await cache.aget(SNAPSHOT_KEY), name, limit)
+    if rows is not None:
+        return rows
+
+    from asgiref.sync import sync_to_async
+    from apps.lineage.server.async_database import AsyncLineageStats
+
+    if limit <= SNAPSHOT_LIMIT:
+        await sync_to_async(_schedule_build, thread_sensitive=False)()
+    return await getattr(AsyncLineageStats, name)(limit=limit)
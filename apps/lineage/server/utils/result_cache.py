@@ -0,0 +1,139 @@
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Estimativa aproximada (em bytes) do espaço ocupado por um resultado de consulta.
+    Considera listas de linhas (dict/RowMapping) e os valores de cada coluna.
+    """
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict) or hasattr(value, "items"):
+        try:
+            items = value.items()
+        except Exception:
+            return sys.getsizeof(value)
+        return sys.getsizeof(value) + sum(
+            sys.getsizeof(k) + sys.getsizeof(v) for k, v in items
+        )
+    return sys.getsizeof(value)
+
+
+class LineageResultCache:
+    """
+    Cache LRU em memória, limitado por número de entradas e por bytes,
+    com TTL por entrada e acesso seguro entre threads.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024, default_ttl: int = 60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+
+        # chave -> (valor, expira_em, tamanho)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        size = estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            # Resultado maior que o cache inteiro: não vale a pena armazenar
+            return
+
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Remove todas as entradas expiradas e retorna quantas foram removidas."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+            return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "default_ttl": self.default_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round((self.hits / lookups) * 100, 2) if lookups else 0,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        # Remove as entradas menos usadas recentemente até respeitar os limites
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evictions += 1
@@ -0,0 +1,228 @@
+import os
+import heapq
+import time
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+
+# Modo delta a cada INTERVAL segundos (personagens online, os online na execução anterior e donos de
+# itens novos); varredura completa a cada FULL_INTERVAL (corrige o que mudou com o personagem offline
+# e remove os excluídos)
+WEALTH_INTERVAL = int(os.getenv("LINEAGE_WEALTH_INDEX_INTERVAL", "120"))
+WEALTH_FULL_INTERVAL = int(os.getenv("LINEAGE_WEALTH_INDEX_FULL_INTERVAL", "3600"))
+WEALTH_PREFIX = "lineage_wealth"
+BATCH_SIZE = 1000
+
+
+def active_adena_config() -> Tuple[int, int]:
+    """Item de bilhão ativo (ActiveAdenaExchangeItem) e o valor em adena de cada unidade."""
+    from apps.lineage.server.models import ActiveAdenaExchangeItem
+
+    active_item = ActiveAdenaExchangeItem.objects.filter(active=True).order_by('-created_at').first()
+    if active_item:
+        return active_item.item_type, active_item.value_item
+    return 0, 1000000
+
+
+def _redis():
+    # Sorted set no Redis quando o cache é o django-redis; sem ele (DEBUG/locmem) o índice fica no cache do Django
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+class WealthIndex:
+    """
+    Índice de riqueza (adena + itens de bilhão convertidos) por personagem.
+
+    - Scores em um sorted set (ordenação) e valores exatos em um hash (o score é float).
+    - A reconstrução completa grava em chaves temporárias e troca de uma vez (RENAME).
+    - O modo delta recalcula os personagens online, os que estavam online na execução anterior
+      (last-seen, pega o saldo final no logout) e os donos de itens com object_id maior que o
+      último visto; os last-seen que não voltam mais (sem adena, banidos) saem do índice.
+    """
+
+    def __init__(self, adn_billion_item: int = 0, value_item: int = 1000000):
+        # Sem item de bilhão o valor não importa: todas as configurações caem no mesmo índice
+        if not adn_billion_item:
+            value_item = 0
+        self.adn_billion_item = adn_billion_item
+        self.value_item = value_item
+        base = f"{WEALTH_PREFIX}:{adn_billion_item}:{value_item}"
+        self.scores_key = f"{base}:scores"
+        self.amounts_key = f"{base}:amounts"
+        self.meta_key = f"{base}:meta"
+        self.lock_key = f"{base}:building"
+
+    def meta(self) -> Optional[Dict]:
+        return cache.get(self.meta_key)
+
+    def _exists(self, client) -> bool:
+        if client is not None:
+            return bool(client.exists(self.scores_key))
+        return cache.get(self.scores_key) is not None
+
+    def rebuild(self, full: bool = False) -> Optional[Dict]:
+        from utils.dynamic_import import get_query_class
+        from apps.lineage.server.database import LineageDB
+
+        if not LineageDB().is_connected():
+            return None
+        if not cache.add(self.lock_key, 1, timeout=WEALTH_FULL_INTERVAL):
+            return None
+
+        try:
+            client = _redis()
+            meta = self.meta()
+            full = (
+                full or meta is None or not self._exists(client)
+                or time.time() - meta.get("full_at", 0) >= WEALTH_FULL_INTERVAL
+            )
+            since = None if full else meta["max_object_id"]
+            requested = set() if full else set(meta.get("online_ids", ()))
+
+            LineageStats = get_query_class("LineageStats")
+            rows = iter(LineageStats.adena_wealth_rows(
+                adn_billion_item=self.adn_billion_item,
+                value_item=self.value_item,
+                min_object_id=since,
+                owner_ids=requested,
+            ))
+
+            seen, online_ids = set(), []
+            if client is not None:
+                max_object_id = self._store_redis(client, rows, full, seen, online_ids)
+            else:
+                max_object_id = self._store_cache(rows, full, seen, online_ids)
+
+            removed = requested - seen
+            if removed:
+                self._remove(client, removed)
+
+            now = time.time()
+            meta = {
+                "max_object_id": max(max_object_id, 0 if full else meta["max_object_id"]),
+                "full_at": now if full else meta["full_at"],
+                "updated_at": now,
+                "updated_owners": len(seen),
+                "removed_owners": len(removed),
+                "online_ids": online_ids,
+            }
+            cache.set(self.meta_key, meta, timeout=None)
+            return meta
+        finally:
+            cache.delete(self.lock_key)
+
+    @staticmethod
+    def _track(row, seen: set, online_ids: list):
+        seen.add(int(row["owner_id"]))
+        if row["online"]:
+            online_ids.append(int(row["owner_id"]))
+
+    def _store_redis(self, client, rows, full: bool, seen: set, online_ids: list) -> int:
+        scores_key, amounts_key = self.scores_key, self.amounts_key
+        if full:
+            scores_key, amounts_key = f"{scores_key}:tmp", f"{amounts_key}:tmp"
+            client.delete(scores_key, amounts_key)
+
+        max_object_id = 0
+        while True:
+            chunk = list(islice(rows, BATCH_SIZE))
+            if not chunk:
+                break
+            scores, amounts = {}, {}
+            for row in chunk:
+                self._track(row, seen, online_ids)
+                adenas = int(row["adenas"] or 0)
+                scores[row["owner_id"]] = float(adenas)
+                amounts[row["owner_id"]] = adenas
+                max_object_id = max(max_object_id, int(row["max_object_id"] or 0))
+            pipe = client.pipeline(transaction=False)
+            pipe.zadd(scores_key, scores)
+            pipe.hset(amounts_key, mapping=amounts)
+            pipe.execute()
+
+        if full:
+            pipe = client.pipeline()
+            if seen:
+                pipe.rename(scores_key, self.scores_key)
+                pipe.rename(amounts_key, self.amounts_key)
+            else:
+                pipe.delete(self.scores_key, self.amounts_key)
+            pipe.execute()
+        return max_object_id
+
+    def _store_cache(self, rows, full: bool, seen: set, online_ids: list) -> int:
+        amounts = {} if full else (cache.get(self.scores_key) or {})
+        max_object_id = 0
+        for row in rows:
+            self._track(row, seen, online_ids)
+            amounts[row["owner_id"]] = int(row["adenas"] or 0)
+            max_object_id = max(max_object_id, int(row["max_object_id"] or 0))
+        cache.set(self.scores_key, amounts, timeout=None)
+        return max_object_id
+
+    def _remove(self, client, owner_ids: set):
+        if client is not None:
+            pipe = client.pipeline(transaction=False)
+            pipe.zrem(self.scores_key, *owner_ids)
+            pipe.hdel(self.amounts_key, *owner_ids)
+            pipe.execute()
+            return
+        amounts = cache.get(self.scores_key) or {}
+        for owner_id in owner_ids:
+            amounts.pop(owner_id, None)
+        cache.set(self.scores_key, amounts, timeout=None)
+
+    def top(self, limit: int) -> Optional[List[Tuple[int, int]]]:
+        """[(owner_id, adenas)] dos mais ricos, ou None se o índice ainda não foi construído."""
+        client = _redis()
+        if client is None:
+            amounts = cache.get(self.scores_key)
+            if amounts is None:
+                return None
+            return heapq.nlargest(limit, amounts.items(), key=lambda item: item[1])
+
+        owner_ids = [int(owner) for owner in client.zrevrange(self.scores_key, 0, limit - 1)]
+        if not owner_ids:
+            return [] if self.meta() else None
+        amounts = client.hmget(self.amounts_key, owner_ids)
+        return [(owner, int(amount or 0)) for owner, amount in zip(owner_ids, amounts)]
+
+
+def schedule_wealth_index(adn_billion_item: int, value_item: int):
+    # Índice ausente para essa configuração: agenda a construção uma vez por intervalo
+    index = WealthIndex(adn_billion_item, value_item)
+    if not cache.add(f"{index.lock_key}:scheduled", 1, timeout=WEALTH_INTERVAL):
+        return
+    try:
+        from apps.lineage.server.tasks import update_adena_wealth_index
+        update_adena_wealth_index.delay(index.adn_billion_item, index.value_item)
+    except Exception as e:
+        print(f"⚠️ Falha ao agendar o índice de riqueza: {e}")
+
+
+def get_top_adena(limit: int = 10, adn_billion_item: int = 0, value_item: int = 1000000) -> List[Dict]:
+    """
+    Ranking de riqueza servido pelo índice; enquanto ele não existe usa o LineageStats.top_adena.
+    """
+    from utils.dynamic_import import get_query_class
+
+    LineageStats = get_query_class("LineageStats")
+    entries = WealthIndex(adn_billion_item, value_item).top(limit)
+    if entries is None:
+        schedule_wealth_index(adn_billion_item, value_item)
+        return LineageStats.top_adena(limit=limit, adn_billion_item=adn_billion_item, value_item=value_item)
+
+    amounts = dict(entries)
+    characters = LineageStats.adena_rank_characters(sorted(amounts))
+    result = []
+    for char in characters:
+        row = dict(char)
+        row["adenas"] = amounts.get(row.pop("owner_id"), 0)
+        result.append(row)
+    result.sort(key=lambda r: (-r["adenas"], -(r.get("onlinetime") or 0), r.get("char_name") or ""))
+    return result
@@ -0,0 +1,59 @@
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+
+from apps.lineage.server.database import LineageDB
+from apps.lineage.server.utils.crest import CREST_SIZES, EMPTY_DIGEST, crest_digest, crest_png, render_crest_sprite
+
+from utils.dynamic_import import get_query_class  # importa o helper
+LineageStats = get_query_class("LineageStats")  # carrega a classe certa com base no .env
+
+# URLs versionadas (?v=<hash>) nunca mudam de conteúdo; sem versão o navegador revalida com o ETag
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SHORT_CACHE_CONTROL = "public, max-age=300"
+
+
+def _not_modified(request, etag):
+    if_none_match = request.headers.get("If-None-Match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+
+def _image_response(request, etag, cache_control, render):
+    if _not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(render(), content_type="image/png")
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
+def crest_image_view(request, crest_type, crest_id):
+    if crest_type not in CREST_SIZES:
+        raise Http404
+
+    blob = None
+    if crest_id and LineageDB().is_connected():
+        rows = LineageStats.get_crests([crest_id], type=crest_type) or []
+        blob = rows[0].get('crest') if rows else None
+
+    digest = crest_digest(blob)
+    version = request.GET.get("v")
+    # Só é imutável quando a versão pedida é a atual (o crest pode ter sido trocado no jogo)
+    cache_control = IMMUTABLE_CACHE_CONTROL if version and version == digest[:16] else SHORT_CACHE_CONTROL
+    if digest == EMPTY_DIGEST:
+        digest = f"{EMPTY_DIGEST}-{crest_type}"
+
+    return _image_response(request, f'"{digest}"', cache_control, lambda: crest_png(blob, crest_type))
+
+
+def crest_sprite_view(request, sprite_key):
+    etag = f'"{sprite_key}"'
+    # A chave do sprite é o hash dos crests que o compõem: se o navegador já tem, não precisa do layout
+    if _not_modified(request, etag):
+        return _image_response(request, etag, IMMUTABLE_CACHE_CONTROL, None)
+
+    png, complete = render_crest_sprite(sprite_key)
+    if png is None:
+        raise Http404
+    return _image_response(
+        request, etag, IMMUTABLE_CACHE_CONTROL if complete else SHORT_CACHE_CONTROL, lambda: png,
+    )
@@ -7,6 +7,8 @@ from apps.lineage.wallet.models import Wallet
 from apps.lineage.wallet.signals import aplicar_transacao
 from ..models import ServicePrice
 from ..decorators import require_lineage_connection
+from ..utils.character_index import is_name_taken, mark_character_dirty
+from django.http import JsonResponse
 import re
 
 from utils.dynamic_import import get_query_class  
@@ -45,6 +47,10 @@ def change_nickname_view(request, char_id):
             messages.error(request, _("Nickname inválido. Use de 2 a 16 caracteres latinos ou de 3 a 16 caracteres cirílicos."))
             return redirect("server:change_nickname", char_id=char_id)
 
+        if is_name_taken(name):
+            messages.error(request, _("Este nickname já está em uso."))
+            return redirect("server:change_nickname", char_id=char_id)
+
         wallet, wallet_created = Wallet.objects.get_or_create(usuario=request.user)
 
         if wallet.saldo < price:
@@ -54,6 +60,7 @@ def change_nickname_view(request, char_id):
         result = LineageServices.change_nickname(acc, cid, name)
 
         if result:
+            mark_character_dirty(cid)
             aplicar_transacao(wallet, "SAIDA", price, descricao="Alteração de Nickname")
             messages.success(request, _("Nickname alterado com sucesso!"))
             return redirect("server:account_dashboard")
@@ -68,6 +75,16 @@ def change_nickname_view(request, char_id):
     return render(request, "services/change_nickname.html", context)
 
 
+@conditional_otp_required
+@require_lineage_connection
+def check_nickname_view(request):
+    """Disponibilidade do nickname enquanto o usuário digita (consulta o índice de personagens)."""
+    name = request.GET.get("name", "").strip()
+    if len(name) < 2:
+        return JsonResponse({"available": False})
+    return JsonResponse({"available": not is_name_taken(name)})
+
+
 @conditional_otp_required
 @require_lineage_connection
 def change_sex_view(request, char_id):
@@ -8,6 +8,7 @@ from django.conf import settings
 from datetime import datetime, timedelta
 from apps.lineage.server.database import LineageDB
 from apps.lineage.server.utils.crest import attach_crests_to_clans
+from apps.lineage.inventory.utils.items import item_names
 from utils.resources import get_class_name
 
 from utils.dynamic_import import get_query_class  # importa o helper
@@ -182,16 +183,10 @@ def boss_jewel_locations_view(request):
         boss_jewel_ids = [6656, 6657, 6658, 6659, 6660, 6661, 8191]
         jewel_locations = LineageStats.boss_jewel_locations(boss_jewel_ids)
 
-        # Caminho para o itens.json
-        itens_path = os.path.join(settings.BASE_DIR, 'utils/data/itens.json')
-        with open(itens_path, 'r', encoding='utf-8') as f:
-            itens_data = json.load(f)
-
         # Substituir item_id pelo item_name
+        names = item_names((loc['item_id'] for loc in jewel_locations), "Desconhecido")
         for loc in jewel_locations:
-            item_id_str = str(loc['item_id'])
-            item_name = itens_data.get(item_id_str, ["Desconhecido"])[0]
-            loc['item_name'] = item_name
+            loc['item_name'] = names.get(int(loc['item_id']), "Desconhecido")
 
         # adiciona as crests dos clans
         jewel_locations = attach_crests_to_clans(jewel_locations)    
@@ -2,6 +2,8 @@ from django.shortcuts import render
 from apps.main.home.decorator import conditional_otp_required
 from apps.lineage.server.utils.crest import attach_crests_to_clans
 from apps.lineage.server.database import LineageDB
+from apps.lineage.server.utils.rankings import get_ranking
+from apps.lineage.server.utils.wealth import get_top_adena
 from ..models import ActiveAdenaExchangeItem
 
 from utils.dynamic_import import get_query_class  # importa o helper
@@ -11,7 +13,7 @@ LineageStats = get_query_class("LineageStats")  # carrega a classe certa com bas
 @conditional_otp_required
 def top_pvp_view(request):
     db = LineageDB()
-    result = LineageStats.top_pvp(limit=20) if db.is_connected() else []
+    result = get_ranking("top_pvp", limit=20) if db.is_connected() else []
     result = attach_crests_to_clans(result)
     return render(request, 'tops/top_pvp.html', {'players': result})
 
@@ -19,7 +21,7 @@ def top_pvp_view(request):
 @conditional_otp_required
 def top_pk_view(request):
     db = LineageDB()
-    result = LineageStats.top_pk(limit=20) if db.is_connected() else []
+    result = get_ranking("top_pk", limit=20) if db.is_connected() else []
     result = attach_crests_to_clans(result)
     return render(request, 'tops/top_pk.html', {'players': result})
 
@@ -38,7 +40,7 @@ def top_adena_view(request):
         value_item = active_item.value_item
 
     if db.is_connected():
-        result = LineageStats.top_adena(limit=20, adn_billion_item=adn_billion_item, value_item=value_item)
+        result = get_top_adena(limit=20, adn_billion_item=adn_billion_item, value_item=value_item)
         result = attach_crests_to_clans(result)
     else:
         result = list()
@@ -57,13 +59,13 @@ def top_clans_view(request):
 @conditional_otp_required
 def top_level_view(request):
     db = LineageDB()
-    result = LineageStats.top_level(limit=20) if db.is_connected() else []
+    result = get_ranking("top_level", limit=20) if db.is_connected() else []
     result = attach_crests_to_clans(result)
     return render(request, 'tops/top_level.html', {'players': result})
 
 
 def top_online_view(request):
     db = LineageDB()
-    result = LineageStats.top_online(limit=20) if db.is_connected() else []
+    result = get_ranking("top_online", limit=20) if db.is_connected() else []
     result = attach_crests_to_clans(result)
     return render(request, 'tops/top_online.html', {"ranking": result})
@@ -1,8 +1,11 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
 from django.utils.translation import gettext_lazy as _
-from apps.lineage.server.utils.crest import attach_crests_to_clans
+from apps.lineage.server.utils.crest import attach_crests_to_clans, aattach_crests_to_clans
 from apps.lineage.server.database import LineageDB
+from apps.lineage.server.async_database import AsyncLineageStats, ais_lineage_connected
+from apps.lineage.server.utils.rankings import aget_ranking
+from apps.lineage.server.utils.wealth import get_top_adena
 from apps.lineage.server.models import ActiveAdenaExchangeItem
 from datetime import datetime
 
@@ -22,6 +25,21 @@ class TopsBaseView(TemplateView):
         return _('Tops')
 
 
+class AsyncTopsBaseView(TopsBaseView):
+    """
+    Base para os rankings públicos servidos como views assíncronas:
+    as consultas passam pelo AsyncLineageDB sem ocupar uma thread por requisição
+    (sem ele, pelo LineageDB síncrono em uma thread).
+    """
+
+    async def get(self, request, *args, **kwargs):
+        context = await self.aget_context_data(**kwargs)
+        return self.render_to_response(context)
+
+    async def aget_context_data(self, **kwargs):
+        return self.get_context_data(**kwargs)
+
+
 class TopsHomeView(TopsBaseView):
     template_name = 'tops/home.html'
     
@@ -29,13 +47,12 @@ class TopsHomeView(TopsBaseView):
         return _('Tops')
 
 
-class TopsPvpView(TopsBaseView):
+class TopsPvpView(AsyncTopsBaseView):
     template_name = 'tops/pvp.html'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        result = LineageStats.top_pvp(limit=20) if db.is_connected() else []
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
+        result = await aget_ranking("top_pvp", limit=20) if await ais_lineage_connected() else []
         
         # Processar os dados para incluir nome da classe
         from utils.resources import get_class_name
@@ -45,7 +62,7 @@ class TopsPvpView(TopsBaseView):
             else:
                 player['class_name'] = '-'
         
-        result = attach_crests_to_clans(result)
+        result = await aattach_crests_to_clans(result)
         context['players'] = result
         return context
     
@@ -53,13 +70,12 @@ class TopsPvpView(TopsBaseView):
         return _('Ranking PvP')
 
 
-class TopsPkView(TopsBaseView):
+class TopsPkView(AsyncTopsBaseView):
     template_name = 'tops/pk.html'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        result = LineageStats.top_pk(limit=20) if db.is_connected() else []
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
+        result = await aget_ranking("top_pk", limit=20) if await ais_lineage_connected() else []
         
         # Processar os dados para incluir nome da classe
         from utils.resources import get_class_name
@@ -69,7 +85,7 @@ class TopsPkView(TopsBaseView):
             else:
                 player['class_name'] = '-'
         
-        result = attach_crests_to_clans(result)
+        result = await aattach_crests_to_clans(result)
         context['players'] = result
         return context
     
@@ -113,7 +129,7 @@ class TopsAdenaView(TopsBaseView):
             return ' '.join(parts) if parts else "0m"
 
         if db.is_connected():
-            result = LineageStats.top_adena(limit=20, adn_billion_item=adn_billion_item, value_item=value_item)
+            result = get_top_adena(limit=20, adn_billion_item=adn_billion_item, value_item=value_item)
             
             # Padronizar campo adena
             for player in result:
@@ -147,14 +163,13 @@ class TopsAdenaView(TopsBaseView):
         return _('Ranking Adena')
 
 
-class TopsClansView(TopsBaseView):
+class TopsClansView(AsyncTopsBaseView):
     template_name = 'tops/clans.html'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        db = LineageDB()
-        clanes = LineageStats.top_clans(limit=20) if db.is_connected() else []
-        clanes = attach_crests_to_clans(clanes)
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
+        clanes = await AsyncLineageStats.top_clans(limit=20) if await ais_lineage_connected() else []
+        clanes = await aattach_crests_to_clans(clanes)
         context['clans'] = clanes
         return context
     
@@ -162,12 +177,11 @@ class TopsClansView(TopsBaseView):
         return _('Ranking Clans')
 
 
-class TopsLevelView(TopsBaseView):
+class TopsLevelView(AsyncTopsBaseView):
     template_name = 'tops/level.html'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        db = LineageDB()
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
         
         def humanize_time(seconds):
             from datetime import timedelta
@@ -188,7 +202,7 @@ class TopsLevelView(TopsBaseView):
                 parts.append(f"{minutes}m")
             return ' '.join(parts) if parts else "0m"
 
-        result = LineageStats.top_level(limit=20) if db.is_connected() else []
+        result = await aget_ranking("top_level", limit=20) if await ais_lineage_connected() else []
         
         # Processar os dados para incluir nome da classe e tempo online humanizado
         from utils.resources import get_class_name
@@ -202,7 +216,7 @@ class TopsLevelView(TopsBaseView):
             # Adicionar campo tempo online humanizado
             player['human_onlinetime'] = humanize_time(player.get('onlinetime', 0))
         
-        result = attach_crests_to_clans(result)
+        result = await aattach_crests_to_clans(result)
         context['players'] = result
         return context
     
@@ -210,12 +224,11 @@ class TopsLevelView(TopsBaseView):
         return _('Ranking Nível')
 
 
-class TopsOnlineView(TopsBaseView):
+class TopsOnlineView(AsyncTopsBaseView):
     template_name = 'tops/online.html'
     
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        db = LineageDB()
+    async def aget_context_data(self, **kwargs):
+        context = await super().aget_context_data(**kwargs)
         
         def humanize_time(seconds):
             from datetime import timedelta
@@ -236,7 +249,7 @@ class TopsOnlineView(TopsBaseView):
                 parts.append(f"{minutes}m")
             return ' '.join(parts) if parts else "0m"
 
-        result = LineageStats.top_online(limit=20) if db.is_connected() else []
+        result = await aget_ranking("top_online", limit=20) if await ais_lineage_connected() else []
         
         # Processar os dados para incluir nome da classe e tempo online humanizado
         from utils.resources import get_class_name
@@ -250,7 +263,7 @@ class TopsOnlineView(TopsBaseView):
             # Adicionar campo tempo online humanizado
             player['human_onlinetime'] = humanize_time(player.get('onlinetime', 0))
         
-        result = attach_crests_to_clans(result)
+        result = await aattach_crests_to_clans(result)
         context['ranking'] = result
         return context
     
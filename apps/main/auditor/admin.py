@@ -1,14 +1,30 @@
 from django.contrib import admin
 from core.admin import BaseModelAdmin
-from .models import Auditor
+from .models import Auditor, AuditorDailyRollup, AuditorHourlyRollup
 
 
 @admin.register(Auditor)
 class AuditorAdmin(BaseModelAdmin):
-    list_display = ['date', 'path', 'total_time', 'python_time', 'db_time', 'total_queries']
+    list_display = ['date', 'path', 'total_time', 'python_time', 'db_time', 'total_queries',
+                    'lineage_time', 'lineage_queries']
     list_filter = ['date', 'path', 'method', 'response_status_code']
     search_fields = ['path', 'user_agent', 'ip']
     readonly_fields = ['date', 'path', 'total_time', 'python_time', 'db_time', 'total_queries',
-                       'method', 'host', 'port', 'content_type', 'body', 'user_agent',
+                       'lineage_time', 'lineage_queries', 'method', 'host', 'port', 'content_type', 'body', 'user_agent',
                        'response_content', 'response_status_code', 'ip', 'proxy_verified']
     ordering = ['-date']
+
+
+class AuditorRollupAdmin(BaseModelAdmin):
+    list_display = ['period_start', 'path', 'requests', 'total_time_avg', 'total_time_p95', 'db_time_p95',
+                    'status_4xx', 'status_5xx']
+    list_filter = ['period_start']
+    search_fields = ['path']
+    readonly_fields = ['period_start', 'path', 'requests', 'total_time_avg', 'total_time_p95', 'total_time_max',
+                       'db_time_avg', 'db_time_p95', 'lineage_time_avg', 'queries_avg', 'status_2xx', 'status_3xx',
+                       'status_4xx', 'status_5xx', 'total_time_histogram', 'db_time_histogram']
+    ordering = ['-period_start', '-requests']
+
+
+admin.site.register(AuditorHourlyRollup, AuditorRollupAdmin)
+admin.site.register(AuditorDailyRollup, AuditorRollupAdmin)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.main.auditor.models import Auditor
+from apps.main.auditor.rollups import day_start, hour_start, missing_hours, rollup_day, rollup_hour
+
+
+class Command(BaseCommand):
+    help = 'Gera os resumos por hora e por dia da auditoria a partir dos registros existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Data inicial (AAAA-MM-DD); padrão: registro mais antigo do Auditor',
+        )
+        parser.add_argument(
+            '--until',
+            help='Data final exclusiva (AAAA-MM-DD); padrão: hora atual',
+        )
+        parser.add_argument(
+            '--skip-existing',
+            action='store_true',
+            help='Não refaz as horas que já possuem resumo',
+        )
+
+    def _parse_date(self, value):
+        try:
+            return timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            raise CommandError(f'Data inválida: {value} (use AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        if options['since']:
+            since = self._parse_date(options['since'])
+        else:
+            oldest = Auditor.objects.order_by('date').values_list('date', flat=True).first()
+            if oldest is None:
+                self.stdout.write(self.style.WARNING('⚠️ Nenhum registro de auditoria encontrado.'))
+                return
+            since = oldest
+        until = self._parse_date(options['until']) if options['until'] else timezone.now()
+
+        # Apenas períodos completos; cada hora é lida em blocos e gravada em uma transação
+        first_hour, last_hour = hour_start(since), hour_start(until)
+        if first_hour >= last_hour:
+            self.stdout.write(self.style.WARNING('⚠️ Nenhuma hora completa no intervalo informado.'))
+            return
+
+        self.stdout.write(f'🚀 Gerando resumos por hora de {first_hour:%Y-%m-%d %H:%M} até {last_hour:%Y-%m-%d %H:%M}...')
+        if options['skip_existing']:
+            hours = missing_hours(first_hour, last_hour)
+        else:
+            hours = (first_hour + timedelta(hours=index)
+                     for index in range(int((last_hour - first_hour) / timedelta(hours=1))))
+
+        processed = paths = 0
+        for hour in hours:
+            paths += rollup_hour(hour)
+            processed += 1
+            if processed % 24 == 0:
+                self.stdout.write(f'   {processed} hora(s) processada(s) (até {hour:%Y-%m-%d %H:%M})')
+
+        days = 0
+        day, last_day = day_start(first_hour), day_start(until)
+        while day < last_day:
+            rollup_day(day)
+            days += 1
+            day += timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ {processed} hora(s) ({paths} resumo(s) por caminho) e {days} dia(s) resumidos.')
+        )
@@ -1,15 +1,12 @@
 import logging
-from functools import reduce
-from operator import add
 from time import time
-import threading
 
 from django.conf import settings
-from django.db import IntegrityError, DataError, connection, transaction
 from django.utils import timezone
 from django.http.request import RawPostDataException
 
-from .models import Auditor
+from utils.request_timing import track_request
+from .writer import audit_writer
 from python_ipware import IpWare
 
 logger = logging.getLogger(__name__)
@@ -21,8 +18,6 @@ class AuditorMiddleware:
         self.AUDITOR_MIDDLEWARE_ENABLE = getattr(settings, "AUDITOR_MIDDLEWARE_ENABLE", False)
         self.AUDITOR_MIDDLEWARE_RESTRICT_PATHS = getattr(settings, "AUDITOR_MIDDLEWARE_RESTRICT_PATHS", [])
         self.AUDITOR_MIDDLEWARE_CONTENT = getattr(settings, "DEBUG", False)
-        # Adiciona lock para evitar concorrência
-        self._save_lock = threading.Lock()
 
     def __call__(self, request):
         if not self.AUDITOR_MIDDLEWARE_ENABLE:
@@ -46,30 +41,34 @@ class AuditorMiddleware:
                 response = self.get_response(request)
                 return response
 
-        previous_connections = len(connection.queries)
-        start_time = time()
+        # Consultas medidas pelo execute_wrapper (funciona com DEBUG=False, ao contrário do connection.queries)
+        with track_request() as timing:
+            before = timing.snapshot()
+            start_time = time()
 
-        # Save the raw body data before it's potentially read
-        try:
-            raw_body = request.body
-        except RawPostDataException:
-            raw_body = None
+            # Save the raw body data before it's potentially read
+            try:
+                raw_body = request.body
+            except RawPostDataException:
+                raw_body = None
 
-        response = self.get_response(request)
+            response = self.get_response(request)
+            total_time = time() - start_time
+            queries, db_time, lineage_queries, lineage_time = (
+                after - previous for after, previous in zip(timing.snapshot(), before)
+            )
 
         s = {
             'date': timezone.now(),
             'path': request.path,
-            'total_time': time() - start_time,
-            'total_queries': len(connection.queries) - previous_connections,
+            'total_time': total_time,
+            'total_queries': queries,
+            'db_time': db_time,
+            'lineage_queries': lineage_queries,
+            'lineage_time': lineage_time,
         }
 
-        if s['total_queries'] > 0:
-            s['db_time'] = reduce(add, [float(q['time']) for q in connection.queries[previous_connections:]])
-        else:
-            s['db_time'] = 0.0
-
-        s['python_time'] = s['total_time'] - s['db_time']
+        s['python_time'] = max(total_time - db_time - lineage_time, 0.0)
         ip, s['proxy_verified'] = ipw.get_client_ip(meta=request.META)
         s['ip'] = str(ip) if ip is not None else request.META.get('REMOTE_ADDR')
         s['method'] = request.method
@@ -86,8 +85,8 @@ class AuditorMiddleware:
         s['response_content'] = "DISABLE"
         s['response_status_code'] = getattr(response, 'status_code', None)
 
-        # Salva os dados de auditoria de forma assíncrona e segura
-        self._save_audit_data_async(s)
+        # Apenas enfileira: a gravação em lote acontece em background (ver writer.AuditWriter)
+        audit_writer.submit(s)
 
         return response
 
@@ -103,51 +102,3 @@ class AuditorMiddleware:
             '/__debug__/',
         ]
         return any(path.startswith(pattern) for pattern in skip_patterns)
-
-    def _save_audit_data_async(self, audit_data):
-        """Salva dados de auditoria de forma assíncrona e segura"""
-        try:
-            # Usa lock para evitar concorrência
-            with self._save_lock:
-                # Garantir que todos os campos obrigatórios estão presentes
-                required_fields = ['date', 'path', 'total_time', 'total_queries', 'db_time', 'python_time', 'ip', 'method', 'user_agent', 'host', 'port', 'content_type', 'response_content', 'response_status_code']
-                missing_fields = [field for field in required_fields if field not in audit_data or audit_data[field] is None]
-
-                if missing_fields:
-                    logger.error(f"Missing required fields: {missing_fields}. Unable to save event data: {audit_data}")
-                    return
-
-                # Tenta salvar com timeout e retry
-                self._save_with_retry(audit_data)
-
-        except Exception as e:
-            logger.error(f"Unexpected error in audit save: {e}. Event data: {audit_data}")
-
-    def _save_with_retry(self, audit_data, max_retries=3, retry_delay=0.1):
-        """Salva com retry em caso de erro de banco bloqueado"""
-        for attempt in range(max_retries):
-            try:
-                with transaction.atomic():
-                    event = Auditor(**audit_data)
-                    event.save()
-                return  # Sucesso, sai da função
-                
-            except IntegrityError as e:
-                logger.warning(f"IntegrityError (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
-                    logger.error(f"IntegrityError: Error saving statistics to the database. Error: {e}. Event data: {audit_data}")
-                    
-            except DataError as e:
-                logger.warning(f"DataError (attempt {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
-                    logger.error(f"DataError: Error saving statistics to the database. Error: {e}. Event data: {audit_data}")
-                    
-            except Exception as e:
-                if "database is locked" in str(e).lower():
-                    logger.warning(f"Database locked (attempt {attempt + 1}/{max_retries}): {e}")
-                    if attempt < max_retries - 1:
-                        import time
-                        time.sleep(retry_delay * (attempt + 1))  # Backoff exponencial
-                        continue
-                logger.error(f"Error saving statistics to the database. Error: {e}. Event data: {audit_data}")
-                break
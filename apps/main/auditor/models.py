@@ -3,12 +3,14 @@ from core.models import BaseModel
 from django.utils.translation import gettext_lazy as _
 
 class Auditor(BaseModel):
-    date = models.DateTimeField(auto_now_add=True, verbose_name=_("Data"))
+    date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Data"))
     
     total_time = models.FloatField(verbose_name=_("Tempo Total"))
     python_time = models.FloatField(verbose_name=_("Tempo Python"))
     db_time = models.FloatField(verbose_name=_("Tempo DB"))
     total_queries = models.IntegerField(verbose_name=_("Total de Consultas"))
+    lineage_time = models.FloatField(default=0, verbose_name=_("Tempo DB Lineage"))
+    lineage_queries = models.IntegerField(default=0, verbose_name=_("Consultas Lineage"))
 
     path = models.TextField(verbose_name=_("Caminho"))
     method = models.CharField(max_length=10, verbose_name=_("Método"))
@@ -29,3 +31,47 @@ class Auditor(BaseModel):
     class Meta:
         verbose_name = _('Histórico')
         verbose_name_plural = _('Históricos')
+
+
+class AuditorRollupBase(BaseModel):
+    """Resumo por caminho de um período (hora ou dia), calculado a partir do Auditor (ver rollups.py)"""
+
+    period_start = models.DateTimeField(db_index=True, verbose_name=_("Início do Período"))
+    path = models.TextField(verbose_name=_("Caminho"))
+
+    requests = models.IntegerField(default=0, verbose_name=_("Requisições"))
+    total_time_avg = models.FloatField(default=0, verbose_name=_("Tempo Total Médio"))
+    total_time_p95 = models.FloatField(default=0, verbose_name=_("Tempo Total p95"))
+    total_time_max = models.FloatField(default=0, verbose_name=_("Tempo Total Máximo"))
+    db_time_avg = models.FloatField(default=0, verbose_name=_("Tempo DB Médio"))
+    db_time_p95 = models.FloatField(default=0, verbose_name=_("Tempo DB p95"))
+    lineage_time_avg = models.FloatField(default=0, verbose_name=_("Tempo DB Lineage Médio"))
+    queries_avg = models.FloatField(default=0, verbose_name=_("Consultas Médias"))
+
+    status_2xx = models.IntegerField(default=0, verbose_name=_("Status 2xx"))
+    status_3xx = models.IntegerField(default=0, verbose_name=_("Status 3xx"))
+    status_4xx = models.IntegerField(default=0, verbose_name=_("Status 4xx"))
+    status_5xx = models.IntegerField(default=0, verbose_name=_("Status 5xx"))
+
+    # Contagens por bucket de rollups.TIME_BUCKETS_MS: permitem somar horas em dias sem reler o Auditor
+    total_time_histogram = models.JSONField(default=list, verbose_name=_("Histograma do Tempo Total"))
+    db_time_histogram = models.JSONField(default=list, verbose_name=_("Histograma do Tempo DB"))
+
+    def __str__(self):
+        return f'{self.path}: {self.period_start}'
+
+    class Meta:
+        abstract = True
+        ordering = ['-period_start', '-requests']
+
+
+class AuditorHourlyRollup(AuditorRollupBase):
+    class Meta(AuditorRollupBase.Meta):
+        verbose_name = _('Resumo por Hora')
+        verbose_name_plural = _('Resumos por Hora')
+
+
+class AuditorDailyRollup(AuditorRollupBase):
+    class Meta(AuditorRollupBase.Meta):
+        verbose_name = _('Resumo por Dia')
+        verbose_name_plural = _('Resumos por Dia')
@@ -0,0 +1,263 @@
+"""
+Resumos (rollups) e retenção dos registros de auditoria
+
+O Auditor recebe uma linha por requisição; as telas leem os resumos por caminho de cada hora e
+de cada dia. A hora é calculada a partir do Auditor e o dia a partir das horas (somando os
+histogramas), de modo que os registros brutos podem ser apagados depois de AUDITOR_RETENTION_DAYS.
+"""
+
+import logging
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Auditor, AuditorDailyRollup, AuditorHourlyRollup
+
+logger = logging.getLogger(__name__)
+
+# Limites superiores (ms) dos buckets dos histogramas gravados nos resumos; o último bucket é o "acima de".
+# Alterar os valores invalida os histogramas já gravados.
+TIME_BUCKETS_MS = (5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000, 30000)
+READ_CHUNK_SIZE = 2000
+WRITE_BATCH_SIZE = 500
+
+PERIODS = {
+    'hour': (AuditorHourlyRollup, timedelta(hours=1)),
+    'day': (AuditorDailyRollup, timedelta(days=1)),
+}
+
+
+def _bucket(seconds: float) -> int:
+    return bisect_left(TIME_BUCKETS_MS, (seconds or 0) * 1000)
+
+
+def _percentile(histogram, quantile: float) -> float:
+    """Percentil em segundos estimado pelo histograma (interpolação linear dentro do bucket)"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target = quantile * total
+    cumulative = 0
+    for bucket, count in enumerate(histogram):
+        if count and cumulative + count >= target:
+            lower = TIME_BUCKETS_MS[bucket - 1] if bucket else 0
+            if bucket >= len(TIME_BUCKETS_MS):
+                return lower / 1000
+            upper = TIME_BUCKETS_MS[bucket]
+            return round((lower + (upper - lower) * (target - cumulative) / count) / 1000, 4)
+        cumulative += count
+    return TIME_BUCKETS_MS[-1] / 1000
+
+
+class PathStats:
+    """Acumulador de um caminho: somas, status por classe e histogramas"""
+
+    __slots__ = ('requests', 'total_time', 'total_time_max', 'db_time', 'lineage_time', 'queries',
+                 'status', 'total_histogram', 'db_histogram')
+
+    def __init__(self):
+        self.requests = 0
+        self.total_time = 0.0
+        self.total_time_max = 0.0
+        self.db_time = 0.0
+        self.lineage_time = 0.0
+        self.queries = 0.0
+        self.status = {'2xx': 0, '3xx': 0, '4xx': 0, '5xx': 0}
+        self.total_histogram = [0] * (len(TIME_BUCKETS_MS) + 1)
+        self.db_histogram = [0] * (len(TIME_BUCKETS_MS) + 1)
+
+    def add(self, total_time, db_time, lineage_time, queries, status_code):
+        """Um registro do Auditor"""
+        total_time = total_time or 0.0
+        db_time = db_time or 0.0
+        self.requests += 1
+        self.total_time += total_time
+        self.total_time_max = max(self.total_time_max, total_time)
+        self.db_time += db_time
+        self.lineage_time += lineage_time or 0.0
+        self.queries += queries or 0
+        status_class = f"{(status_code or 0) // 100}xx"
+        if status_class in self.status:
+            self.status[status_class] += 1
+        self.total_histogram[_bucket(total_time)] += 1
+        self.db_histogram[_bucket(db_time)] += 1
+
+    def merge(self, rollup):
+        """Um resumo já gravado (hora -> dia, ou períodos -> tela)"""
+        requests = rollup.requests
+        self.requests += requests
+        self.total_time += rollup.total_time_avg * requests
+        self.total_time_max = max(self.total_time_max, rollup.total_time_max)
+        self.db_time += rollup.db_time_avg * requests
+        self.lineage_time += rollup.lineage_time_avg * requests
+        self.queries += rollup.queries_avg * requests
+        for status_class in self.status:
+            self.status[status_class] += getattr(rollup, f"status_{status_class}")
+        for histogram, counts in ((self.total_histogram, rollup.total_time_histogram),
+                                  (self.db_histogram, rollup.db_time_histogram)):
+            for bucket, count in enumerate(counts or ()):
+                if bucket < len(histogram):
+                    histogram[bucket] += count
+
+    def as_fields(self) -> Dict:
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'total_time_avg': round(self.total_time / requests, 4),
+            'total_time_p95': _percentile(self.total_histogram, 0.95),
+            'total_time_max': round(self.total_time_max, 4),
+            'db_time_avg': round(self.db_time / requests, 4),
+            'db_time_p95': _percentile(self.db_histogram, 0.95),
+            'lineage_time_avg': round(self.lineage_time / requests, 4),
+            'queries_avg': round(self.queries / requests, 2),
+            'status_2xx': self.status['2xx'],
+            'status_3xx': self.status['3xx'],
+            'status_4xx': self.status['4xx'],
+            'status_5xx': self.status['5xx'],
+            'total_time_histogram': self.total_histogram,
+            'db_time_histogram': self.db_histogram,
+        }
+
+
+def hour_start(moment=None):
+    return timezone.localtime(moment or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment=None):
+    return timezone.localtime(moment or timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _save(granularity: str, start, stats: Dict[str, PathStats]) -> int:
+    # Idempotente: refazer um período substitui o resumo anterior
+    model, _ = PERIODS[granularity]
+    with transaction.atomic():
+        model.objects.filter(period_start=start).delete()
+        model.objects.bulk_create(
+            [model(period_start=start, path=path, **path_stats.as_fields()) for path, path_stats in stats.items()],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+    return len(stats)
+
+
+def rollup_hour(start) -> int:
+    """Resume a hora iniciada em `start` lendo o Auditor em blocos; retorna o número de caminhos"""
+    stats: Dict[str, PathStats] = defaultdict(PathStats)
+    rows = Auditor.objects.filter(date__gte=start, date__lt=start + timedelta(hours=1)).values_list(
+        'path', 'total_time', 'db_time', 'lineage_time', 'total_queries', 'response_status_code',
+    ).iterator(chunk_size=READ_CHUNK_SIZE)
+    for path, *values in rows:
+        stats[path].add(*values)
+    return _save('hour', start, stats)
+
+
+def rollup_day(start) -> int:
+    """Resume o dia iniciado em `start` somando os resumos das horas"""
+    stats: Dict[str, PathStats] = defaultdict(PathStats)
+    hours = AuditorHourlyRollup.objects.filter(period_start__gte=start, period_start__lt=start + timedelta(days=1))
+    for rollup in hours.iterator(chunk_size=READ_CHUNK_SIZE):
+        stats[rollup.path].merge(rollup)
+    return _save('day', start, stats)
+
+
+def missing_periods(granularity: str, start, end) -> Iterable:
+    """Períodos entre start e end sem resumo (períodos sem tráfego também aparecem, e custam uma consulta vazia)"""
+    model, length = PERIODS[granularity]
+    existing = set(
+        model.objects.filter(period_start__gte=start, period_start__lt=end)
+        .values_list('period_start', flat=True).distinct()
+    )
+    period = start
+    while period < end:
+        if period not in existing:
+            yield period
+        period += length
+
+
+def missing_hours(start, end) -> Iterable:
+    return missing_periods('hour', start, end)
+
+
+def rollup_before_purge(queryset, field: str, cutoff) -> int:
+    """
+    Gera os resumos que faltam antes de apagar: horas (a partir do Auditor) e dias (a partir das
+    horas) desde o registro mais antigo de `queryset` até `cutoff`. Retorna os períodos gerados.
+    """
+    oldest = queryset.filter(**{f"{field}__lt": cutoff}).order_by(field).values_list(field, flat=True).first()
+    if oldest is None:
+        return 0
+    generated = 0
+    if queryset.model is Auditor:
+        for hour in missing_hours(hour_start(oldest), cutoff):
+            rollup_hour(hour)
+            generated += 1
+    for day in missing_periods('day', day_start(oldest), day_start(cutoff)):
+        rollup_day(day)
+        generated += 1
+    return generated
+
+
+def delete_in_chunks(queryset, chunk_size: Optional[int] = None) -> int:
+    """Apaga em blocos de chunk_size (transações curtas, sem travar a tabela inteira)"""
+    chunk_size = chunk_size or getattr(settings, 'AUDITOR_DELETE_CHUNK_SIZE', 5000)
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        model.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+
+def purge_expired(now=None) -> Dict[str, int]:
+    """Retenção: registros brutos e resumos por hora mais antigos que o configurado (0 = manter)"""
+    now = now or timezone.now()
+    deleted = {}
+    retention_days = getattr(settings, 'AUDITOR_RETENTION_DAYS', 30)
+    if retention_days:
+        # Só dias completos e nunca as horas que a task ainda pode refazer; o que for apagado é
+        # resumido antes (ex.: histórico anterior ao deploy dos resumos, sem o backfill)
+        cutoff = day_start(min(now - timedelta(days=retention_days), hour_start(now) - timedelta(hours=2)))
+        rollup_before_purge(Auditor.objects.all(), 'date', cutoff)
+        deleted['auditor'] = delete_in_chunks(Auditor.objects.filter(date__lt=cutoff))
+    rollup_retention_days = getattr(settings, 'AUDITOR_ROLLUP_RETENTION_DAYS', 180)
+    if rollup_retention_days:
+        cutoff = day_start(now - timedelta(days=rollup_retention_days))
+        rollup_before_purge(AuditorHourlyRollup.objects.all(), 'period_start', cutoff)
+        deleted['hourly'] = delete_in_chunks(AuditorHourlyRollup.objects.filter(period_start__lt=cutoff))
+    if any(deleted.values()):
+        logger.info(f"Auditor retention: {deleted}")
+    return deleted
+
+
+def summarize(granularity: str = 'hour', count: int = 24, limit: int = 50) -> Dict:
+    """Caminhos mais acessados e série de requisições/erros dos últimos `count` períodos completos"""
+    model, length = PERIODS[granularity]
+    current = hour_start() if granularity == 'hour' else day_start()
+    since = current - length * count
+
+    paths: Dict[str, PathStats] = defaultdict(PathStats)
+    series = defaultdict(lambda: {'requests': 0, 'errors': 0})
+    for rollup in model.objects.filter(period_start__gte=since).iterator(chunk_size=READ_CHUNK_SIZE):
+        paths[rollup.path].merge(rollup)
+        point = series[rollup.period_start]
+        point['requests'] += rollup.requests
+        point['errors'] += rollup.status_4xx + rollup.status_5xx
+
+    top = sorted(paths.items(), key=lambda item: item[1].requests, reverse=True)[:limit]
+    result_paths = []
+    for path, path_stats in top:
+        fields = path_stats.as_fields()
+        del fields['total_time_histogram'], fields['db_time_histogram']
+        result_paths.append({'path': path, **fields})
+    return {
+        'granularity': granularity,
+        'since': since,
+        'paths': result_paths,
+        'series': [{'period_start': period, **point} for period, point in sorted(series.items())],
+    }
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from celery import shared_task
+
+from .rollups import day_start, hour_start, missing_hours, purge_expired, rollup_day, rollup_hour
+
+
+@shared_task(ignore_result=True)
+def rollup_auditor_hourly():
+    """
+    Resume a última hora completa e refaz a anterior (inclui registros que ainda estavam
+    na fila do AuditWriter na primeira passada).
+    """
+    current = hour_start()
+    for hours in (2, 1):
+        rollup_hour(current - timedelta(hours=hours))
+
+
+@shared_task(ignore_result=True)
+def rollup_auditor_daily():
+    """Resume o dia anterior (completando as horas que faltarem) e aplica a retenção"""
+    today = day_start()
+    yesterday = today - timedelta(days=1)
+    for hour in missing_hours(yesterday, today):
+        rollup_hour(hour)
+    rollup_day(yesterday)
+    purge_expired()
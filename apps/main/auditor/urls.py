@@ -8,4 +8,5 @@ app_name = 'auditor'
 urlpatterns = [
     path('', AuditorPageView.as_view(), name='auditor'),
     path('data/', auditor_data_view, name='auditor-data'),
+    path('summary/', auditor_summary_view, name='auditor-summary'),
 ]
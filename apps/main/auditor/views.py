@@ -2,23 +2,43 @@ from django.shortcuts import render
 from django.http import JsonResponse
 from django.views import View
 from .models import Auditor
+from .rollups import summarize
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.contrib.admin.views.decorators import staff_member_required
 
 
+# Registros brutos só para a lista em tempo real; os totais vêm dos resumos (ver rollups.py)
+MAX_LIVE_LIMIT = 100
+SUMMARY_MAX_COUNT = {'hour': 24 * 7, 'day': 365}
+
+
 @staff_member_required
 def auditor_data_view(request):
     try:
         limit = int(request.GET.get('limit', 10))  # Pega o limite da query string, ou usa 10 como padrão
+        limit = min(max(limit, 1), MAX_LIVE_LIMIT)
         data = Auditor.objects.all().order_by('-date')[:limit].values(
             'date', 'path', 'total_time', 'python_time', 'db_time',
-            'total_queries', 'method', 'user_agent', 'response_status_code'
+            'total_queries', 'lineage_time', 'lineage_queries', 'method', 'user_agent', 'response_status_code'
         )
         return JsonResponse(list(data), safe=False)
     except Exception as e:
         return JsonResponse({'error': 'Erro ao buscar dados de auditoria'}, status=500)
 
 
+@staff_member_required
+def auditor_summary_view(request):
+    try:
+        granularity = request.GET.get('period', 'hour')
+        if granularity not in SUMMARY_MAX_COUNT:
+            return JsonResponse({'error': 'Período inválido (use hour ou day)'}, status=400)
+        count = int(request.GET.get('count', 24 if granularity == 'hour' else 30))
+        count = min(max(count, 1), SUMMARY_MAX_COUNT[granularity])
+        return JsonResponse(summarize(granularity, count))
+    except Exception as e:
+        return JsonResponse({'error': 'Erro ao buscar o resumo de auditoria'}, status=500)
+
+
 class AuditorPageView(UserPassesTestMixin, View):
     def test_func(self):
         return self.request.user.is_staff
@@ -27,6 +47,7 @@ class AuditorPageView(UserPassesTestMixin, View):
         context = {
             'segment': 'middleware',
             'parent': 'logging',
+            'summary': summarize('hour', 24, limit=20),
         }
         return render(request, 'pages/auditor.html', context)
     
\ No newline at end of file
@@ -0,0 +1,175 @@
+import os
+import queue
+import atexit
+import logging
+import threading
+from time import monotonic
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from utils.metrics import AUDITOR_EVENTS
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = (
+    'date', 'path', 'total_time', 'total_queries', 'db_time', 'python_time', 'ip', 'method',
+    'user_agent', 'host', 'port', 'content_type', 'response_content', 'response_status_code',
+)
+
+
+def _database_available() -> bool:
+    try:
+        return connection.connection is not None and connection.is_usable()
+    except Exception:
+        return False
+
+
+class AuditWriter:
+    """
+    Gravação dos registros de auditoria fora da requisição.
+
+    O middleware só coloca o dict em uma fila limitada (por processo); uma thread em background
+    grava em lote com bulk_create a cada `batch_size` registros ou `flush_interval` segundos.
+    Com a fila cheia o registro é descartado e contado (backpressure sem bloquear a requisição).
+    """
+
+    def __init__(self, max_size: int = 10000, batch_size: int = 500, flush_interval: float = 1.0):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @classmethod
+    def from_settings(cls) -> "AuditWriter":
+        return cls(
+            max_size=getattr(settings, 'AUDITOR_QUEUE_SIZE', 10000),
+            batch_size=getattr(settings, 'AUDITOR_BATCH_SIZE', 500),
+            flush_interval=getattr(settings, 'AUDITOR_FLUSH_INTERVAL_MS', 1000) / 1000,
+        )
+
+    def _ensure_started(self):
+        # Fila e thread por processo (recriadas após fork dos workers)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_size)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='auditor-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, audit_data: dict) -> bool:
+        """Enfileira um registro; retorna False se ele foi descartado"""
+        missing_fields = [field for field in REQUIRED_FIELDS if audit_data.get(field) is None]
+        if missing_fields:
+            logger.error(f"Missing required fields: {missing_fields}. Unable to save event data: {audit_data}")
+            return False
+
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(audit_data)
+        except queue.Full:
+            self.dropped += 1
+            AUDITOR_EVENTS.labels('dropped').inc()
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Auditor queue full ({self.max_size}), {self.dropped} event(s) dropped so far")
+            return False
+        self.queued += 1
+        AUDITOR_EVENTS.labels('queued').inc()
+        return True
+
+    def _run(self):
+        batch = []
+        deadline = monotonic() + self.flush_interval
+        while not self._stop.is_set():
+            try:
+                batch.append(self._queue.get(timeout=max(deadline - monotonic(), 0.01)))
+            except queue.Empty:
+                pass
+            if len(batch) >= self.batch_size or (batch and monotonic() >= deadline):
+                self._write(batch)
+                batch = []
+            if monotonic() >= deadline:
+                deadline = monotonic() + self.flush_interval
+
+        # Encerramento: grava o lote atual e o que restou na fila
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            close_old_connections()
+            written, failed = self._insert(batch)
+        except Exception as e:
+            written, failed = 0, len(batch)
+            logger.error(f"Error saving {len(batch)} audit event(s) to the database. Error: {e}")
+        if written:
+            self.written += written
+            AUDITOR_EVENTS.labels('written').inc(written)
+        if failed:
+            self.failed += failed
+            AUDITOR_EVENTS.labels('failed').inc(failed)
+
+    def _insert(self, batch):
+        """
+        Grava o lote; se um registro inválido derruba o INSERT, divide o lote ao meio e tenta de novo,
+        de modo que só os registros problemáticos contam como falha. Retorna (gravados, falhas).
+        Com o banco fora do ar não divide (seriam len(batch) tentativas): o lote inteiro conta como falha.
+        """
+        from .models import Auditor
+
+        try:
+            # bulk_create é atômico: um lote que falha não grava nada, então repetir as metades não duplica
+            Auditor.objects.bulk_create([Auditor(**data) for data in batch], batch_size=self.batch_size)
+            return len(batch), 0
+        except Exception as e:
+            if len(batch) == 1:
+                logger.error(f"Error saving audit event to the database. Error: {e}. Event data: {batch[0]}")
+                return 0, 1
+            if not _database_available():
+                logger.error(f"Error saving {len(batch)} audit event(s) to the database. Error: {e}")
+                return 0, len(batch)
+        middle = len(batch) // 2
+        first_written, first_failed = self._insert(batch[:middle])
+        second_written, second_failed = self._insert(batch[middle:])
+        return first_written + second_written, first_failed + second_failed
+
+    def flush(self, timeout: float = 5.0):
+        """Para a thread deste processo depois de gravar o que estiver na fila (encerramento do worker)"""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            'queued': self.queued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'pending': self._queue.qsize() if self._queue is not None else 0,
+            'max_size': self.max_size,
+        }
+
+
+audit_writer = AuditWriter.from_settings()
+atexit.register(audit_writer.flush)
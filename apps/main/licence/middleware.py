@@ -26,6 +26,7 @@ class LicenseMiddleware:
             '/license/',
             '/activate/',
             '/health/',
+            '/metrics',
         ]
         
         # Verifica se a URL atual está na lista de exceções
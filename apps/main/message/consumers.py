@@ -4,6 +4,7 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from channels.exceptions import DenyConnection
 from django.utils import timezone
+from utils.metrics import WEBSOCKET_CONNECTIONS
 
 logger = logging.getLogger(__name__)
 
@@ -23,11 +24,15 @@ class MessageConsumer(AsyncWebsocketConsumer):
         )
         
         await self.accept()
+        WEBSOCKET_CONNECTIONS.labels("message").inc()
         
         # Marcar usuário como ativo
         await self.set_user_active()
 
     async def disconnect(self, close_code):
+        if not hasattr(self, "user_group_name"):
+            return
+        WEBSOCKET_CONNECTIONS.labels("message").dec()
         await self.channel_layer.group_discard(
             self.user_group_name,
             self.channel_name
@@ -1,5 +1,6 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from utils.metrics import WEBSOCKET_CONNECTIONS
 
 class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -10,8 +11,12 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.group_name = f"user_{self.user.id}"
             await self.channel_layer.group_add(self.group_name, self.channel_name)
             await self.accept()
+            WEBSOCKET_CONNECTIONS.labels("notification").inc()
 
     async def disconnect(self, close_code):
+        if not hasattr(self, "group_name"):
+            return
+        WEBSOCKET_CONNECTIONS.labels("notification").dec()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     async def receive(self, text_data):
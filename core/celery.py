@@ -30,3 +30,7 @@ else:
     app.config_from_object("django.conf:settings", namespace="CELERY")
 
 app.autodiscover_tasks()
+
+# Duração das tarefas e exposição das métricas do worker (Prometheus)
+from utils.metrics import connect_celery_signals  # noqa: E402
+connect_celery_signals()
@@ -61,7 +61,13 @@ LOGGING['loggers'].update({
         'handlers': ['console'],
         'level': 'DEBUG',
         'propagate': False,
-    }
+    },
+    # Consultas lentas do banco do Lineage (SQL normalizado, formato dos parâmetros e EXPLAIN)
+    'lineage.slow_query': {
+        'handlers': ['console'],
+        'level': 'WARNING',
+        'propagate': False,
+    },
 })
 
 # =========================== CORS CONFIGS ===========================
@@ -182,6 +188,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "middlewares.metrics.PrometheusMetricsMiddleware",
     "apps.main.auditor.middleware.AuditorMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -491,7 +498,8 @@ else:
 
 CACHES = {
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache' if not DEBUG else 'django.core.cache.backends.locmem.LocMemCache',
+        # Mesmos backends (django-redis / locmem) com contagem de hits/misses para o /metrics
+        'BACKEND': 'utils.cache_backends.InstrumentedRedisCache' if not DEBUG else 'utils.cache_backends.InstrumentedLocMemCache',
         'LOCATION': os.getenv('DJANGO_CACHE_REDIS_URI') if not DEBUG else 'unique-snowflake',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -524,6 +532,34 @@ else:
             'task': 'apps.lineage.server.tasks.verificar_cupons_expirados',
             'schedule': crontab(minute='*/1'),
         },
+        'atualizar-consultas-quentes-lineage': {
+            'task': 'apps.lineage.server.tasks.refresh_hot_lineage_queries',
+            'schedule': int(os.getenv('LINEAGE_CACHE_HOT_REFRESH_INTERVAL', '60')),
+        },
+        'snapshot-rankings-lineage': {
+            'task': 'apps.lineage.server.tasks.build_ranking_snapshot',
+            'schedule': int(os.getenv('LINEAGE_RANKING_SNAPSHOT_INTERVAL', '300')),
+        },
+        'indice-riqueza-lineage': {
+            'task': 'apps.lineage.server.tasks.update_adena_wealth_index',
+            'schedule': int(os.getenv('LINEAGE_WEALTH_INDEX_INTERVAL', '120')),
+        },
+        'indice-personagens-lineage': {
+            'task': 'apps.lineage.server.tasks.sync_lineage_character_index',
+            'schedule': int(os.getenv('LINEAGE_CHAR_INDEX_INTERVAL', '60')),
+        },
+        'verificar-status-servidor': {
+            'task': 'apps.lineage.server.tasks.probe_game_server_status',
+            'schedule': int(os.getenv('SERVER_STATUS_PROBE_INTERVAL', '30')),
+        },
+        'resumo-auditoria-hora': {
+            'task': 'apps.main.auditor.tasks.rollup_auditor_hourly',
+            'schedule': crontab(minute=5),
+        },
+        'resumo-auditoria-dia': {
+            'task': 'apps.main.auditor.tasks.rollup_auditor_daily',
+            'schedule': crontab(hour=0, minute=30),
+        },
     }
 
 CELERY_ACCEPT_CONTENT = ['application/json']
@@ -597,6 +633,18 @@ AUDITOR_MIDDLEWARE_RESTRICT_PATHS = [
 AUDITOR_MIDDLEWARE_MAX_RETRIES = 3
 AUDITOR_MIDDLEWARE_RETRY_DELAY = 0.1
 
+# Gravação em lote em background: fila limitada por processo (cheia = descarta e conta),
+# bulk_create a cada AUDITOR_BATCH_SIZE registros ou AUDITOR_FLUSH_INTERVAL_MS
+AUDITOR_QUEUE_SIZE = int(os.getenv('CONFIG_AUDITOR_QUEUE_SIZE', 10000))
+AUDITOR_BATCH_SIZE = int(os.getenv('CONFIG_AUDITOR_BATCH_SIZE', 500))
+AUDITOR_FLUSH_INTERVAL_MS = int(os.getenv('CONFIG_AUDITOR_FLUSH_INTERVAL_MS', 1000))
+
+# Retenção (dias, 0 = manter tudo): os registros brutos e os resumos por hora são apagados em blocos
+# de AUDITOR_DELETE_CHUNK_SIZE; os resumos por dia são mantidos
+AUDITOR_RETENTION_DAYS = int(os.getenv('CONFIG_AUDITOR_RETENTION_DAYS', 30))
+AUDITOR_ROLLUP_RETENTION_DAYS = int(os.getenv('CONFIG_AUDITOR_ROLLUP_RETENTION_DAYS', 180))
+AUDITOR_DELETE_CHUNK_SIZE = int(os.getenv('CONFIG_AUDITOR_DELETE_CHUNK_SIZE', 5000))
+
 # =========================== EXTRA CONFIGS ===========================
 
 customColorPalette = [
@@ -855,7 +903,12 @@ DYNAMIC_DATATB = {
 GAME_SERVER_IP = os.getenv('GAME_SERVER_IP', '127.0.0.1')
 GAME_SERVER_PORT = int(os.getenv('GAME_SERVER_PORT', 7777))
 LOGIN_SERVER_PORT = int(os.getenv('LOGIN_SERVER_PORT', 2106))
+# Vários game servers atrás do mesmo login: 'Nome=host:porta[:timeout],Nome2=host:porta'
+SERVER_STATUS_REALMS = env_to_list(os.getenv('SERVER_STATUS_REALMS', ''))
 SERVER_STATUS_TIMEOUT = int(os.getenv('SERVER_STATUS_TIMEOUT', 1))
+# Intervalo do prober em background (celery-beat) e dias de histórico para o cálculo de uptime
+SERVER_STATUS_PROBE_INTERVAL = int(os.getenv('SERVER_STATUS_PROBE_INTERVAL', 30))
+SERVER_STATUS_HISTORY_DAYS = int(os.getenv('SERVER_STATUS_HISTORY_DAYS', 7))
 
 # Forçar status do servidor (auto = verificação automática, on = sempre online, off = sempre offline)
 FORCE_GAME_SERVER_STATUS = os.getenv('FORCE_GAME_SERVER_STATUS', 'auto')
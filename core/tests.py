@@ -0,0 +1,30 @@
+import ipaddress
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from utils import metrics
+
+
+class MetricsClientIpTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_usa_x_real_ip_quando_presente(self):
+        request = self.factory.get('/metrics', REMOTE_ADDR='172.18.0.5', HTTP_X_REAL_IP='203.0.113.7')
+        self.assertEqual(metrics._client_ip(request), ipaddress.ip_address('203.0.113.7'))
+
+    def test_sem_header_usa_remote_addr(self):
+        request = self.factory.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(metrics._client_ip(request), ipaddress.ip_address('127.0.0.1'))
+
+    def test_remote_addr_invalido(self):
+        request = self.factory.get('/metrics', REMOTE_ADDR='unix:/run/gunicorn.sock')
+        self.assertIsNone(metrics._client_ip(request))
+
+    def test_ip_permitido_sem_header(self):
+        request = self.factory.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        with mock.patch.object(metrics, 'METRICS_ALLOWED_IPS', ['127.0.0.1/32']):
+            self.assertTrue(metrics._ip_allowed(request))
+        with mock.patch.object(metrics, 'METRICS_ALLOWED_IPS', ['10.0.0.0/8']):
+            self.assertFalse(metrics._ip_allowed(request))
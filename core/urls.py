@@ -8,6 +8,7 @@ from django.shortcuts import redirect
 from django.http import FileResponse, Http404
 from django.views.decorators.cache import cache_control
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from utils.metrics import metrics_view
 import os
 
 def admin_login_redirect(request):
@@ -31,6 +32,9 @@ def favicon_view(request):
 urlpatterns = [
     # Favicon
     path('favicon.ico', favicon_view, name='favicon'),
+
+    # Métricas do Prometheus
+    path('metrics', metrics_view, name='prometheus_metrics'),
     
     # main app start
     path('', include('apps.main.home.urls')),
@@ -32,3 +32,8 @@ timeout = 30
 # Max requests a worker will process before restarting (helps manage memory leaks)
 max_requests = 1000
 max_requests_jitter = 50
+
+# Prometheus em modo multiprocess (PROMETHEUS_MULTIPROC_DIR): descarta os gauges de workers encerrados
+def child_exit(server, worker):
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
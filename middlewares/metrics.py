@@ -0,0 +1,34 @@
+import time
+
+from utils.metrics import HTTP_REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_DB_QUERIES
+from utils.request_timing import track_request
+
+
+class PrometheusMetricsMiddleware:
+    """
+    Registra a latência de cada requisição no histograma do Prometheus, rotulada pela URL
+    nomeada (view_name) em vez do path, para não criar uma série por ID na URL.
+    Também registra o tempo e a quantidade de consultas de cada banco (Django e Lineage).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_request() as timing:
+            before = timing.snapshot()
+            start = time.perf_counter()
+            response = self.get_response(request)
+            duration = time.perf_counter() - start
+            queries, db_time, lineage_queries, lineage_time = (
+                after - previous for after, previous in zip(timing.snapshot(), before)
+            )
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route or 'unnamed') if match is not None else 'unresolved'
+        HTTP_REQUEST_DURATION.labels(view, request.method, f"{response.status_code // 100}xx").observe(duration)
+        REQUEST_DB_DURATION.labels(view, 'default').observe(db_time)
+        REQUEST_DB_QUERIES.labels(view, 'default').observe(queries)
+        REQUEST_DB_DURATION.labels(view, 'lineage').observe(lineage_time)
+        REQUEST_DB_QUERIES.labels(view, 'lineage').observe(lineage_queries)
+        return response
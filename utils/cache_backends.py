@@ -0,0 +1,43 @@
+"""
+Backends de cache do Django com contagem de hits/misses para o /metrics (ver utils/metrics.py)
+"""
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from utils.metrics import CACHE_REQUESTS
+
+_MISSING = object()
+_HIT = CACHE_REQUESTS.labels("hit")
+_MISS = CACHE_REQUESTS.labels("miss")
+
+
+class CacheMetricsMixin:
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version=version, **kwargs)
+        if value is _MISSING:
+            _MISS.inc()
+            return default
+        _HIT.inc()
+        return value
+
+    def get_many(self, keys, version=None, **kwargs):
+        keys = list(keys)
+        values = super().get_many(keys, version=version, **kwargs)
+        if values:
+            _HIT.inc(len(values))
+        if len(keys) > len(values):
+            _MISS.inc(len(keys) - len(values))
+        return values
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+try:
+    from django_redis.cache import RedisCache
+
+    class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+        pass
+except ImportError:
+    pass
@@ -0,0 +1,304 @@
+"""
+Métricas no formato do Prometheus (endpoint /metrics)
+
+Com vários workers (gunicorn/daphne/celery prefork) defina PROMETHEUS_MULTIPROC_DIR: cada processo
+grava as suas métricas em arquivos mmap nesse diretório e o /metrics soma todos na hora da coleta,
+sem lock nem round-trip entre processos por requisição. Sem o prometheus_client instalado as
+métricas viram no-op.
+"""
+
+import os
+import hmac
+import time
+import logging
+import ipaddress
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+if MULTIPROC_DIR:
+    # Precisa existir antes da criação das métricas (o prometheus_client lê a variável no import)
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    )
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# IPs ou redes (CIDR) liberadas sem token; vazio = apenas token ou staff
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+CELERY_METRICS_PORT = int(os.getenv("CELERY_METRICS_PORT", "0"))
+CELERY_METRICS_QUEUES = [q.strip() for q in os.getenv("CELERY_METRICS_QUEUES", "celery").split(",") if q.strip()]
+# Mensagens lidas de cada fila para contar as tarefas pendentes por nome
+QUEUE_SAMPLE_SIZE = 1000
+
+# Buckets em segundos (requisições web e tarefas)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900)
+# Consultas por requisição
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class _NoopMetric:
+    """Substituto das métricas quando o prometheus_client não está instalado"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, *args, **kwargs):
+        pass
+
+    def dec(self, *args, **kwargs):
+        pass
+
+    def set(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+
+if PROMETHEUS_AVAILABLE and METRICS_ENABLED:
+    HTTP_REQUEST_DURATION = Histogram(
+        "django_http_request_duration_seconds", "Latência das requisições por URL nomeada",
+        ["view", "method", "status"], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_DB_DURATION = Histogram(
+        "django_request_db_duration_seconds", "Tempo de banco por requisição (default = Django, lineage = banco do jogo)",
+        ["view", "database"], buckets=LATENCY_BUCKETS,
+    )
+    REQUEST_DB_QUERIES = Histogram(
+        "django_request_db_queries", "Consultas ao banco por requisição (default = Django, lineage = banco do jogo)",
+        ["view", "database"], buckets=QUERY_COUNT_BUCKETS,
+    )
+    LINEAGE_QUERY_DURATION = Histogram(
+        "lineage_db_query_duration_seconds", "Duração das consultas ao banco do Lineage por consulta nomeada",
+        ["query"], buckets=LATENCY_BUCKETS,
+    )
+    LINEAGE_QUERY_ERRORS = Counter(
+        "lineage_db_query_errors_total", "Erros nas consultas ao banco do Lineage", ["query"],
+    )
+    LINEAGE_POOL_SIZE = Gauge(
+        "lineage_db_pool_size", "Conexões configuradas no pool do banco do Lineage (soma dos processos)",
+        ["host"], multiprocess_mode="livesum",
+    )
+    LINEAGE_POOL_CHECKED_OUT = Gauge(
+        "lineage_db_pool_checked_out", "Conexões em uso no pool do banco do Lineage (soma dos processos)",
+        ["host"], multiprocess_mode="livesum",
+    )
+    CACHE_REQUESTS = Counter(
+        "django_cache_requests_total", "Leituras do cache do Django por resultado", ["result"],
+    )
+    CELERY_TASK_DURATION = Histogram(
+        "celery_task_duration_seconds", "Duração das tarefas do Celery", ["task", "state"], buckets=TASK_BUCKETS,
+    )
+    WEBSOCKET_CONNECTIONS = Gauge(
+        "websocket_connections", "Conexões websocket ativas por consumer", ["consumer"], multiprocess_mode="livesum",
+    )
+    AUDITOR_EVENTS = Counter(
+        "auditor_events_total", "Registros de auditoria por resultado (queued, written, dropped, failed)", ["result"],
+    )
+else:
+    HTTP_REQUEST_DURATION = REQUEST_DB_DURATION = REQUEST_DB_QUERIES = _NoopMetric()
+    LINEAGE_QUERY_DURATION = LINEAGE_QUERY_ERRORS = _NoopMetric()
+    LINEAGE_POOL_SIZE = LINEAGE_POOL_CHECKED_OUT = CACHE_REQUESTS = _NoopMetric()
+    CELERY_TASK_DURATION = WEBSOCKET_CONNECTIONS = AUDITOR_EVENTS = _NoopMetric()
+
+
+def observe_lineage_query(name: Optional[str], elapsed_ms: float):
+    LINEAGE_QUERY_DURATION.labels(name or "-").observe(elapsed_ms / 1000)
+
+
+def instrument_pool(engine, count_size: bool = True):
+    """
+    Conexões em uso do pool via eventos checkout/checkin (gauge somado entre os processos).
+    count_size=False para engines criados por event loop (o tamanho seria somado a cada loop).
+    """
+    if not (PROMETHEUS_AVAILABLE and METRICS_ENABLED):
+        return
+    from sqlalchemy import event
+
+    host = engine.url.host or "-"
+    pool = engine.pool
+    if count_size and hasattr(pool, "size"):
+        LINEAGE_POOL_SIZE.labels(host).inc(pool.size())
+    checked_out = LINEAGE_POOL_CHECKED_OUT.labels(host)
+    event.listen(engine, "checkout", lambda *args: checked_out.inc())
+    event.listen(engine, "checkin", lambda *args: checked_out.dec())
+
+
+class CeleryQueueCollector:
+    """
+    Tamanho das filas do Celery lido do broker (Redis) na hora da coleta, e as tarefas
+    pendentes por nome (encerrar_leiloes_expirados, ...) em uma amostra do início de cada fila.
+    """
+
+    def __init__(self):
+        self._client = None
+
+    def _redis(self):
+        if self._client is None:
+            from django.conf import settings
+
+            broker_url = getattr(settings, "CELERY_BROKER_URL", "")
+            if not broker_url.startswith(("redis://", "rediss://")):
+                return None
+            import redis
+            self._client = redis.Redis.from_url(broker_url, socket_timeout=2)
+        return self._client
+
+    def collect(self):
+        import json
+
+        length = GaugeMetricFamily("celery_queue_length", "Mensagens aguardando em cada fila do Celery", labels=["queue"])
+        pending = GaugeMetricFamily(
+            "celery_queue_pending_tasks", "Tarefas aguardando por nome (amostra do início da fila)", labels=["queue", "task"]
+        )
+        try:
+            client = self._redis()
+            if client is not None:
+                pipe = client.pipeline(transaction=False)
+                for queue in CELERY_METRICS_QUEUES:
+                    pipe.llen(queue)
+                    pipe.lrange(queue, 0, QUEUE_SAMPLE_SIZE - 1)
+                results = pipe.execute()
+                for index, queue in enumerate(CELERY_METRICS_QUEUES):
+                    length.add_metric([queue], results[index * 2])
+                    counts: Dict[str, int] = {}
+                    for message in results[index * 2 + 1]:
+                        try:
+                            task = json.loads(message).get("headers", {}).get("task") or "-"
+                        except (ValueError, AttributeError):
+                            task = "-"
+                        counts[task] = counts.get(task, 0) + 1
+                    for task, count in counts.items():
+                        pending.add_metric([queue, task], count)
+        except Exception as e:
+            logger.warning(f"Erro ao ler as filas do Celery para as métricas: {e}")
+        yield length
+        yield pending
+
+
+_queue_collector = None
+
+
+def get_registry():
+    """Registry para a exposição: soma dos arquivos dos processos (multiprocess) ou o registry padrão"""
+    global _queue_collector
+    if _queue_collector is None:
+        _queue_collector = CeleryQueueCollector()
+        if not MULTIPROC_DIR:
+            REGISTRY.register(_queue_collector)
+    if not MULTIPROC_DIR:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_queue_collector)
+    return registry
+
+
+def _client_ip(request):
+    """
+    IP real do cliente. Atrás do nginx o REMOTE_ADDR é sempre o do container (rede privada), por isso
+    usa o X-Real-IP, que o nginx sobrescreve com o endereço que ele recebeu (o X-Forwarded-For mais à
+    esquerda vem do cliente e pode ser forjado). Sem o header, usa o REMOTE_ADDR.
+    """
+    from python_ipware import IpWare
+
+    ip, _ = IpWare(precedence=("X_REAL_IP", "HTTP_X_REAL_IP")).get_client_ip(meta=request.META)
+    if ip is not None:
+        return ip
+    # O IpWare só olha os headers da precedência; sem eles (acesso direto ao container) usa o REMOTE_ADDR
+    try:
+        return ipaddress.ip_address(request.META.get("REMOTE_ADDR") or "")
+    except ValueError:
+        return None
+
+
+def _ip_allowed(request) -> bool:
+    if not METRICS_ALLOWED_IPS:
+        return False
+    ip = _client_ip(request)
+    if ip is None:
+        return False
+    for allowed in METRICS_ALLOWED_IPS:
+        try:
+            if ip in ipaddress.ip_network(allowed, strict=False):
+                return True
+        except ValueError:
+            logger.warning(f"METRICS_ALLOWED_IPS inválido: {allowed}")
+    return False
+
+
+def _allowed(request) -> bool:
+    # Nega por padrão: token válido ("Authorization: Bearer <token>"), staff ou IP em METRICS_ALLOWED_IPS
+    if METRICS_TOKEN and hmac.compare_digest(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {METRICS_TOKEN}"):
+        return True
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    return _ip_allowed(request)
+
+
+def metrics_view(request):
+    from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+    if not (PROMETHEUS_AVAILABLE and METRICS_ENABLED):
+        raise Http404("Métricas desativadas")
+    if not _allowed(request):
+        return HttpResponseForbidden("Acesso negado")
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+# =========================== CELERY ===========================
+
+_task_started: Dict[str, float] = {}
+
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or "-").observe(time.perf_counter() - started)
+
+
+def _worker_ready(**kwargs):
+    # Workers em outro container: servidor HTTP próprio para o Prometheus coletar
+    if CELERY_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(CELERY_METRICS_PORT, registry=get_registry())
+
+
+def _worker_process_shutdown(pid=None, **kwargs):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def connect_celery_signals():
+    """Duração das tarefas por nome/estado e exposição das métricas do worker"""
+    if not (PROMETHEUS_AVAILABLE and METRICS_ENABLED):
+        return
+    from celery import signals
+
+    signals.task_prerun.connect(_task_prerun, weak=False)
+    signals.task_postrun.connect(_task_postrun, weak=False)
+    signals.worker_ready.connect(_worker_ready, weak=False)
+    signals.worker_process_shutdown.connect(_worker_process_shutdown, weak=False)
+
+
+def mark_process_dead(pid: int):
+    """Usado pelo gunicorn (child_exit) para descartar os gauges de workers encerrados"""
+    if PROMETHEUS_AVAILABLE and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
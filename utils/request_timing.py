@@ -0,0 +1,72 @@
+"""
+Tempo de banco por requisição sem depender do DEBUG (connection.queries)
+
+O banco do Django é medido por um connection.execute_wrapper; o banco do Lineage pelos hooks do
+LineageQueryProfiler (ver apps/lineage/server/utils/profiler.py), que somam no objeto da
+requisição atual via contextvar (propagado também para o sync_to_async).
+"""
+
+import contextvars
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+from typing import Iterator, Optional
+
+from django.db import connections
+
+
+class RequestTiming:
+    """Contadores de consultas e tempo de banco (segundos) de uma requisição"""
+
+    __slots__ = ("queries", "db_time", "lineage_queries", "lineage_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.lineage_queries = 0
+        self.lineage_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Assinatura do connection.execute_wrapper
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+    def snapshot(self):
+        return self.queries, self.db_time, self.lineage_queries, self.lineage_time
+
+
+current_timing: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar(
+    "request_timing", default=None
+)
+
+
+@contextmanager
+def track_request() -> Iterator[RequestTiming]:
+    """
+    Mede as consultas feitas dentro do bloco. Reentrante: dentro de outro track_request
+    devolve o mesmo objeto (o chamador compara snapshot() antes/depois).
+    """
+    timing = current_timing.get()
+    if timing is not None:
+        yield timing
+        return
+
+    timing = RequestTiming()
+    token = current_timing.set(timing)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timing))
+            yield timing
+    finally:
+        current_timing.reset(token)
+
+
+def record_lineage_query(elapsed_ms: float):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.lineage_queries += 1
+        timing.lineage_time += elapsed_ms / 1000
@@ -5,12 +5,108 @@ Baseado no sistema do site PHP original
 
 import socket
 import os
-from typing import Dict, Optional, Tuple
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from django.conf import settings
+from django.core.cache import cache
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Último resultado do prober (celery-beat) e histórico usado no cálculo de uptime
+STATUS_KEY = "server_status:latest"
+HISTORY_KEY = "server_status:history"
+PROBE_LOCK_KEY = "server_status:probing"
+# Janelas de uptime expostas no resumo: rótulo -> segundos
+UPTIME_WINDOWS = (("1h", 3600), ("24h", 86400), ("7d", 7 * 86400))
+
+
+def _probe_interval() -> int:
+    return int(getattr(settings, 'SERVER_STATUS_PROBE_INTERVAL', 30))
+
+
+def _history_size() -> int:
+    days = int(getattr(settings, 'SERVER_STATUS_HISTORY_DAYS', 7))
+    return max(days * 86400 // max(_probe_interval(), 1), 1)
+
+
+def _redis():
+    # Histórico em lista no Redis quando o cache é o django-redis; sem ele (DEBUG/locmem) fica no cache do Django
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection("default")
+    except Exception:
+        return None
+
+
+class StatusEndpoint(NamedTuple):
+    """Porta verificada pelo prober: o login ou um reino (game server)"""
+    name: str
+    kind: str  # 'login' ou 'game'
+    host: str
+    port: int
+    timeout: float
+
+
+def parse_realms(entries: List[str], default_host: str, default_timeout: float) -> List[StatusEndpoint]:
+    """
+    Reinos do SERVER_STATUS_REALMS no formato 'Nome=host:porta[:timeout]'
+    (o host pode ser omitido: 'Nome=7778' usa o GAME_SERVER_IP)
+    """
+    realms = []
+    for entry in entries:
+        try:
+            name, address = (part.strip() for part in entry.split('=', 1))
+            parts = address.split(':')
+            if len(parts) == 1:
+                parts = [default_host] + parts
+            host, port = parts[0] or default_host, int(parts[1])
+            timeout = float(parts[2]) if len(parts) > 2 else default_timeout
+        except (ValueError, IndexError):
+            logger.warning(f"Reino inválido em SERVER_STATUS_REALMS: {entry!r}")
+            continue
+        realms.append(StatusEndpoint(name, 'game', host, port, timeout))
+    return realms
+
+
+async def _probe_endpoint(endpoint: StatusEndpoint) -> Dict[str, any]:
+    started = time.perf_counter()
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(endpoint.host, endpoint.port), timeout=endpoint.timeout
+        )
+    except asyncio.TimeoutError:
+        return {'online': False, 'latency_ms': None, 'error': 'timeout'}
+    except OSError as e:
+        return {'online': False, 'latency_ms': None, 'error': str(e)}
+
+    latency_ms = round((time.perf_counter() - started) * 1000, 2)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except Exception:
+        pass
+    return {'online': True, 'latency_ms': latency_ms, 'error': None}
+
+
+async def aprobe_endpoints(endpoints: List[StatusEndpoint]) -> List[Dict[str, any]]:
+    """Verifica todas as portas em paralelo: o tempo total é o do endpoint mais lento"""
+    return list(await asyncio.gather(*(_probe_endpoint(endpoint) for endpoint in endpoints)))
+
+
+def probe_endpoints(endpoints: List[StatusEndpoint]) -> List[Dict[str, any]]:
+    """Versão síncrona do aprobe_endpoints (dentro de um event loop roda em outra thread)"""
+    if not endpoints:
+        return []
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(aprobe_endpoints(endpoints))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, aprobe_endpoints(endpoints)).result()
+
 
 class ServerStatusChecker:
     """
@@ -24,6 +120,11 @@ class ServerStatusChecker:
         self.timeout = int(getattr(settings, 'SERVER_STATUS_TIMEOUT', 1))
         self.force_game_status = getattr(settings, 'FORCE_GAME_SERVER_STATUS', 'auto')
         self.force_login_status = getattr(settings, 'FORCE_LOGIN_SERVER_STATUS', 'auto')
+        self.login_endpoint = StatusEndpoint('Login', 'login', self.server_ip, self.login_port, self.timeout)
+        # Vários game servers atrás de um login; sem SERVER_STATUS_REALMS, o GAME_SERVER_IP/PORT
+        self.realms = parse_realms(getattr(settings, 'SERVER_STATUS_REALMS', []), self.server_ip, self.timeout) or [
+            StatusEndpoint('Game', 'game', self.server_ip, self.game_port, self.timeout)
+        ]
     
     def check_port_connection(self, host: str, port: int, timeout: int = None) -> bool:
         """
@@ -58,39 +159,12 @@ class ServerStatusChecker:
     
     def get_game_server_status(self) -> Dict[str, any]:
         """
-        Verifica o status do servidor de jogo
+        Verifica o status do servidor de jogo (o primeiro reino configurado)
         
         Returns:
             Dict com informações do status do servidor
         """
-        # Verifica se o status está sendo forçado
-        if self.force_game_status == 'on':
-            return {
-                'status': 'online',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.game_port,
-                'message': 'Status forçado como online'
-            }
-        elif self.force_game_status == 'off':
-            return {
-                'status': 'offline',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.game_port,
-                'message': 'Status forçado como offline'
-            }
-        
-        # Verificação automática
-        is_online = self.check_port_connection(self.server_ip, self.game_port)
-        
-        return {
-            'status': 'online' if is_online else 'offline',
-            'forced': False,
-            'ip': self.server_ip,
-            'port': self.game_port,
-            'message': f'Servidor de jogo está {"online" if is_online else "offline"}'
-        }
+        return self.check_endpoints([self.realms[0]])[0]
     
     def get_login_server_status(self) -> Dict[str, any]:
         """
@@ -99,57 +173,105 @@ class ServerStatusChecker:
         Returns:
             Dict com informações do status do servidor
         """
-        # Verifica se o status está sendo forçado
-        if self.force_login_status == 'on':
-            return {
-                'status': 'online',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.login_port,
-                'message': 'Status forçado como online'
-            }
-        elif self.force_login_status == 'off':
-            return {
-                'status': 'offline',
-                'forced': True,
-                'ip': self.server_ip,
-                'port': self.login_port,
-                'message': 'Status forçado como offline'
-            }
-        
-        # Verificação automática
-        is_online = self.check_port_connection(self.server_ip, self.login_port)
+        return self.check_endpoints([self.login_endpoint])[0]
+    
+    def check_endpoints(self, endpoints: List[StatusEndpoint]) -> List[Dict[str, any]]:
+        """
+        Verifica os endpoints em paralelo, respeitando o status forçado por tipo
         
-        return {
-            'status': 'online' if is_online else 'offline',
-            'forced': False,
-            'ip': self.server_ip,
-            'port': self.login_port,
-            'message': f'Servidor de login está {"online" if is_online else "offline"}'
+        Returns:
+            Lista de dicts de status, na mesma ordem dos endpoints
+        """
+        forced = {
+            'game': self.force_game_status if self.force_game_status in ('on', 'off') else None,
+            'login': self.force_login_status if self.force_login_status in ('on', 'off') else None,
         }
+        to_probe = [endpoint for endpoint in endpoints if not forced[endpoint.kind]]
+        results = dict(zip(to_probe, probe_endpoints(to_probe)))
+
+        statuses = []
+        for endpoint in endpoints:
+            status = {
+                'name': endpoint.name,
+                'ip': endpoint.host,
+                'port': endpoint.port,
+            }
+            if forced[endpoint.kind]:
+                is_online = forced[endpoint.kind] == 'on'
+                status.update({
+                    'status': 'online' if is_online else 'offline',
+                    'forced': True,
+                    'latency_ms': None,
+                    'message': f'Status forçado como {"online" if is_online else "offline"}',
+                })
+            else:
+                result = results[endpoint]
+                label = 'Servidor de login' if endpoint.kind == 'login' else (
+                    'Servidor de jogo' if len(self.realms) == 1 else f'Servidor de jogo {endpoint.name}'
+                )
+                status.update({
+                    'status': 'online' if result['online'] else 'offline',
+                    'forced': False,
+                    'latency_ms': result['latency_ms'],
+                    'message': f'{label} está {"online" if result["online"] else "offline"}',
+                })
+                if result['error']:
+                    status['error'] = result['error']
+            statuses.append(status)
+        return statuses
     
-    def get_server_status_summary(self) -> Dict[str, any]:
+    def get_server_status_summary(self, use_cache: bool = True) -> Dict[str, any]:
         """
         Retorna um resumo completo do status dos servidores
         
+        Por padrão lê o último resultado do prober em background; só verifica as portas
+        na hora quando ainda não há resultado no cache (ou com use_cache=False).
+        
         Returns:
             Dict com status de ambos os servidores
         """
-        game_status = self.get_game_server_status()
-        login_status = self.get_login_server_status()
+        if use_cache:
+            summary = get_cached_server_status()
+            if summary is not None:
+                return summary
+            # Sem resultado (beat parado, cache limpo...): apenas uma requisição verifica por vez
+            if not cache.add(PROBE_LOCK_KEY, 1, timeout=self.timeout * 2 + 1):
+                return self._unknown_summary()
+            try:
+                return record_server_status(self.probe())
+            finally:
+                cache.delete(PROBE_LOCK_KEY)
+        return self.probe()
+    
+    def probe(self) -> Dict[str, any]:
+        """
+        Verifica o login e todos os reinos ao mesmo tempo (o tempo total é o do mais lento)
+        
+        Returns:
+            Dict com status do login, de cada reino e o status geral
+        """
+        started = time.perf_counter()
+        login_status, *realms = self.check_endpoints([self.login_endpoint] + self.realms)
+        probe_ms = round((time.perf_counter() - started) * 1000, 2)
         
         # Determina o status geral
-        if game_status['status'] == 'online' and login_status['status'] == 'online':
+        statuses = [login_status['status']] + [realm['status'] for realm in realms]
+        if all(status == 'online' for status in statuses):
             overall_status = 'online'
-        elif game_status['status'] == 'offline' and login_status['status'] == 'offline':
+        elif all(status == 'offline' for status in statuses):
             overall_status = 'offline'
         else:
-            overall_status = 'partial'  # Um servidor online, outro offline
+            overall_status = 'partial'  # Parte dos servidores online, parte offline
         
+        latencies = [status['latency_ms'] for status in [login_status] + realms if status['latency_ms'] is not None]
         return {
             'overall_status': overall_status,
-            'game_server': game_status,
+            'game_server': realms[0],
             'login_server': login_status,
+            'realms': realms,
+            'realms_online': sum(1 for realm in realms if realm['status'] == 'online'),
+            'max_latency_ms': max(latencies) if latencies else None,
+            'probe_ms': probe_ms,
             'server_ip': self.server_ip,
             'checked_at': self._get_current_timestamp()
         }
@@ -159,11 +281,126 @@ class ServerStatusChecker:
         from django.utils import timezone
         return timezone.now().isoformat()
 
+    def _unknown_summary(self) -> Dict[str, any]:
+        """Resumo enquanto outra requisição verifica as portas (exibido como offline)"""
+        unknown = {'status': 'unknown', 'forced': False, 'ip': self.server_ip, 'message': 'Verificando status'}
+        return {
+            'overall_status': 'unknown',
+            'game_server': dict(unknown, port=self.game_port),
+            'login_server': dict(unknown, port=self.login_port),
+            'realms': [dict(unknown, name=realm.name, port=realm.port) for realm in self.realms],
+            'realms_online': 0,
+            'server_ip': self.server_ip,
+            'checked_at': self._get_current_timestamp(),
+            'uptime': {},
+        }
+
+
+def get_cached_server_status() -> Optional[Dict[str, any]]:
+    """Último resultado gravado pelo prober, ou None"""
+    try:
+        return cache.get(STATUS_KEY)
+    except Exception as e:
+        logger.warning(f"Erro ao ler o status do servidor no cache: {str(e)}")
+        return None
+
+
+def _history_entry(summary: Dict[str, any]) -> str:
+    """'timestamp|login_server=1|game_server=1|realm:Nome=0' (1 = online)"""
+    states = {
+        'login_server': summary['login_server']['status'],
+        'game_server': summary['game_server']['status'],
+    }
+    if len(summary.get('realms', [])) > 1:
+        for realm in summary['realms']:
+            states[f"realm:{realm['name']}"] = realm['status']
+    fields = [f"{key}={1 if status == 'online' else 0}" for key, status in states.items()]
+    return "|".join([str(int(time.time()))] + fields)
+
+
+def _parse_history_entry(entry: str) -> Tuple[int, Dict[str, int]]:
+    if "|" not in entry:
+        # Formato antigo: 'timestamp:jogo:login'
+        checked_at, game, login = (int(value) for value in entry.split(":"))
+        return checked_at, {'game_server': game, 'login_server': login}
+    checked_at, *fields = entry.split("|")
+    return int(checked_at), {key: int(value) for key, value in (field.rsplit("=", 1) for field in fields)}
+
+
+def _append_history(entry: str) -> List[str]:
+    """Grava a verificação no histórico (mais recente primeiro) e retorna o histórico completo"""
+    size = _history_size()
+    client = _redis()
+    if client is not None:
+        pipe = client.pipeline()
+        pipe.lpush(HISTORY_KEY, entry)
+        pipe.ltrim(HISTORY_KEY, 0, size - 1)
+        pipe.lrange(HISTORY_KEY, 0, -1)
+        history = pipe.execute()[-1]
+        return [item.decode() if isinstance(item, bytes) else item for item in history]
+
+    history = ([entry] + (cache.get(HISTORY_KEY) or []))[:size]
+    cache.set(HISTORY_KEY, history, timeout=None)
+    return history
+
+
+def calculate_uptime(history: List[str], now: Optional[float] = None) -> Dict[str, any]:
+    """
+    Percentual de verificações online por janela (1h, 24h, 7d) para login, jogo e cada reino
+    
+    Returns:
+        {'game_server': {'1h': 100.0, ...}, 'login_server': {...}, 'realms': {'Nome': {...}}};
+        None quando não há verificações na janela
+    """
+    now = now or time.time()
+    # chave -> janela -> [verificações, online]
+    totals: Dict[str, Dict[str, List[int]]] = {}
+    for entry in history:
+        try:
+            checked_at, states = _parse_history_entry(entry)
+        except ValueError:
+            continue
+        age = now - checked_at
+        for key, online in states.items():
+            windows = totals.setdefault(key, {label: [0, 0] for label, _ in UPTIME_WINDOWS})
+            for label, window in UPTIME_WINDOWS:
+                if age <= window:
+                    windows[label][0] += 1
+                    windows[label][1] += online
+
+    def percent(counts):
+        return round(counts[1] * 100.0 / counts[0], 2) if counts[0] else None
+
+    empty = {label: None for label, _ in UPTIME_WINDOWS}
+    uptime = {key: {label: percent(counts) for label, counts in windows.items()} for key, windows in totals.items()}
+    return {
+        'game_server': uptime.pop('game_server', empty),
+        'login_server': uptime.pop('login_server', empty),
+        'realms': {key.split(":", 1)[1]: value for key, value in uptime.items() if key.startswith("realm:")},
+    }
+
+
+def record_server_status(summary: Dict[str, any]) -> Dict[str, any]:
+    """Grava o resultado de uma verificação (último status + histórico) com os percentuais de uptime"""
+    try:
+        summary['uptime'] = calculate_uptime(_append_history(_history_entry(summary)))
+        # Expira se o prober parar, para a próxima requisição voltar a verificar
+        cache.set(STATUS_KEY, summary, timeout=_probe_interval() * 3)
+    except Exception as e:
+        logger.warning(f"Erro ao gravar o status do servidor: {str(e)}")
+        summary.setdefault('uptime', {})
+    return summary
+
+
+def probe_server_status() -> Dict[str, any]:
+    """Verifica as portas agora e grava o resultado (usado pela task do celery-beat)"""
+    return record_server_status(ServerStatusChecker().probe())
+
 
 # Funções utilitárias para uso direto
 def check_server_status() -> Dict[str, any]:
     """
-    Função utilitária para verificar status do servidor
+    Função utilitária para verificar status do servidor (lê o resultado do prober em background)
     
     Returns:
         Dict com informações do status
@@ -179,8 +416,7 @@ def is_game_server_online() -> bool:
     Returns:
         bool: True se online, False se offline
     """
-    checker = ServerStatusChecker()
-    status = checker.get_game_server_status()
+    status = check_server_status()['game_server']
     return status['status'] == 'online'
 
 
@@ -191,8 +427,7 @@ def is_login_server_online() -> bool:
     Returns:
         bool: True se online, False se offline
     """
-    checker = ServerStatusChecker()
-    status = checker.get_login_server_status()
+    status = check_server_status()['login_server']
     return status['status'] == 'online'
 
 